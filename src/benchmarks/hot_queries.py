@@ -0,0 +1,375 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import Executable, delete, insert, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.bot.helpers.fields.transitions import select_next_field_in_branch
+from src.bot.helpers.keyboards.user_currents import select_user_current_keyboard_keys
+from src.bot.helpers.replyable_condition_messages.conditions import (
+    compound_select_user_awaliable_replyable_condition_messages,
+)
+from src.bot.jobs.personal_notifications import select_personal_notifications_to_deliver
+from src.utils.bb_provider import BBProvider
+from src.utils.custom_types import (
+    FieldBranchStatusEnum,
+    FieldStatusEnum,
+    FieldTypeEnum,
+    KeyboardKeyStatusEnum,
+    PersonalNotificationStatusEnum,
+    UserStatusEnum,
+)
+from src.utils.db_model import (
+    Field,
+    FieldBranch,
+    KeyboardKey,
+    ReplyableConditionMessage,
+    User,
+    UserFieldValue,
+)
+from src.utils.tracing import Trace, current_trace
+from src.utils.user_pivot import select_users_values
+
+SEED_PREFIX = "hot_queries_"
+"""Префикс ключей и названий сгенерированных объектов, по нему они удаляются до и после замера"""
+
+FIRST_CHAT_ID = 9_000_000_000_000
+"""Идентификатор чата первого сгенерированного пользователя"""
+
+INSERT_CHUNK_SIZE = 5_000
+"""Количество строк в одной пачке вставки"""
+
+SEEDED_TABLES = [
+    "users",
+    "user_field_values",
+    "fields",
+    "field_branches",
+    "keyboard_keys",
+    "replyable_condition_message",
+]
+"""Таблицы, статистика которых обновляется после генерации данных"""
+
+
+@dataclass
+class QuerySample:
+    """Входные данные одного выполнения запроса"""
+
+    user: User
+    field: Field
+
+
+@dataclass
+class HotQuery:
+    """Часто выполняемый запрос и способ построить его для пользователя и поля"""
+
+    name: str
+    build: Callable[[QuerySample], Executable]
+
+
+HOT_QUERIES = [
+    HotQuery("user_current_keyboard", lambda sample: select_user_current_keyboard_keys(sample.user)),
+    HotQuery(
+        "replyable_condition_messages",
+        lambda sample: compound_select_user_awaliable_replyable_condition_messages(sample.user),
+    ),
+    HotQuery("next_field_in_branch", lambda sample: select_next_field_in_branch(sample.field)),
+    HotQuery("personal_notifications_to_deliver", lambda _: select_personal_notifications_to_deliver()),
+    HotQuery("users_report", lambda _: select_users_values()),
+]
+"""Запросы клавиатуры, условий сообщений, следующего вопроса, персональных уведомлений и отчёта по пользователям"""
+
+
+def _chunks(rows: list[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    for idx in range(0, len(rows), INSERT_CHUNK_SIZE):
+        yield rows[idx : idx + INSERT_CHUNK_SIZE]
+
+
+async def delete_seeded_data(provider: BBProvider) -> None:
+    """Удалить сгенерированные для замера данные"""
+    async with provider.db_sessionmaker() as session:
+        seeded_users = select(User.id).where(User.chat_id >= FIRST_CHAT_ID)
+        seeded_fields = select(Field.id).where(Field.key.startswith(SEED_PREFIX))
+        await session.execute(
+            delete(UserFieldValue).where(
+                or_(UserFieldValue.user_id.in_(seeded_users), UserFieldValue.field_id.in_(seeded_fields))
+            )
+        )
+        await session.execute(delete(User).where(User.chat_id >= FIRST_CHAT_ID))
+        seeded_keys = delete(KeyboardKey).where(KeyboardKey.key.startswith(SEED_PREFIX))
+        await session.execute(seeded_keys.where(KeyboardKey.parent_key_id.is_not(None)))
+        await session.execute(seeded_keys)
+        await session.execute(
+            delete(ReplyableConditionMessage).where(ReplyableConditionMessage.name.startswith(SEED_PREFIX))
+        )
+        await session.execute(delete(Field).where(Field.key.startswith(SEED_PREFIX)))
+        await session.execute(delete(FieldBranch).where(FieldBranch.key.startswith(SEED_PREFIX)))
+        await session.commit()
+
+
+async def seed(provider: BBProvider, options: argparse.Namespace) -> None:
+    """
+    Сгенерировать пользователей, вопросы и ответы
+
+    Каждый пятый вопрос булев и служит условием кнопки клавиатуры, каждый десятый - персональное уведомление
+    """
+    rnd = random.Random(options.seed)
+    async with provider.db_sessionmaker() as session:
+        branch_id = await session.scalar(
+            insert(FieldBranch)
+            .values(key=f"{SEED_PREFIX}branch", status=FieldBranchStatusEnum.INACTIVE)
+            .returning(FieldBranch.id)
+        )
+        field_rows = [
+            {
+                "key": f"{SEED_PREFIX}{idx:04d}",
+                "branch_id": branch_id,
+                "order_place": idx,
+                "type": FieldTypeEnum.BOOLEAN if idx % 5 == 0 else FieldTypeEnum.FULL_TEXT,
+                "status": FieldStatusEnum.PERSONAL_NOTIFICATION if idx % 10 == 9 else FieldStatusEnum.NORMAL,
+            }
+            for idx in range(options.fields)
+        ]
+        fields = list(await session.execute(insert(Field).returning(Field.id, Field.type, Field.status), field_rows))
+
+        root_key_id = await session.scalar(
+            insert(KeyboardKey)
+            .values(key=f"{SEED_PREFIX}root", status=KeyboardKeyStatusEnum.INACTIVE)
+            .returning(KeyboardKey.id)
+        )
+        for field_id, field_type, _ in fields:
+            if field_type != FieldTypeEnum.BOOLEAN:
+                continue
+            message_id = await session.scalar(
+                insert(ReplyableConditionMessage)
+                .values(name=f"{SEED_PREFIX}{field_id}", text_markdown=str(field_id), condition_bool_field_id=field_id)
+                .returning(ReplyableConditionMessage.id)
+            )
+            await session.execute(
+                insert(KeyboardKey).values(
+                    key=f"{SEED_PREFIX}{field_id}",
+                    status=KeyboardKeyStatusEnum.NORMAL,
+                    reply_condition_message_id=message_id,
+                    parent_key_id=root_key_id,
+                )
+            )
+
+        now = datetime.now()  # noqa: DTZ005
+        user_rows = [
+            {
+                "timestamp": now,
+                "chat_id": FIRST_CHAT_ID + idx,
+                "status": UserStatusEnum.ACTIVE,
+                "curr_keyboard_key_parent_id": root_key_id,
+            }
+            for idx in range(options.users)
+        ]
+        user_ids: list[int] = []
+        for chunk in _chunks(user_rows):
+            user_ids.extend(await session.scalars(insert(User).returning(User.id), chunk))
+
+        value_rows: list[dict[str, Any]] = []
+        for user_id in user_ids:
+            for field_id, field_type, field_status in fields:
+                if rnd.random() >= options.fill:
+                    continue
+                notification_status = None
+                if field_status == FieldStatusEnum.PERSONAL_NOTIFICATION:
+                    notification_status = (
+                        PersonalNotificationStatusEnum.TO_DELIVER
+                        if rnd.random() < options.to_deliver
+                        else PersonalNotificationStatusEnum.DELIVERED
+                    )
+                value_rows.append(
+                    {
+                        "user_id": user_id,
+                        "field_id": field_id,
+                        "value": rnd.choice(["true", "false"])
+                        if field_type == FieldTypeEnum.BOOLEAN
+                        else f"value {user_id}",
+                        "value_file_id": None,
+                        "personal_notification_status": notification_status,
+                    }
+                )
+        for chunk in _chunks(value_rows):
+            await session.execute(insert(UserFieldValue), chunk)
+
+        await session.execute(text(f"ANALYZE {', '.join(SEEDED_TABLES)}"))
+        await session.commit()
+    logger.info(f"Seeded {len(user_ids)} users, {len(fields)} fields and {len(value_rows)} values")
+
+
+async def load_samples(provider: BBProvider, options: argparse.Namespace) -> list[QuerySample]:
+    """Случайные сгенерированные пользователи и вопросы, для которых выполняются запросы"""
+    rnd = random.Random(options.seed)
+    async with provider.db_sessionmaker() as session:
+        user_ids = list(await session.scalars(select(User.id).where(User.chat_id >= FIRST_CHAT_ID)))
+        sample_ids = rnd.sample(user_ids, min(options.repeats, len(user_ids)))
+        users = list(await session.scalars(select(User).where(User.id.in_(sample_ids))))
+        fields = list(
+            await session.scalars(
+                select(Field).where(Field.key.startswith(SEED_PREFIX)).where(Field.status == FieldStatusEnum.NORMAL)
+            )
+        )
+    return [QuerySample(user, rnd.choice(fields)) for user in users]
+
+
+async def _execute(session: AsyncSession, statement: Executable) -> int:
+    result = await session.execute(statement)
+    return len(result.unique().all())
+
+
+async def time_query(provider: BBProvider, query: HotQuery, samples: list[QuerySample]) -> dict[str, Any]:
+    """Выполнить запрос для каждого образца в отдельной сессии, как это делает бот"""
+    latencies = []
+    queries = []
+    rows = 0
+    for sample in samples:
+        trace = Trace()
+        trace_token = current_trace.set(trace)
+        try:
+            started_at = time.perf_counter()
+            async with provider.db_sessionmaker() as session:
+                rows = await _execute(session, query.build(sample))
+            latencies.append(time.perf_counter() - started_at)
+        finally:
+            current_trace.reset(trace_token)
+        queries.append(trace.queries)
+
+    latencies.sort()
+    return {
+        "runs": len(latencies),
+        "rows": rows,
+        "db_statements": max(queries, default=0),
+        "latency_ms": {
+            "p50": round(statistics.median(latencies) * 1000, 3),
+            "p95": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+    }
+
+
+def _plan_nodes(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def explain_query(
+    session: AsyncSession, statement: Executable, table_rows: dict[str, int], large_table_rows: int
+) -> dict[str, Any]:
+    """
+    Получить план выполнения запроса `EXPLAIN (ANALYZE, BUFFERS)`
+
+    Последовательное чтение таблиц, в которых не меньше `large_table_rows` строк, попадает в `seq_scans`
+    """
+    sql = str(statement.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}))
+    raw_plan = await session.scalar(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"))
+    plan = (json.loads(raw_plan) if isinstance(raw_plan, str) else raw_plan)[0]
+
+    seq_scans = sorted(
+        {
+            node["Relation Name"]
+            for node in _plan_nodes(plan["Plan"])
+            if node["Node Type"] == "Seq Scan" and table_rows.get(node["Relation Name"], 0) >= large_table_rows
+        }
+    )
+    return {
+        "planning_ms": plan.get("Planning Time"),
+        "execution_ms": plan.get("Execution Time"),
+        "shared_hit_blocks": plan["Plan"].get("Shared Hit Blocks"),
+        "shared_read_blocks": plan["Plan"].get("Shared Read Blocks"),
+        "seq_scans": seq_scans,
+        "sql": sql,
+        "plan": plan,
+    }
+
+
+async def run(options: argparse.Namespace) -> int:
+    provider = BBProvider()
+    await delete_seeded_data(provider)
+    try:
+        await seed(provider, options)
+        samples = await load_samples(provider, options)
+        if not samples:
+            logger.error("No users were seeded, nothing to measure")
+            return 1
+
+        async with provider.db_sessionmaker() as session:
+            table_rows = {
+                name: int(rows)
+                for name, rows in await session.execute(
+                    text(
+                        "SELECT relname, reltuples FROM pg_class "
+                        "WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+                    )
+                )
+            }
+
+        report: dict[str, Any] = {
+            "dataset": {"users": options.users, "fields": options.fields, "fill": options.fill},
+            "queries": {},
+        }
+        plans_dir = Path(options.plans_dir) if options.plans_dir else None
+        if plans_dir:
+            await asyncio.to_thread(plans_dir.mkdir, parents=True, exist_ok=True)
+
+        for query in HOT_QUERIES:
+            await time_query(provider, query, samples[:1])
+            result = await time_query(provider, query, samples)
+            async with provider.db_sessionmaker() as session:
+                explain = await explain_query(session, query.build(samples[0]), table_rows, options.large_table)
+            if plans_dir:
+                await asyncio.to_thread(
+                    (plans_dir / f"{query.name}.json").write_text, json.dumps(explain["plan"], indent=2) + "\n"
+                )
+            for table in explain["seq_scans"]:
+                logger.warning(f"{query.name}: sequential scan on {table} ({table_rows[table]} rows)")
+            result |= {key: value for key, value in explain.items() if key not in {"plan", "sql"}}
+            report["queries"][query.name] = result
+    finally:
+        if not options.keep:
+            await delete_seeded_data(provider)
+        await provider.db_engine.dispose()
+
+    logger.info(f"Hot queries report:\n{json.dumps(report, indent=2, ensure_ascii=False)}")
+    if options.output:
+        await asyncio.to_thread(
+            Path(options.output).write_text, json.dumps(report, indent=2, ensure_ascii=False) + "\n"
+        )
+        logger.success(f"Saved report to {options.output}")
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Замер часто выполняемых запросов к БД на сгенерированных данных с планами выполнения. "
+        "Требуется локальный Postgres, инициализированный UI, настройки берутся из .env"
+    )
+    parser.add_argument("--users", type=int, default=10_000, help="количество сгенерированных пользователей")
+    parser.add_argument("--fields", type=int, default=30, help="количество сгенерированных вопросов")
+    parser.add_argument("--fill", type=float, default=0.8, help="доля вопросов, на которые ответил пользователь")
+    parser.add_argument("--to-deliver", type=float, default=0.1, help="доля неотправленных персональных уведомлений")
+    parser.add_argument("--repeats", type=int, default=50, help="количество выполнений каждого запроса")
+    parser.add_argument("--seed", type=int, default=0, help="начальное значение генератора данных")
+    parser.add_argument(
+        "--large-table", type=int, default=10_000, help="количество строк, с которого таблица считается большой"
+    )
+    parser.add_argument("--plans-dir", help="каталог для сохранения планов выполнения в JSON")
+    parser.add_argument("--output", help="файл для сохранения отчёта")
+    parser.add_argument("--keep", action="store_true", help="не удалять сгенерированные данные после замера")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+from fastapi.routing import APIRoute
+from loguru import logger
+from sqlalchemy import select
+
+from src.benchmarks.registration import BenchmarkSetupError, RegistrationBenchmark, run_registration
+from src.ui.app import app as ui_app
+from src.ui.dependencies import RequireRoles, get_user, verify_token
+from src.ui.keycloak import KeycloakUser
+from src.ui.provider import provider as ui_provider
+from src.utils.db_model import FieldBranch
+from src.utils.tracing import Trace, current_trace, record_statements
+
+BUDGET_PATH = Path(__file__).parent / "baselines" / "query_budget.json"
+"""Бюджет запросов к БД: максимальное количество запросов на обработчик бота и страницу UI"""
+
+UI_SKIPPED_TAGS = {"healthz", "metrics", "minio"}
+"""Теги страниц UI, не работающих с БД или требующих внешних объектов"""
+
+
+@dataclass
+class QueryUsage:
+    """Наибольшее количество запросов к БД за одно обращение и текст этих запросов"""
+
+    queries: int
+    statements: list[str]
+
+
+def collect_bot_usage(benchmark: RegistrationBenchmark) -> dict[str, QueryUsage]:
+    usage: dict[str, QueryUsage] = {}
+    for sample in benchmark.samples:
+        if sample.handler not in usage or sample.queries > usage[sample.handler].queries:
+            usage[sample.handler] = QueryUsage(sample.queries, sample.statements or [])
+    return usage
+
+
+async def _allow() -> None:
+    pass
+
+
+def _override_ui_auth() -> None:
+    """Пропустить авторизацию Keycloak при обращении к страницам UI в том же процессе"""
+    ui_app.dependency_overrides[verify_token] = lambda: "query-budget"
+    ui_app.dependency_overrides[get_user] = lambda: KeycloakUser(name="Query budget", preferred_username="query-budget")
+    for route in ui_app.routes:
+        for dependency in getattr(route, "dependencies", []):
+            if isinstance(dependency.dependency, RequireRoles):
+                ui_app.dependency_overrides[dependency.dependency] = _allow
+
+
+def _ui_pages(branch_id: int | None) -> list[tuple[str, str]]:
+    """Названия и адреса страниц UI: страницы без параметров и страницы веток"""
+    pages = []
+    for route in ui_app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        if not route.tags or UI_SKIPPED_TAGS.intersection(route.tags):
+            continue
+        params = set(route.param_convertors)
+        if params - {"branch_id"} or (params and branch_id is None):
+            continue
+        name = f"GET {route.path.removeprefix(ui_provider.config.path_prefix)}"
+        pages.append((name, route.path.format(branch_id=branch_id) if params else route.path))
+    return pages
+
+
+async def collect_ui_usage() -> dict[str, QueryUsage]:
+    """Обратиться к каждой странице UI и учесть запросы к БД"""
+    _override_ui_auth()
+    usage: dict[str, QueryUsage] = {}
+    async with ui_app.router.lifespan_context(ui_app):
+        async with ui_provider.db_sessionmaker() as session:
+            branch_id = await session.scalar(select(FieldBranch.id).order_by(FieldBranch.id).limit(1))
+
+        transport = httpx.ASGITransport(app=ui_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ui") as client:
+            for name, path in _ui_pages(branch_id):
+                trace = Trace()
+                trace_token = current_trace.set(trace)
+                try:
+                    response = await client.get(path)
+                finally:
+                    current_trace.reset(trace_token)
+                if response.status_code >= 400:
+                    logger.warning(f"{name} returned {response.status_code}, its query count may be incomplete")
+                usage[name] = QueryUsage(trace.queries, trace.statements or [])
+    return usage
+
+
+def check_budget(usage: dict[str, dict[str, QueryUsage]], budget: dict[str, dict[str, int]]) -> list[str]:
+    """Список превышений бюджета запросов с текстом выполненных запросов"""
+    violations = []
+    for scope, scope_usage in usage.items():
+        for name, item in sorted(scope_usage.items()):
+            limit = budget.get(scope, {}).get(name)
+            if limit is None:
+                violations.append(f"{scope} {name}: no budget, observed {item.queries} queries")
+                continue
+            if item.queries > limit:
+                statements = "\n".join(
+                    f"  {idx}. {' '.join(statement.split())}" for idx, statement in enumerate(item.statements, 1)
+                )
+                violations.append(f"{scope} {name}: {item.queries} queries > budget {limit}\n{statements}")
+            elif item.queries < limit:
+                logger.info(f"{scope} {name}: {item.queries} queries, budget {limit} can be lowered")
+    return violations
+
+
+async def run(options: argparse.Namespace) -> int:
+    record_statements()
+    usage: dict[str, dict[str, QueryUsage]] = {}
+
+    async def collect_ui() -> None:
+        usage["ui"] = await collect_ui_usage()
+
+    scenario = argparse.Namespace(
+        users=options.users,
+        concurrency=1,
+        keyboard_hits=options.keyboard_hits,
+        latency=0.0,
+        seed=0,
+        answers=options.answers,
+        with_jobs=False,
+    )
+    try:
+        benchmark, _ = await run_registration(scenario, before_cleanup=collect_ui)
+    except BenchmarkSetupError as e:
+        logger.error(str(e))
+        return 1
+    usage["bot"] = collect_bot_usage(benchmark)
+
+    if benchmark.failed_users or benchmark.app.errors:
+        logger.error("Scenario did not complete, query counts are not representative")
+        return 1
+
+    budget_path = Path(options.budget)
+    if options.update:
+        budget = {
+            scope: {name: item.queries for name, item in sorted(scope_usage.items())}
+            for scope, scope_usage in sorted(usage.items())
+        }
+        await asyncio.to_thread(budget_path.parent.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(budget_path.write_text, json.dumps(budget, indent=2, ensure_ascii=False) + "\n")
+        logger.success(f"Saved query budget to {budget_path}")
+        return 0
+
+    if not await asyncio.to_thread(budget_path.exists):
+        logger.warning(f"No query budget at {budget_path}, run with --update to create one")
+        return 0
+
+    violations = check_budget(usage, json.loads(await asyncio.to_thread(budget_path.read_text)))
+    for violation in violations:
+        logger.error(f"Query budget exceeded: {violation}")
+    if violations:
+        return 1
+
+    logger.success("All handlers and pages are within the query budget")
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Проверка количества запросов к БД обработчиков бота и страниц UI на типовом сценарии. "
+        "Требуются локальные Postgres и Minio, инициализированные UI, настройки берутся из .env"
+    )
+    parser.add_argument("--users", type=int, default=3, help="количество синтетических пользователей")
+    parser.add_argument("--keyboard-hits", type=int, default=5, help="нажатий клавиатуры после регистрации")
+    parser.add_argument("--answers", help="JSON файл ответов на текстовые вопросы: ключ поля -> ответ")
+    parser.add_argument("--budget", default=str(BUDGET_PATH), help="файл бюджета запросов")
+    parser.add_argument("--update", action="store_true", help="записать наблюдаемые значения как бюджет")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
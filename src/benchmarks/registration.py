@@ -0,0 +1,441 @@
+import argparse
+import asyncio
+import io
+import json
+import random
+import sys
+import time
+import zipfile
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+from PIL import Image
+from sqlalchemy import delete, select
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from src.bot import map_handlers
+from src.bot.telegram.application import BBApplication
+from src.bot.telegram.application_builder import BBApplicationBuilder
+from src.bot.telegram.callback_constants import UserFastAnswerReplyCallback
+from src.tg_emulator.config import EmulatorConfig
+from src.tg_emulator.emulator import JsonDict, TelegramBotAPIEmulator, UploadedFile
+from src.tg_emulator.request import EmulatorRequest
+from src.utils.custom_types import FieldTypeEnum
+from src.utils.db_model import Field, FileIngestion, User, UserFieldValue
+from src.utils.tracing import Trace
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "registration.json"
+"""Сохранённые результаты, с которыми сравнивается каждый замер"""
+
+FIRST_CHAT_ID = 7_000_000_000
+"""Идентификатор чата первого синтетического пользователя, пользователи удаляются из БД до и после замера"""
+
+UPDATE_TIMEOUT = 60
+"""Время ожидания обработки одного обновления в секундах"""
+
+MAX_FIELD_ATTEMPTS = 3
+"""Количество ответов на один вопрос, после которого пользователь считается застрявшим"""
+
+DB_STATEMENTS_TOLERANCE = 0.5
+"""Допустимый рост среднего количества запросов к БД на обновление"""
+
+
+class BenchmarkSetupError(Exception):
+    """Замер не может быть запущен на текущих данных"""
+
+
+class BenchmarkUserError(Exception):
+    """Синтетический пользователь не может продолжить сценарий"""
+
+
+@dataclass
+class UpdateSample:
+    """Замер обработки одного обновления"""
+
+    phase: str
+    handler: str
+    latency: float
+    queries: int
+    statements: list[str] | None = None
+
+
+class BenchmarkApplication(BBApplication):
+    """Приложение бота, сообщающее замеру о завершении обработки каждого обновления"""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.processed: dict[int, asyncio.Future[Trace]] = {}
+        self.errors = 0
+
+    def on_update_processed(self, update: object, trace: Trace, elapsed: float) -> None:
+        super().on_update_processed(update, trace, elapsed)
+        if isinstance(update, Update):
+            future = self.processed.pop(update.update_id, None)
+            if future and not future.done():
+                future.set_result(trace)
+
+    async def count_error(self, _: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+        self.errors += 1
+        logger.warning(f"Update failed during benchmark for error {context.error!r}")
+
+
+def _make_png() -> bytes:
+    bio = io.BytesIO()
+    Image.new("RGB", (640, 480), (64, 128, 192)).save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def _make_pdf() -> bytes:
+    return (
+        b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+        b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+        b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+        b"trailer<</Root 1 0 R>>\n%%EOF\n"
+    )
+
+
+def _make_zip() -> bytes:
+    bio = io.BytesIO()
+    with zipfile.ZipFile(bio, "w") as archive:
+        archive.writestr("benchmark.txt", "benchmark")
+    return bio.getvalue()
+
+
+class RegistrationBenchmark:
+    """
+    Прогон синтетических пользователей через настоящие обработчики бота и эмулятор Telegram Bot API
+
+    Каждый пользователь отправляет `/start`, отвечает на все вопросы первой ветки (текст, изображения и документы),
+    нажимает кнопки клавиатуры и отвечает на встроенные кнопки быстрых ответов
+    """
+
+    def __init__(
+        self,
+        app: BenchmarkApplication,
+        emulator: TelegramBotAPIEmulator,
+        fields: dict[int, Field],
+        answers: dict[str, str],
+        keyboard_hits: int,
+        seed: int,
+    ) -> None:
+        self.app = app
+        self.emulator = emulator
+        self.fields = fields
+        self.answers = answers
+        self.keyboard_hits = keyboard_hits
+        self.seed = seed
+
+        self.samples: list[UpdateSample] = []
+        self.failed_users: dict[int, str] = {}
+
+        self._png = _make_png()
+        self._pdf = _make_pdf()
+        self._zip = _make_zip()
+
+    async def run_user(self, idx: int, semaphore: asyncio.Semaphore) -> None:
+        chat_id = FIRST_CHAT_ID + idx
+        rng = random.Random(self.seed + idx)
+        async with semaphore:
+            try:
+                await self._send(chat_id, "start", text="/start", username=f"bench_user_{idx}")
+                await self._answer_fields(chat_id)
+                await self._navigate_keyboard(chat_id, rng)
+            except BenchmarkUserError as e:
+                self.failed_users[chat_id] = str(e)
+            except TimeoutError:
+                self.failed_users[chat_id] = f"Update was not processed in {UPDATE_TIMEOUT} seconds"
+
+    async def _wait_processed(self, update: JsonDict, phase: str) -> None:
+        future: asyncio.Future[Trace] = asyncio.get_running_loop().create_future()
+        self.app.processed[update["update_id"]] = future
+        started_at = time.perf_counter()
+        trace = await asyncio.wait_for(future, UPDATE_TIMEOUT)
+        self.samples.append(
+            UpdateSample(phase, trace.handler, time.perf_counter() - started_at, trace.queries, trace.statements)
+        )
+
+    async def _send(self, chat_id: int, phase: str, **message: Any) -> None:
+        await self._wait_processed(self.emulator.user_send_message(chat_id, **message), phase)
+
+    async def _press(self, chat_id: int, message_id: int, data: str) -> None:
+        await self._wait_processed(self.emulator.user_press_button(chat_id, message_id, data), "callback")
+
+    async def _current_field_id(self, chat_id: int) -> int | None:
+        async with self.app.provider.db_sessionmaker() as session:
+            return await session.scalar(select(User.curr_field_id).where(User.chat_id == chat_id))
+
+    async def _answer_fields(self, chat_id: int) -> None:
+        """Отвечать на текущий вопрос пользователя, пока вопросы не закончатся"""
+        previous_field_id, attempts = None, 0
+        while field_id := await self._current_field_id(chat_id):
+            attempts = attempts + 1 if field_id == previous_field_id else 1
+            previous_field_id = field_id
+            field = self.fields[field_id]
+            if attempts > MAX_FIELD_ATTEMPTS:
+                raise BenchmarkUserError(f"Stuck on field {field.key}, provide a valid answer with --answers")
+
+            phase, message = self._field_answer(field, chat_id)
+            await self._send(chat_id, phase, **message)
+
+    def _field_answer(self, field: Field, chat_id: int) -> tuple[str, dict[str, Any]]:
+        if field.type == FieldTypeEnum.FULL_TEXT:
+            if field.key in self.answers:
+                text = self.answers[field.key].replace("{chat_id}", str(chat_id))
+            elif field.answer_options:
+                text = field.answer_options.splitlines()[0].strip()
+            else:
+                text = f"Benchmark {chat_id}"
+            return "text", {"text": text}
+
+        if field.type == FieldTypeEnum.IMAGE:
+            return "photo", {"photo": UploadedFile(self._png, "photo.png", "image/png")}
+
+        if field.type == FieldTypeEnum.PDF_DOCUMENT:
+            return "document", {"document": UploadedFile(self._pdf, "document.pdf", "application/pdf")}
+
+        if field.type == FieldTypeEnum.ZIP_DOCUMENT:
+            return "document", {"document": UploadedFile(self._zip, "archive.zip", "application/zip")}
+
+        raise BenchmarkUserError(f"Field {field.key} of type {field.type} can not be answered")
+
+    async def _navigate_keyboard(self, chat_id: int, rng: random.Random) -> None:
+        """Нажимать случайные кнопки клавиатуры и отвечать на встроенные кнопки быстрых ответов"""
+        seen_message_ids: set[int] = set()
+        for _ in range(self.keyboard_hits):
+            for message in self._new_bot_messages(chat_id, seen_message_ids):
+                callback_data = [
+                    button["callback_data"]
+                    for row in message.get("reply_markup", {}).get("inline_keyboard", [])
+                    for button in row
+                    if button.get("callback_data", "").startswith(UserFastAnswerReplyCallback.PREFIX)
+                ]
+                if callback_data:
+                    await self._press(chat_id, message["message_id"], rng.choice(callback_data))
+
+            buttons = [text for row in self.emulator.chat_keyboard(chat_id) for text in row]
+            if not buttons:
+                return
+            await self._send(chat_id, "keyboard", text=rng.choice(buttons))
+
+    def _new_bot_messages(self, chat_id: int, seen_message_ids: set[int]) -> list[JsonDict]:
+        messages = [
+            message
+            for message in self.emulator.chat_messages(chat_id)
+            if message["from"]["id"] == self.emulator.bot_user["id"] and message["message_id"] not in seen_message_ids
+        ]
+        seen_message_ids.update(message["message_id"] for message in messages)
+        return messages
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(round(percent / 100 * (len(ordered) - 1)), len(ordered) - 1)]
+
+
+def summarize(samples: Iterable[UpdateSample]) -> JsonDict:
+    """Задержка и количество запросов к БД набора обновлений"""
+    samples = list(samples)
+    latencies = [sample.latency for sample in samples]
+    queries = [sample.queries for sample in samples]
+    return {
+        "updates": len(samples),
+        "latency_p50": round(_percentile(latencies, 50), 4),
+        "latency_p95": round(_percentile(latencies, 95), 4),
+        "latency_p99": round(_percentile(latencies, 99), 4),
+        "db_statements_mean": round(sum(queries) / len(queries), 2) if queries else 0.0,
+        "db_statements_max": max(queries, default=0),
+    }
+
+
+def build_report(benchmark: RegistrationBenchmark, options: argparse.Namespace, duration: float) -> JsonDict:
+    by_phase: defaultdict[str, list[UpdateSample]] = defaultdict(list)
+    by_handler: defaultdict[str, list[UpdateSample]] = defaultdict(list)
+    for sample in benchmark.samples:
+        by_phase[sample.phase].append(sample)
+        by_handler[sample.handler].append(sample)
+
+    return {
+        "users": options.users,
+        "concurrency": options.concurrency,
+        "keyboard_hits": options.keyboard_hits,
+        "emulator_latency": options.latency,
+        "failed_users": len(benchmark.failed_users),
+        "errors": benchmark.app.errors,
+        "duration_seconds": round(duration, 3),
+        "updates_per_second": round(len(benchmark.samples) / duration, 2) if duration else 0.0,
+        "total": summarize(benchmark.samples),
+        "phases": {phase: summarize(samples) for phase, samples in sorted(by_phase.items())},
+        "handlers": {handler: summarize(samples) for handler, samples in sorted(by_handler.items())},
+    }
+
+
+def compare_with_baseline(report: JsonDict, baseline: JsonDict, tolerance: float) -> list[str]:
+    """Список ухудшений относительно сохранённых результатов"""
+    regressions = []
+    if report["updates_per_second"] < baseline["updates_per_second"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {report['updates_per_second']} < baseline {baseline['updates_per_second']} updates/s"
+        )
+
+    for group in ("phases", "handlers"):
+        for name, summary in report[group].items():
+            baseline_summary = baseline.get(group, {}).get(name)
+            if not baseline_summary:
+                continue
+            if summary["latency_p95"] > baseline_summary["latency_p95"] * (1 + tolerance):
+                regressions.append(
+                    f"{name} p95 latency {summary['latency_p95']}s > baseline {baseline_summary['latency_p95']}s"
+                )
+            if summary["db_statements_mean"] > baseline_summary["db_statements_mean"] + DB_STATEMENTS_TOLERANCE:
+                regressions.append(
+                    f"{name} DB statements per update {summary['db_statements_mean']} "
+                    f"> baseline {baseline_summary['db_statements_mean']}"
+                )
+    return regressions
+
+
+async def delete_benchmark_users(app: BBApplication, users: int, file_ids: list[str]) -> None:
+    """Удалить синтетических пользователей, их ответы и очередь загрузки их файлов"""
+    chat_ids = list(range(FIRST_CHAT_ID, FIRST_CHAT_ID + users))
+    user_ids = select(User.id).where(User.chat_id.in_(chat_ids)).scalar_subquery()
+    async with app.provider.db_sessionmaker() as session:
+        await session.execute(delete(UserFieldValue).where(UserFieldValue.user_id.in_(user_ids)))
+        await session.execute(delete(User).where(User.chat_id.in_(chat_ids)))
+        if file_ids:
+            await session.execute(delete(FileIngestion).where(FileIngestion.file_id.in_(file_ids)))
+        await session.commit()
+
+
+async def run_registration(
+    options: argparse.Namespace, before_cleanup: Callable[[], Awaitable[None]] | None = None
+) -> tuple[RegistrationBenchmark, float]:
+    """
+    Прогнать синтетических пользователей через бота и удалить их из БД
+
+    Возвращает результаты прогона и его длительность, `before_cleanup` вызывается пока пользователи ещё в БД
+    """
+    emulator = TelegramBotAPIEmulator(
+        EmulatorConfig(
+            latency=options.latency,
+            latency_jitter=0,
+            global_rate_limit=0,
+            chat_rate_limit=0,
+            flood_probability=0,
+        )
+    )
+
+    builder = BBApplicationBuilder()
+    app: BenchmarkApplication = (
+        builder.application_class(BenchmarkApplication, {"provider": builder.provider})
+        .request(EmulatorRequest(emulator))
+        .get_updates_request(EmulatorRequest(emulator))
+        .concurrent_updates(True)  # noqa: FBT003
+        .build()
+    )
+    app.add_error_handler(app.count_error)
+
+    bot_status = await app.provider.bot_status
+    app.status = bot_status.bot_status
+    if not bot_status.is_registration_open:
+        raise BenchmarkSetupError("Registration is closed, open it in UI before running the benchmark")
+
+    map_handlers.map_default_handlers(app)
+    if not options.with_jobs and app.job_queue:
+        for job in app.job_queue.jobs():
+            job.schedule_removal()
+
+    async with app.provider.db_sessionmaker() as session:
+        fields = {field.id: field for field in await session.scalars(select(Field))}
+    answers = json.loads(await asyncio.to_thread(Path(options.answers).read_text)) if options.answers else {}
+
+    await delete_benchmark_users(app, options.users, [])
+
+    benchmark = RegistrationBenchmark(app, emulator, fields, answers, options.keyboard_hits, options.seed)
+    semaphore = asyncio.Semaphore(options.concurrency)
+
+    await app.initialize()
+    await app.start()
+    if app.updater:
+        await app.updater.start_polling(poll_interval=0, timeout=10, drop_pending_updates=True)
+    try:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(benchmark.run_user(idx, semaphore) for idx in range(options.users)))
+        duration = time.perf_counter() - started_at
+
+        if before_cleanup:
+            await before_cleanup()
+    finally:
+        if app.updater:
+            await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+        await delete_benchmark_users(app, options.users, emulator.stored_file_ids())
+
+    for chat_id, reason in list(benchmark.failed_users.items())[:10]:
+        logger.warning(f"Synthetic user {chat_id} failed: {reason}")
+
+    return benchmark, duration
+
+
+async def run(options: argparse.Namespace) -> int:
+    try:
+        benchmark, duration = await run_registration(options)
+    except BenchmarkSetupError as e:
+        logger.error(str(e))
+        return 1
+
+    report = build_report(benchmark, options, duration)
+    logger.info(f"Registration benchmark report:\n{json.dumps(report, indent=2, ensure_ascii=False)}")
+
+    baseline_path = Path(options.baseline)
+    if options.save_baseline:
+        await asyncio.to_thread(baseline_path.parent.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(baseline_path.write_text, json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+        logger.success(f"Saved baseline to {baseline_path}")
+        return 0
+
+    if not await asyncio.to_thread(baseline_path.exists):
+        logger.warning(f"No baseline at {baseline_path}, run with --save-baseline to create one")
+        return 0
+
+    regressions = compare_with_baseline(
+        report, json.loads(await asyncio.to_thread(baseline_path.read_text)), options.tolerance
+    )
+    for regression in regressions:
+        logger.error(f"Regression: {regression}")
+    if regressions or benchmark.failed_users or benchmark.app.errors:
+        return 1
+
+    logger.success("No regressions against baseline")
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Замер производительности регистрации пользователей. "
+        "Требуются локальные Postgres и Minio, инициализированные UI, настройки берутся из .env"
+    )
+    parser.add_argument("--users", type=int, default=100, help="количество синтетических пользователей")
+    parser.add_argument("--concurrency", type=int, default=20, help="количество одновременно активных пользователей")
+    parser.add_argument("--keyboard-hits", type=int, default=5, help="нажатий клавиатуры после регистрации")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка эмулятора Bot API в секундах")
+    parser.add_argument("--seed", type=int, default=0, help="начальное значение выбора кнопок")
+    parser.add_argument("--answers", help="JSON файл ответов на текстовые вопросы: ключ поля -> ответ")
+    parser.add_argument("--with-jobs", action="store_true", help="не отключать фоновые задачи бота")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="файл сохранённых результатов")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить результаты как эталон")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="допустимое ухудшение задержки и пропускной способности"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
@@ -188,3 +188,7 @@ class UserAfterChangeNotFoundError(Exception):
 
 class NextReplyConditionMessageAfterFastAnswerWasNotFoundError(Exception):
     """Следующее сообщение не найдено после ответа пользователя на быстрое сообщение"""
+
+
+class TelegramFileHasNoPathError(Exception):
+    """Telegram не вернул путь для загрузки файла"""
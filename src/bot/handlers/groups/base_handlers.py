@@ -1,12 +1,15 @@
-from jinja2 import Template
+from jinja2 import Environment, Template, meta
 from loguru import logger
-from sqlalchemy import insert, select
+from sqlalchemy import insert
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 from src.bot.helpers.groups import get_group_default_keyboard, get_group_message_data
+from src.bot.helpers.news import parse_news_tags
 from src.utils.custom_types import GroupStatusEnum
-from src.utils.db_model import NewsPost, User
+from src.utils.db_model import NewsPost, NewsPostTag
+from src.utils.user_pivot import select_users_plain_dicts
+from src.utils.user_statistics import get_user_statistics
 
 
 async def help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -54,16 +57,24 @@ async def report_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         logger.debug(f"Got report command from group {group.chat_id=} as {group.status=}... ignoring")
         return
 
+    template_source = settings.group_admin_status_report_message_j2_template
     async with app.provider.db_sessionmaker() as session:
-        users = [user.to_plain_dict() for user in await session.scalars(select(User))]
+        stats = await get_user_statistics(session)
+        users = None
+        if _report_lists_users(template_source):
+            logger.debug("Report template uses users listing, loading all users")
+            users = await select_users_plain_dicts(session)
 
     await message.reply_markdown(
-        await Template(settings.group_admin_status_report_message_j2_template, enable_async=True).render_async(
-            users=users
-        )
+        await Template(template_source, enable_async=True).render_async(stats=stats, users=users)
     )
 
 
+def _report_lists_users(template_source: str) -> bool:
+    """Использует ли шаблон отчёта полный список пользователей `users`"""
+    return "users" in meta.find_undeclared_variables(Environment().parse(template_source))
+
+
 async def channel_publication_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обработчик публикации в канале новостей
@@ -89,7 +100,14 @@ async def channel_publication_handler(update: Update, context: ContextTypes.DEFA
 
     message_id = message.id
     async with app.provider.db_sessionmaker() as session:
-        await session.execute(insert(NewsPost).values(chat_id=group.chat_id, message_id=message_id, tags=tags))
+        news_post_id = await session.scalar(
+            insert(NewsPost).values(chat_id=group.chat_id, message_id=message_id, tags=tags).returning(NewsPost.id)
+        )
+        normalized_tags = parse_news_tags(text)
+        if normalized_tags:
+            await session.execute(
+                insert(NewsPostTag), [{"tag": tag, "news_post_id": news_post_id} for tag in normalized_tags]
+            )
         await session.commit()
         logger.debug(f"Added new news publication from {group.chat_id=} with {message_id=}")
         return
@@ -1,8 +1,8 @@
 import io
 import zipfile
 from datetime import datetime
+from typing import TYPE_CHECKING
 
-import pandas as pd
 from jinja2 import Template
 from loguru import logger
 from sqlalchemy import insert, select
@@ -10,7 +10,6 @@ from sqlalchemy import update as sql_update
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.helpers import escape_markdown
-from xlsxwriter.worksheet import Worksheet
 
 from src.bot.exceptions import GroupPassesNoBucketError, GroupPassesNoFieldError
 from src.bot.helpers.groups import (
@@ -23,6 +22,10 @@ from src.bot.helpers.telegram import send_long_markdown_splitted_by_newlines
 from src.bot.telegram.callback_constants import GroupApprovePassesConversation
 from src.utils.custom_types import FieldTypeEnum, PassSubmitStatusEnum, PersonalNotificationStatusEnum
 from src.utils.db_model import Field, User, UserFieldValue
+from src.utils.user_pivot import select_users_plain_dicts
+
+if TYPE_CHECKING:
+    from xlsxwriter.worksheet import Worksheet
 
 
 async def text_key_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int | None:
@@ -47,18 +50,19 @@ async def download_submited_key_handler(update: Update, context: ContextTypes.DE
         logger.debug(f"Got download submitted from group without pass management {group.chat_id=}")
         return ConversationHandler.END
 
+    # pandas загружается при первой выгрузке, а не при запуске бота
+    import pandas as pd  # noqa: PLC0415
+
     async with app.provider.db_sessionmaker() as session:
-        users_selected = await session.execute(
-            select(User).where(User.pass_status == PassSubmitStatusEnum.SUBMITED).order_by(User.id.asc())
+        users_df = pd.DataFrame(
+            await select_users_plain_dicts(
+                session,
+                User.pass_status == PassSubmitStatusEnum.SUBMITED,
+                i18n=app.provider.config.i18n,
+                result_dict_type="ordered_pass_report",
+            )
         )
 
-    users_df = pd.DataFrame(
-        [
-            user.to_plain_dict(i18n=app.provider.config.i18n, result_dict_type="ordered_pass_report")
-            for user in users_selected.scalars()
-        ]
-    )
-
     if settings.user_pass_field_plain not in users_df.columns:
         users_df[settings.user_pass_field_plain] = None
 
@@ -187,6 +191,10 @@ async def upload_aproved_passes_xlsx_document_handler(update: Update, context: C
         return ConversationHandler.END
 
     bio = await group_passes_download_document(message)
+
+    # pandas загружается при первой загрузке таблицы, а не при запуске бота
+    import pandas as pd  # noqa: PLC0415
+
     passes_df = pd.read_excel(bio)
 
     logger.debug(f"Passes df:\n{passes_df}")
@@ -202,10 +210,9 @@ async def upload_aproved_passes_xlsx_document_handler(update: Update, context: C
 
     async with app.provider.db_sessionmaker() as session:
         if not passes_not_to_save_df.empty:
-            user_objects_not_to_save = await session.scalars(
-                select(User).where(User.id.in_(passes_not_to_save_df["id"].to_numpy()))
+            user_dicts_not_to_save = await select_users_plain_dicts(
+                session, User.id.in_(passes_not_to_save_df["id"].to_numpy())
             )
-            user_dicts_not_to_save = [user.to_plain_dict() for user in user_objects_not_to_save]
             await send_long_markdown_splitted_by_newlines(
                 message,
                 await Template(
@@ -214,7 +221,7 @@ async def upload_aproved_passes_xlsx_document_handler(update: Update, context: C
             )
 
         logger.debug(f"Passes to be saved df:\n{passes_to_save_df[['id']]}")
-        user_objects_saved: list[dict[str, str | int | None]] = []
+        saved_user_ids: list[int] = []
         for _, row in passes_to_save_df.iterrows():
             field_id = await session.scalar(select(Field.id).where(Field.key == pass_field_key))
             if not field_id:
@@ -249,12 +256,13 @@ async def upload_aproved_passes_xlsx_document_handler(update: Update, context: C
                     )
                 )
 
-            user_saved = await session.scalar(select(User).where(User.id == user_id))
-            if user_saved:
-                user_objects_saved += [user_saved.to_plain_dict()]
+            saved_user_ids.append(user_id)
 
             logger.success(f"Updated pass field for user {user_id=} and {field_id=}")
 
+        user_objects_saved = []
+        if saved_user_ids:
+            user_objects_saved = await select_users_plain_dicts(session, User.id.in_(saved_user_ids))
         await session.commit()
 
     await send_long_markdown_splitted_by_newlines(
@@ -93,8 +93,8 @@ async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     # Сохранение ответа
     await user_upsert_string_field_value(app, user, field, callback_query_message, field_value)
 
-    # Расчитать поля пользователя
-    await user_calculate_after_registration_fields(app, user)
+    # Расчитать поля пользователя, зависящие от ответа
+    await user_calculate_after_registration_fields(app, user, [field.key])
 
 
 async def _send_next_reply_message(
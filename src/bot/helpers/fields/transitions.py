@@ -1,6 +1,6 @@
 from jinja2 import Template
 from loguru import logger
-from sqlalchemy import Column, select
+from sqlalchemy import Column, Select, select
 from telegram import Bot, Message
 from telegram.constants import ParseMode
 
@@ -12,18 +12,17 @@ from src.bot.exceptions import (
 )
 from src.bot.helpers.fields.keyboards import construct_field_reply_keyboard_markup
 from src.bot.helpers.fields.values.prepare import user_prepare_field_value_or_answer_type_validation_error
-from src.bot.helpers.fields.values.upsert import (
-    upload_telegram_file_to_minio,
-    user_upsert_field_value_and_return_file_to_save,
-)
+from src.bot.helpers.fields.values.upsert import user_upsert_field_value_and_enqueue_file
 from src.bot.helpers.users.me_information import prepare_me_information_message_documents_photos_text_and_reply_keyboard
 from src.bot.helpers.users.passes import construct_pass_submit_inline_keyboard
 from src.bot.helpers.users.registration import update_user_registration_and_send_message
 from src.bot.telegram.application import BBApplication
 from src.utils.custom_types import FieldStatusEnum, FieldTypeEnum, ReplyTypeEnum
 from src.utils.db_model import Field, FieldBranch, Settings, User
+from src.utils.tracing import traced
 
 
+@traced
 async def get_first_field_of_branch(app: BBApplication, field_branch_key: str) -> Field:
     """
     Получить первое пользовательское поле, который нужно задать пользователю при регистрации
@@ -41,6 +40,7 @@ async def get_first_field_of_branch(app: BBApplication, field_branch_key: str) -
         return field
 
 
+@traced
 async def user_upsert_field_value_and_send_next_question_or_final(
     app: BBApplication, user: User, field: Field, message: Message, settings: Settings
 ) -> None:
@@ -53,24 +53,21 @@ async def user_upsert_field_value_and_send_next_question_or_final(
 
     Если пользователь отвечает на все вопросы ветки вопросов по кнопке - отправить финальное сообщение
 
-    Если пользователь отправил файл для вопроса, то он будет сохранён после ответа пользователю
+    Если пользователь отправил файл для вопроса, то он будет поставлен в очередь загрузки до ответа пользователю
     """
     # Подготовить значение поля
     field_value = await user_prepare_field_value_or_answer_type_validation_error(app, user, field, message, settings)
     if not field_value:
         return
 
-    # Сохранить значение поля в БД
-    file = await user_upsert_field_value_and_return_file_to_save(app, user, field, message, field_value, settings)
+    # Сохранить значение поля в БД и поставить файл в очередь загрузки если он был отправлен
+    await user_upsert_field_value_and_enqueue_file(app, user, field, message, field_value, settings)
 
     # Обновить пользователя
     await user_set_next_field_and_send_next_question_or_final(app, user, field, message, settings)
 
-    # Сохранить файл  если он был отправлен
-    if file:
-        await upload_telegram_file_to_minio(app, user, field, file, settings)
-
 
+@traced
 async def user_upsert_changed_field_value_and_send_complete(
     app: BBApplication, user: User, field: Field, message: Message, settings: Settings
 ) -> None:
@@ -84,8 +81,8 @@ async def user_upsert_changed_field_value_and_send_complete(
     if not field_value:
         return
 
-    # Сохранить значение поля в БД
-    file = await user_upsert_field_value_and_return_file_to_save(app, user, field, message, field_value, settings)
+    # Сохранить значение поля в БД и поставить файл в очередь загрузки если он был отправлен
+    await user_upsert_field_value_and_enqueue_file(app, user, field, message, field_value, settings)
 
     # Обновить пользователя и выслать подтверждение об изменении поля
     changed_field_text = await Template(settings.user_change_reply_message_j2_template, enable_async=True).render_async(
@@ -102,10 +99,6 @@ async def user_upsert_changed_field_value_and_send_complete(
         pass_field_change=False,
     )
 
-    # Сохранить файл  если он был отправлен
-    if file:
-        await upload_telegram_file_to_minio(app, user, field, file, settings)
-
     # Обновление текста и клавиатуры сообщения с данными пользователя
     try:
         await _change_user_information_on_change_message(app, user, field, settings)
@@ -115,6 +108,7 @@ async def user_upsert_changed_field_value_and_send_complete(
         )
 
 
+@traced
 async def _change_user_information_on_change_message(
     app: BBApplication, user: User, field: Field, settings: Settings
 ) -> None:
@@ -151,6 +145,7 @@ async def _change_user_information_on_change_message(
     )
 
 
+@traced
 async def user_set_next_field_and_send_next_question_or_final(
     app: BBApplication, user: User, field: Field, message: Message, settings: Settings
 ) -> None:
@@ -211,6 +206,20 @@ async def user_set_next_field_and_send_next_question_or_final(
         return
 
 
+def select_next_field_in_branch(field: Field) -> Select[tuple[Field]]:
+    """Select запрос следующего вопроса в ветке поля"""
+    return (
+        select(Field)
+        .where(Field.branch_id == field.branch_id)
+        .where(Field.order_place > field.order_place)
+        .where(Field.status == FieldStatusEnum.NORMAL)
+        .where(Field.type != FieldTypeEnum.BOOLEAN)
+        .order_by(Field.order_place.asc())
+        .limit(1)
+    )
+
+
+@traced
 async def _user_get_next_field(app: BBApplication, user: User, field: Field) -> Field | None:
     """
     Получить следующий вопрос в той же ветке или первый вопрос следующей ветке если она есть для пользователя
@@ -221,15 +230,7 @@ async def _user_get_next_field(app: BBApplication, user: User, field: Field) ->
         return None
 
     async with app.provider.db_sessionmaker() as session:
-        next_field = await session.scalar(
-            select(Field)
-            .where(Field.branch_id == field.branch_id)
-            .where(Field.order_place > field.order_place)
-            .where(Field.status == FieldStatusEnum.NORMAL)
-            .where(Field.type != FieldTypeEnum.BOOLEAN)
-            .order_by(Field.order_place.asc())
-            .limit(1)
-        )
+        next_field = await session.scalar(select_next_field_in_branch(field))
         if next_field:
             return next_field
 
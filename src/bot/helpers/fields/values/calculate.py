@@ -1,41 +1,255 @@
-from jinja2 import Template
+import asyncio
+import functools
+from collections.abc import Iterable
+from graphlib import CycleError, TopologicalSorter
+
+from jinja2 import Environment, Template, TemplateSyntaxError, nodes
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import bindparam, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.bot.exceptions import CouldNotCalculateJinja2TemplateFieldAfterUserRegistrationError
 from src.bot.helpers.fields.values.prepare import prepare_field_value_str_value
-from src.bot.helpers.fields.values.upsert import user_upsert_string_field_value
 from src.bot.telegram.application import BBApplication
-from src.utils.custom_types import FieldStatusEnum
-from src.utils.db_model import Field, User
+from src.utils.custom_types import FieldStatusEnum, UserStatusEnum
+from src.utils.db_model import Field, User, UserFieldValue
+from src.utils.user_pivot import select_users_plain_dicts
 
+COMPILED_TEMPLATES_CACHE_SIZE = 256
+"""Количество скомпилированных шаблонов вычисляемых полей, хранимых в памяти"""
 
-async def user_calculate_after_registration_fields(app: BBApplication, user: User) -> None:
-    """Вычислить поля, вычисляемые после регистрации, пользователя"""
-    logger.debug(f"Calculating after registration fields for user {user.id=}")
 
-    async with app.provider.db_sessionmaker() as session:
-        jinja2_after_user_registration_fields = await session.scalars(
-            select(Field).where(Field.status == FieldStatusEnum.JINJA2_FROM_USER_AFTER_REGISTRATION)
+@functools.lru_cache(maxsize=COMPILED_TEMPLATES_CACHE_SIZE)
+def compile_field_template(source: str) -> Template:
+    """Скомпилировать шаблон вычисляемого поля - одинаковый текст шаблона компилируется один раз"""
+    return Template(source, enable_async=True)
+
+
+@functools.lru_cache(maxsize=COMPILED_TEMPLATES_CACHE_SIZE)
+def field_template_dependencies(source: str) -> frozenset[str] | None:
+    """
+    Ключи полей пользователя, используемые шаблоном вычисляемого поля: `user.key` и `user["key"]`
+
+    Возвращает None, если зависимости нельзя определить статически (например, пользователь передаётся в фильтр
+    целиком или используется `user.get(...)`) - тогда поле пересчитывается при любом изменении
+    """
+    try:
+        parsed = Environment().parse(source)
+    except TemplateSyntaxError:
+        return None
+
+    keys: set[str] = set()
+    user_accesses: set[int] = set()
+    for node in parsed.find_all((nodes.Getattr, nodes.Getitem)):
+        if not isinstance(node.node, nodes.Name) or node.node.name != "user":
+            continue
+        if isinstance(node, nodes.Getattr) and not hasattr(dict, node.attr):
+            keys.add(node.attr)
+        elif isinstance(node, nodes.Getitem) and isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, str):
+            keys.add(node.arg.value)
+        else:
+            return None
+        user_accesses.add(id(node.node))
+
+    if any(
+        name.name == "user" and name.ctx == "load" and id(name) not in user_accesses
+        for name in parsed.find_all(nodes.Name)
+    ):
+        return None
+    return frozenset(keys)
+
+
+def select_fields_to_recompute(fields: Iterable[Field], changed_keys: Iterable[str] | None = None) -> list[Field]:
+    """
+    Вычисляемые поля, входные данные которых изменились, в порядке зависимостей между ними
+
+    Поле выбирается, если изменилось оно само, одно из используемых им полей или другое выбранное вычисляемое поле,
+    которое оно использует; при `changed_keys=None` выбираются все поля
+    """
+    fields = list(fields)
+    dependencies = {
+        field.key: field_template_dependencies(field.question_markdown_or_j2_template or "") for field in fields
+    }
+
+    if changed_keys is None:
+        selected = {field.key: field for field in fields}
+    else:
+        affected = set(changed_keys)
+        selected = {}
+        found = True
+        while found:
+            found = False
+            for field in fields:
+                field_dependencies = dependencies[field.key]
+                if field.key not in selected and (
+                    field.key in affected or field_dependencies is None or not field_dependencies.isdisjoint(affected)
+                ):
+                    selected[field.key] = field
+                    affected.add(field.key)
+                    found = True
+
+    try:
+        order = TopologicalSorter(
+            {key: (dependencies[key] or frozenset()) & selected.keys() - {key} for key in selected}
+        ).static_order()
+        return [selected[key] for key in order]
+    except CycleError:
+        logger.warning(f"Found cyclic dependencies between computed fields {list(selected)}")
+        return list(selected.values())
+
+
+async def render_field_value(app: BBApplication, field: Field, user_dict: dict[str, str | int | None]) -> str | None:
+    """Вычислить и подготовить значение поля по плоскому словарю пользователя"""
+    if not field.question_markdown_or_j2_template:
+        raise CouldNotCalculateJinja2TemplateFieldAfterUserRegistrationError
+
+    field_value = await compile_field_template(field.question_markdown_or_j2_template).render_async(user=user_dict)
+    return prepare_field_value_str_value(app, field, field_value)
+
+
+async def upsert_computed_field_values(session: AsyncSession, values: dict[tuple[int, int], str]) -> None:
+    """
+    Вставить или обновить значения вычисляемых полей по идентификаторам пользователя и поля
+
+    Количество запросов не зависит от количества значений, транзакцию фиксирует вызывающий
+    """
+    if not values:
+        return
+
+    existing = {
+        (user_id, field_id)
+        for user_id, field_id in await session.execute(
+            select(UserFieldValue.user_id, UserFieldValue.field_id).where(
+                tuple_(UserFieldValue.user_id, UserFieldValue.field_id).in_(list(values))
+            )
+        )
+    }
+
+    if existing:
+        user_field_values = UserFieldValue.__table__
+        await session.execute(
+            update(user_field_values)
+            .where(user_field_values.c.user_id == bindparam("b_user_id"))
+            .where(user_field_values.c.field_id == bindparam("b_field_id"))
+            .values(value=bindparam("b_value"), message_id=None, value_file_id=None),
+            [
+                {"b_user_id": user_id, "b_field_id": field_id, "b_value": value}
+                for (user_id, field_id), value in values.items()
+                if (user_id, field_id) in existing
+            ],
         )
 
+    new_values = [
+        {"user_id": user_id, "field_id": field_id, "value": value}
+        for (user_id, field_id), value in values.items()
+        if (user_id, field_id) not in existing
+    ]
+    if new_values:
+        await session.execute(insert(UserFieldValue), new_values)
+
+
+async def user_calculate_after_registration_fields(
+    app: BBApplication, user: User, changed_field_keys: Iterable[str] | None = None
+) -> None:
+    """
+    Вычислить поля, вычисляемые после регистрации, пользователя
+
+    При переданных `changed_field_keys` вычисляются только поля, зависящие от изменённых полей
+    """
+    logger.debug(f"Calculating after registration fields for user {user.id=} after change of {changed_field_keys=}")
+
     user_dict = user.to_plain_dict()
 
     logger.debug(f"Calculating user fields over values {user_dict=}")
 
-    for field in jinja2_after_user_registration_fields:
-        logger.debug(f"Calculating after registration field {field.key=} for user {user.id=}")
+    async with app.provider.db_sessionmaker() as session:
+        jinja2_after_user_registration_fields = select_fields_to_recompute(
+            await session.scalars(
+                select(Field).where(Field.status == FieldStatusEnum.JINJA2_FROM_USER_AFTER_REGISTRATION)
+            ),
+            changed_field_keys,
+        )
+
+        values: dict[tuple[int, int], str] = {}
+        for field in jinja2_after_user_registration_fields:
+            logger.debug(f"Calculating after registration field {field.key=} for user {user.id=}")
+            field_value = await render_field_value(app, field, user_dict)
+            if field_value:
+                values[(user.id, field.id)] = field_value
+                # Зависящие поля вычисляются позже по уже обновлённому значению
+                user_dict[field.key] = field_value
+
+        await upsert_computed_field_values(session, values)
+        await session.commit()
+
+
+async def recompute_after_registration_fields(app: BBApplication, field_ids: Iterable[int]) -> int:
+    """
+    Пересчитать поля, вычисляемые после регистрации, и зависящие от них вычисляемые поля для всех активных пользователей
+
+    Пользователи загружаются пачками по возрастанию идентификатора, значения пачки сохраняются одной транзакцией
 
-        if not field.question_markdown_or_j2_template:
-            raise CouldNotCalculateJinja2TemplateFieldAfterUserRegistrationError
+    Возвращает количество сохранённых значений
+    """
+    batch_size = app.provider.config.computed_fields_batch_size
 
-        field_value = await Template(
-            field.question_markdown_or_j2_template,
-            enable_async=True,
-        ).render_async(user=user_dict)
+    async with app.provider.db_sessionmaker() as session:
+        computed_fields = list(
+            await session.scalars(
+                select(Field).where(Field.status == FieldStatusEnum.JINJA2_FROM_USER_AFTER_REGISTRATION)
+            )
+        )
+        field_ids = set(field_ids)
+        fields = select_fields_to_recompute(
+            computed_fields, [field.key for field in computed_fields if field.id in field_ids]
+        )
+        users_count = await session.scalar(select(func.count(User.id)).where(User.status == UserStatusEnum.ACTIVE))
+
+    if not fields:
+        return 0
+
+    logger.info(f"Recomputing fields {[field.key for field in fields]} for {users_count} users")
 
-        field_value_prepared = prepare_field_value_str_value(app, field, field_value)
-        if field_value_prepared:
-            await user_upsert_string_field_value(
-                app=app, user=user, field=field, message=None, field_value=field_value_prepared
+    last_user_id = 0
+    users_done = 0
+    values_saved = 0
+    while True:
+        async with app.provider.db_sessionmaker() as session:
+            users_dicts = await select_users_plain_dicts(
+                session,
+                User.id.in_(
+                    select(User.id)
+                    .where(User.status == UserStatusEnum.ACTIVE)
+                    .where(User.id > last_user_id)
+                    .order_by(User.id.asc())
+                    .limit(batch_size)
+                ),
             )
+            if not users_dicts:
+                break
+
+            values: dict[tuple[int, int], str] = {}
+            for user_dict in users_dicts:
+                user_id = int(user_dict["id"])  # type: ignore
+                for field in fields:
+                    try:
+                        field_value = await render_field_value(app, field, user_dict)
+                    except Exception as e:
+                        logger.warning(f"Could not recompute field {field.key=} for user {user_id=}: {e}")
+                        continue
+                    if field_value:
+                        values[(user_id, field.id)] = field_value
+                        user_dict[field.key] = field_value
+
+                # Не занимать цикл событий на всю пачку - обработчики обновлений продолжают работать
+                await asyncio.sleep(0)
+
+            await upsert_computed_field_values(session, values)
+            await session.commit()
+
+        last_user_id = user_id
+        users_done += len(users_dicts)
+        values_saved += len(values)
+        logger.info(f"Recomputed fields for {users_done}/{users_count} users")
+
+    return values_saved
@@ -1,4 +1,5 @@
-from io import BytesIO
+from datetime import datetime
+from typing import Any
 
 from loguru import logger
 from sqlalchemy import insert, update
@@ -10,37 +11,50 @@ from src.bot.exceptions import (
 )
 from src.bot.helpers.fields.values.get import user_get_name_field_value
 from src.bot.telegram.application import BBApplication
-from src.utils.db_model import Field, Settings, User, UserFieldValue
+from src.utils.db_model import Field, FileIngestion, Settings, User, UserFieldValue
 from src.utils.minio_client import ThumbnailableFileType
 
 
-async def user_upsert_field_value_and_return_file_to_save(
+async def user_upsert_field_value_and_enqueue_file(
     app: BBApplication,
     user: User,
     field: Field,
     message: Message | None,
     field_value: str | PhotoSize | Document,
     settings: Settings,
-) -> PhotoSize | Document | None:
+) -> None:
     """
     Вставить значение пользовательского поля
 
-    Учитывает тип поля и загружает файл фото или документа
-
-    Возвращает файловые типы данных
+    Учитывает тип поля: файл фото или документа ставится в очередь загрузки в Minio
+    в той же транзакции, что и значение поля - сама загрузка выполняется задачей `file_ingestion`
     """
 
+    file_ingestion_values = None
     if type(field_value) is str:
         _field_value = field_value
         _field_value_file_id = None
     elif type(field_value) is PhotoSize or type(field_value) is Document:
-        _field_value, _ = await _prepare_telegram_file_filename_and_filetype(
+        if not field.bucket:
+            raise CouldNotUploadFileToMinioWithoutBucketError
+
+        logger.debug(f"Enqueueing file upload from user {user.id=}")
+        _field_value, file_type = await _prepare_telegram_file_filename_and_filetype(
             app,
             user,
             field_value,
             settings,
         )
         _field_value_file_id = field_value.file_id
+        file_ingestion_values = {
+            "timestamp": datetime.now(),  # noqa: DTZ005
+            "file_id": field_value.file_id,
+            "bucket": field.bucket,
+            "thumbnail_filename": _field_value,
+            "content_type": file_type.content_type,
+            "extension": file_type.extension,
+            "thumbnailable": file_type.thumbnailable,
+        }
 
         # Не сохраняем идентификатор файла если пользователь загрузил изображение как документ
         # Бот будет высылать изображение как фото и сохранит идентификатор файла тогда
@@ -56,12 +70,9 @@ async def user_upsert_field_value_and_return_file_to_save(
         message=message,
         field_value=_field_value,
         field_value_file_id=_field_value_file_id,
+        file_ingestion_values=file_ingestion_values,
     )
 
-    if type(field_value) is PhotoSize or type(field_value) is Document:
-        return field_value
-    return None
-
 
 async def user_upsert_string_field_value(
     app: BBApplication,
@@ -70,11 +81,12 @@ async def user_upsert_string_field_value(
     message: Message | None,
     field_value: str,
     field_value_file_id: str | None = None,
-) -> PhotoSize | Document | None:
+    file_ingestion_values: dict[str, Any] | None = None,
+) -> None:
     """
     Вставить строковое значение пользовательского поля
 
-    Вставляет значение только в БД
+    Вставляет значение только в БД, вместе со значением в очередь загрузки добавляется файл `file_ingestion_values`
     """
     message_id = message.id if message else None
     async with app.provider.db_sessionmaker() as session:
@@ -97,6 +109,9 @@ async def user_upsert_string_field_value(
                 )
             )
 
+        if file_ingestion_values:
+            await session.execute(insert(FileIngestion).values(**file_ingestion_values))
+
         await session.commit()
 
 
@@ -110,36 +125,3 @@ async def _prepare_telegram_file_filename_and_filetype(
     user_name_field_value = await user_get_name_field_value(app, user, settings)
     filename = app.provider.minio.get_thumbnail_filename(f"{user_name_field_value}.{user.id}", file_type)
     return filename, file_type
-
-
-async def upload_telegram_file_to_minio(
-    app: BBApplication,
-    user: User,
-    field: Field,
-    field_value: PhotoSize | Document,
-    settings: Settings,
-) -> None:
-    """Загружает файл из telegram в Minio"""
-    logger.debug(f"Uploading file from user {user.id=}")
-
-    thumbnail_filename, file_type = await _prepare_telegram_file_filename_and_filetype(
-        app,
-        user,
-        field_value,
-        settings,
-    )
-
-    file = await field_value.get_file()
-
-    original_bio = BytesIO()
-    await file.download_to_memory(original_bio)
-
-    if not field.bucket:
-        raise CouldNotUploadFileToMinioWithoutBucketError
-
-    await app.provider.minio.upload_original_and_thumbnail(
-        bucket=field.bucket,
-        thumbnail_filename=thumbnail_filename,
-        original_bio=original_bio,
-        thumbnailable_file_type=file_type,
-    )
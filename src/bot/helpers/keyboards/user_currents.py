@@ -1,4 +1,4 @@
-from sqlalchemy import select
+from sqlalchemy import Select, select
 from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove
 
 from src.bot.helpers.replyable_condition_messages.conditions import (
@@ -9,55 +9,58 @@ from src.utils.custom_types import KeyboardKeyStatusEnum
 from src.utils.db_model import KeyboardKey, User
 
 
-async def get_user_current_keyboard(app: BBApplication, user: User) -> ReplyKeyboardMarkup | ReplyKeyboardRemove:
-    """Получить клавиатуру, доступную пользователю"""
-    async with app.provider.db_sessionmaker() as session:
-        keyboard_keys = list(
-            await session.scalars(
-                select(KeyboardKey)
-                .where(
-                    (
-                        (KeyboardKey.status == KeyboardKeyStatusEnum.NORMAL)
-                        & (
-                            KeyboardKey.reply_condition_message_id.in_(
-                                compound_select_user_awaliable_replyable_condition_messages(user)
-                            )
-                        )
-                    )
-                    | (
-                        (KeyboardKey.status.in_([KeyboardKeyStatusEnum.ME, KeyboardKeyStatusEnum.ME_CHANGE]))
-                        & (KeyboardKey.branch_id.is_not(None))
-                    )
-                    | (
-                        (
-                            KeyboardKey.status.in_(
-                                [
-                                    KeyboardKeyStatusEnum.NEWS,
-                                    KeyboardKeyStatusEnum.PASS,
-                                    KeyboardKeyStatusEnum.PROMOCODES,
-                                ]
-                            )
-                        )
-                        & (KeyboardKey.branch_id.is_(None))
-                        & (KeyboardKey.reply_condition_message_id.is_(None))
+def select_user_current_keyboard_keys(user: User) -> Select[tuple[KeyboardKey]]:
+    """Select запрос кнопок клавиатуры, доступных пользователю на текущем уровне"""
+    return (
+        select(KeyboardKey)
+        .where(
+            (
+                (KeyboardKey.status == KeyboardKeyStatusEnum.NORMAL)
+                & (
+                    KeyboardKey.reply_condition_message_id.in_(
+                        compound_select_user_awaliable_replyable_condition_messages(user)
                     )
-                    | (
-                        (KeyboardKey.status == KeyboardKeyStatusEnum.BACK)
-                        & (KeyboardKey.branch_id.is_(None))
-                        & (KeyboardKey.reply_condition_message_id.is_(None))
-                        & (KeyboardKey.parent_key_id.is_not(None))
-                    )
-                    | (
-                        (KeyboardKey.status == KeyboardKeyStatusEnum.DEFERRED)
-                        & (KeyboardKey.branch_id.is_(None))
-                        & (KeyboardKey.reply_condition_message_id.is_(None))
-                        & (user.deferred_field_id is not None)  # type: ignore
+                )
+            )
+            | (
+                (KeyboardKey.status.in_([KeyboardKeyStatusEnum.ME, KeyboardKeyStatusEnum.ME_CHANGE]))
+                & (KeyboardKey.branch_id.is_not(None))
+            )
+            | (
+                (
+                    KeyboardKey.status.in_(
+                        [
+                            KeyboardKeyStatusEnum.NEWS,
+                            KeyboardKeyStatusEnum.PASS,
+                            KeyboardKeyStatusEnum.PROMOCODES,
+                        ]
                     )
                 )
-                .where(KeyboardKey.parent_key_id == user.curr_keyboard_key_parent_id)
-                .order_by(KeyboardKey.id.asc())
+                & (KeyboardKey.branch_id.is_(None))
+                & (KeyboardKey.reply_condition_message_id.is_(None))
+            )
+            | (
+                (KeyboardKey.status == KeyboardKeyStatusEnum.BACK)
+                & (KeyboardKey.branch_id.is_(None))
+                & (KeyboardKey.reply_condition_message_id.is_(None))
+                & (KeyboardKey.parent_key_id.is_not(None))
+            )
+            | (
+                (KeyboardKey.status == KeyboardKeyStatusEnum.DEFERRED)
+                & (KeyboardKey.branch_id.is_(None))
+                & (KeyboardKey.reply_condition_message_id.is_(None))
+                & (user.deferred_field_id is not None)  # type: ignore
             )
         )
+        .where(KeyboardKey.parent_key_id == user.curr_keyboard_key_parent_id)
+        .order_by(KeyboardKey.id.asc())
+    )
+
+
+async def get_user_current_keyboard(app: BBApplication, user: User) -> ReplyKeyboardMarkup | ReplyKeyboardRemove:
+    """Получить клавиатуру, доступную пользователю"""
+    async with app.provider.db_sessionmaker() as session:
+        keyboard_keys = list(await session.scalars(select_user_current_keyboard_keys(user)))
     keyboard_keys_len = len(keyboard_keys)
     if keyboard_keys_len == 0:
         return ReplyKeyboardRemove()
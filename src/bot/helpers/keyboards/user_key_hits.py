@@ -14,8 +14,10 @@ from src.bot.helpers.users.passes import user_send_pass_information
 from src.bot.telegram.application import BBApplication
 from src.utils.custom_types import KeyboardKeyStatusEnum
 from src.utils.db_model import KeyboardKey, Settings, User
+from src.utils.tracing import traced
 
 
+@traced
 async def reply_keyboard_key_hit(app: BBApplication, user: User, message: Message, settings: Settings) -> None:
     """
     Обработать нажатие клавиатуры пользователя
@@ -51,6 +53,7 @@ async def reply_keyboard_key_hit(app: BBApplication, user: User, message: Messag
     await _perform_key_hit_action(app, updated_user, keyboard_key, message, settings)
 
 
+@traced
 async def _get_next_parent_keyboard_key(app: BBApplication, keyboard_key: KeyboardKey) -> int | None:
     """
     Получить значение родительской кнопки пользователя
@@ -77,6 +80,7 @@ async def _get_next_parent_keyboard_key(app: BBApplication, keyboard_key: Keyboa
         return keyboard_key.parent_key_id
 
 
+@traced
 async def _perform_key_hit_action(
     app: BBApplication, user: User, keyboard_key: KeyboardKey, message: Message, settings: Settings
 ) -> None:
@@ -1,28 +1,61 @@
+import re
+from itertools import groupby
+
 from loguru import logger
 from sqlalchemy import select
 from telegram import Bot
 
 from src.bot.telegram.application import BBApplication
-from src.utils.db_model import KeyboardKey, NewsPost, Settings, User
+from src.utils.db_model import KeyboardKey, NewsPost, NewsPostTag, Settings, User
+
+MAX_FORWARD_MESSAGES = 100
+"""Наибольшее количество сообщений в одном вызове forwardMessages"""
+
+NEWS_TAG_PATTERN = re.compile(r"#(\w+)")
+"""Тег в тексте публикации: `#` и следующие за ним буквы, цифры и `_` - знаки препинания после тега не входят в него"""
+
+
+def normalize_news_tag(tag: str) -> str:
+    """Привести тег к виду, в котором он хранится: нижний регистр без `#`"""
+    return tag.strip().lstrip("#").lower()
+
+
+def parse_news_tags(text: str) -> set[str]:
+    """Получить нормализованные теги из текста публикации"""
+    return {normalize_news_tag(tag) for tag in NEWS_TAG_PATTERN.findall(text)}
 
 
 async def reply_news_posts(app: BBApplication, user: User, keyboard_key: KeyboardKey, settings: Settings) -> None:
-    """Отправить новостные посты"""
+    """
+    Отправить новостные посты
+
+    Посты пересылаются пачками по каналам-источникам с сохранением порядка публикации,
+    если пачку переслать не удалось - посты пачки пересылаются по одному
+    """
     bot: Bot = app.bot
     logger.debug(f"Sending news post to user {user.id=}")
     async with app.provider.db_sessionmaker() as session:
         news_select = (
-            select(NewsPost).order_by(NewsPost.id.desc()).limit(int(settings.user_number_of_last_news_to_show_int))
+            select(NewsPost.chat_id, NewsPost.message_id)
+            .order_by(NewsPost.id.desc())
+            .limit(int(settings.user_number_of_last_news_to_show_int))
         )
         if keyboard_key.news_tag:
-            news_select = news_select.where(NewsPost.tags.icontains(keyboard_key.news_tag))
-        news_posts = list(await session.scalars(news_select))
-        for news_post in reversed(news_posts):
+            news_select = news_select.join(NewsPostTag, NewsPostTag.news_post_id == NewsPost.id).where(
+                NewsPostTag.tag == normalize_news_tag(keyboard_key.news_tag)
+            )
+        news_posts = list(await session.execute(news_select))
+
+    for chat_id, posts in groupby(reversed(news_posts), key=lambda news_post: news_post.chat_id):
+        message_ids = sorted(news_post.message_id for news_post in posts)
+        for idx in range(0, len(message_ids), MAX_FORWARD_MESSAGES):
+            batch = message_ids[idx : idx + MAX_FORWARD_MESSAGES]
             try:
-                await bot.forward_message(
-                    chat_id=user.chat_id,
-                    from_chat_id=news_post.chat_id,
-                    message_id=news_post.message_id,
-                )
+                await bot.forward_messages(chat_id=user.chat_id, from_chat_id=chat_id, message_ids=batch)
             except Exception:
-                logger.warning(f"Was not able to forward message with {news_post.id=}")
+                logger.warning(f"Was not able to forward messages {batch=} from {chat_id=}, forwarding one by one")
+                for message_id in batch:
+                    try:
+                        await bot.forward_message(chat_id=user.chat_id, from_chat_id=chat_id, message_id=message_id)
+                    except Exception:
+                        logger.warning(f"Was not able to forward message {message_id=} from {chat_id=}")
@@ -37,13 +37,14 @@ async def send_replyable_condition_message(
     logger.debug(f"Sending Replyable Condition Message {reply_condition_message.id=} to chat {chat_id=}")
 
     photo = None
+    media_key = None
     if reply_condition_message.photo_link:
         photo = reply_condition_message.photo_link
     elif reply_condition_message.photo_file_id:
         photo = reply_condition_message.photo_file_id
     elif reply_condition_message.photo_bucket and reply_condition_message.photo_filename:
-        photo, _ = await app.provider.minio.download(
-            reply_condition_message.photo_bucket, reply_condition_message.photo_filename
+        photo, media_key = await app.media_cache.prepare(
+            reply_condition_message.photo_bucket, reply_condition_message.photo_filename, "image"
         )
 
     photo_message = None
@@ -76,14 +77,8 @@ async def send_replyable_condition_message(
             reply_markup=reply_keyboard,
         )
 
-    if photo_message and photo_message.photo and not reply_condition_message.photo_file_id:
-        async with app.provider.db_sessionmaker() as session:
-            await session.execute(
-                update(ReplyableConditionMessage)
-                .where(ReplyableConditionMessage.id == reply_condition_message.id)
-                .values(photo_file_id=photo_message.photo[-1].file_id)
-            )
-            await session.commit()
+    if photo_message and photo_message.photo:
+        app.media_cache.remember(media_key, photo_message.photo[-1].file_id)
 
 
 async def send_replyable_condition_message_to_user(
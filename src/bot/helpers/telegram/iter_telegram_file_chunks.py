@@ -0,0 +1,43 @@
+import asyncio
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from telegram import File
+
+from src.bot.exceptions import TelegramFileHasNoPathError
+from src.bot.telegram.metrics import MeasuredHTTPXRequest
+
+TELEGRAM_FILE_CHUNK_SIZE = 256 * 1024
+"""Размер части файла, загружаемой из Telegram за один раз"""
+
+
+async def iter_telegram_file_chunks(file: File, chunk_size: int = TELEGRAM_FILE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Загружать файл из Telegram по частям без буферизации всего файла в памяти
+
+    Файл загружается через тот же HTTP клиент, что и запросы к Bot API; транспорты без потоковой загрузки
+    (эмулятор в замерах) загружают файл целиком
+
+    Поддерживает локальный сервер Bot API, который возвращает путь к файлу на диске
+    """
+    if not file.file_path:
+        raise TelegramFileHasNoPathError
+
+    bot = file.get_bot()
+    if bot.local_mode:
+        local_file = await asyncio.to_thread(Path(file.file_path).open, "rb")
+        try:
+            while chunk := await asyncio.to_thread(local_file.read, chunk_size):
+                yield chunk
+        finally:
+            local_file.close()
+        return
+
+    if isinstance(bot.request, MeasuredHTTPXRequest):
+        async for chunk in bot.request.stream(file.file_path, chunk_size):
+            yield chunk
+        return
+
+    content = await file.download_as_bytearray()
+    for offset in range(0, len(content), chunk_size):
+        yield bytes(content[offset : offset + chunk_size])
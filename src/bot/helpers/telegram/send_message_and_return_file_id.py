@@ -6,6 +6,7 @@ from telegram.constants import ParseMode
 
 from src.bot.helpers.keyboards.user_currents import get_user_current_keyboard
 from src.bot.telegram.application import BBApplication
+from src.bot.telegram.media_cache import MediaCacheKey
 from src.utils.db_model import User
 
 
@@ -16,7 +17,13 @@ async def send_message_and_return_file_id(
     file: str | io.BytesIO | None,
     file_type: Literal["image", "document"] | None,
     filename: str | None,
+    media_key: MediaCacheKey | None = None,
 ) -> str | None:
+    """
+    Отправить пользователю сообщение с файлом или без и вернуть идентификатор отправленного файла
+
+    Если передан ключ кеша медиа - запоминает полученный идентификатор файла в кеше
+    """
     bot: Bot = app.bot
     reply_keyboard = await get_user_current_keyboard(app, user)
     if not file_type or not file:
@@ -37,7 +44,9 @@ async def send_message_and_return_file_id(
             parse_mode=ParseMode.MARKDOWN,
             reply_markup=reply_keyboard,
         )
-        return send_message.photo[-1].file_id if send_message.photo else None
+        file_id = send_message.photo[-1].file_id if send_message.photo else None
+        app.media_cache.remember(media_key, file_id)
+        return file_id
 
     if file_type == "document":
         send_message = await bot.send_document(
@@ -48,6 +57,8 @@ async def send_message_and_return_file_id(
             parse_mode=ParseMode.MARKDOWN,
             reply_markup=reply_keyboard,
         )
-        return send_message.document.file_id if send_message.document else None
+        file_id = send_message.document.file_id if send_message.document else None
+        app.media_cache.remember(media_key, file_id)
+        return file_id
 
     return None
@@ -1,8 +1,7 @@
-from io import BytesIO
 from typing import Literal
 
 from loguru import logger
-from sqlalchemy import Column, select, update
+from sqlalchemy import Column, select
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
 
 from src.bot.helpers.keyboards.user_currents import get_user_current_keyboard
@@ -11,7 +10,7 @@ from src.bot.helpers.telegram.send_message_and_return_file_id import send_messag
 from src.bot.telegram.application import BBApplication
 from src.bot.telegram.callback_constants import UserChangeFieldCallback
 from src.utils.custom_types import FieldStatusEnum, FieldTypeEnum, UserFieldDataPrepared
-from src.utils.db_model import Field, KeyboardKey, User, UserFieldValue
+from src.utils.db_model import Field, KeyboardKey, User
 
 
 async def user_send_me_information(
@@ -40,25 +39,31 @@ async def user_send_me_information(
         app, user, keyboard_key.branch_id
     )
 
-    for field, file, filename in file_descriptor:
-        file_type = None
+    for field, prepeared_field_value, filename in file_descriptor:
+        file_type: Literal["image", "document"] | None = None
         if field.type == FieldTypeEnum.IMAGE:
             file_type = "image"
         elif field.type in [FieldTypeEnum.ZIP_DOCUMENT, FieldTypeEnum.PDF_DOCUMENT]:
             file_type = "document"
 
-        if file_type:
-            file_id = await send_message_and_return_file_id(
-                app=app,
-                user=user,
-                text=None,
-                file=file,
-                file_type=file_type,
-                filename=filename,
-            )
+        if not file_type or not prepeared_field_value.bucket:
+            continue
 
-            if file_id and type(file) is not str:
-                await _user_field_value_set_value_field_id(app, user, field, file_id)
+        file, media_key = await app.media_cache.prepare(
+            prepeared_field_value.bucket, filename, file_type, prepeared_field_value.value_file_id
+        )
+        if not file:
+            continue
+
+        await send_message_and_return_file_id(
+            app=app,
+            user=user,
+            text=None,
+            file=file,
+            file_type=file_type,
+            filename=filename,
+            media_key=media_key,
+        )
 
     await message.reply_markdown(
         text=text if text else keyboard_key.key,
@@ -66,20 +71,9 @@ async def user_send_me_information(
     )
 
 
-async def _user_field_value_set_value_field_id(app: BBApplication, user: User, field: Field, file_id: str) -> None:
-    async with app.provider.db_sessionmaker() as session:
-        await session.execute(
-            update(UserFieldValue)
-            .where(UserFieldValue.user_id == user.id)
-            .where(UserFieldValue.field_id == field.id)
-            .values(value_file_id=file_id)
-        )
-        await session.commit()
-
-
 async def prepare_me_information_message_documents_photos_text_and_reply_keyboard(
     app: BBApplication, user: User, field_branch_id: Column[int | None]
-) -> tuple[list[tuple[Field, str | BytesIO, str]], str, InlineKeyboardMarkup]:
+) -> tuple[list[tuple[Field, UserFieldDataPrepared, str]], str, InlineKeyboardMarkup]:
     """
     Подготовить информацию о пользователе для отправки или обновления сообщения
 
@@ -89,14 +83,14 @@ async def prepare_me_information_message_documents_photos_text_and_reply_keyboar
      * field_branch_id: Column[int|None] - Идентификатор ветки пользователя, по которой следует отображать данные
 
     Возвращает tuple из:
-     * list[tuple[Field, str | BytesIO, str]] - Список высылаемых объектов фото или документов по порядку, содержит:
+     * list[tuple[Field, UserFieldDataPrepared, str]] - Список высылаемых фото или документов по порядку, содержит:
        * Field: Поле
-       * str | BytesIO: Идентификатор поля или его содержимое
-       * str: Имя файла
+       * UserFieldDataPrepared: Значение поля пользователя
+       * str: Имя файла в хранилище
      * str - Текст высылаемого сообщения - содержит все поля пользователя
      * InlineKeyboardMarkup - Разметка inline-клавиатуры для отображения с текстовым сообщением
     """
-    file_list: list[tuple[Field, str | BytesIO, str]] = []
+    file_list: list[tuple[Field, UserFieldDataPrepared, str]] = []
     text_lines: list[str] = []
     buttons: list[InlineKeyboardButton] = []
 
@@ -147,13 +141,6 @@ async def prepare_me_information_message_documents_photos_text_and_reply_keyboar
                 continue
 
             filename = app.provider.minio.get_original_filename(prepeared_field_value.value)
-
-            if prepeared_field_value.value_file_id:
-                file = prepeared_field_value.value_file_id
-            else:
-                file, _ = await app.provider.minio.download(prepeared_field_value.bucket, filename)
-
-            if file:
-                file_list += [(field, file, filename)]
+            file_list += [(field, prepeared_field_value, filename)]
 
     return file_list, "\n".join(text_lines), InlineKeyboardMarkup([[button] for button in buttons])
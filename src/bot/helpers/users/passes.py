@@ -1,6 +1,6 @@
 from jinja2 import Template
 from loguru import logger
-from sqlalchemy import select, update
+from sqlalchemy import select
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
 
 from src.bot.exceptions import NoFieldToRequestPassIsFoundError, NoPassFieldIsFoundError
@@ -100,29 +100,22 @@ async def _send_approved_pass(app: BBApplication, user: User, settings: Settings
         )
 
         if pass_user_field_value:
-            file, file_type = await prepare_field_file_value_and_type(app, pass_field, pass_user_field_value)
+            file, file_type, media_key = await prepare_field_file_value_and_type(app, pass_field, pass_user_field_value)
         else:
             file = None
             file_type = None
+            media_key = None
 
         message_text = await Template(settings.user_pass_message_j2_template, enable_async=True).render_async(
             user=user.to_plain_dict()
         )
 
-        file_id = await send_message_and_return_file_id(
+        await send_message_and_return_file_id(
             app=app,
             user=user,
             text=message_text,
             file=file,
             file_type=file_type,
             filename=pass_user_field_value.value if pass_user_field_value else None,
+            media_key=media_key,
         )
-
-        if pass_user_field_value and file_id and type(file) is not str:
-            await session.execute(
-                update(UserFieldValue)
-                .where(UserFieldValue.id == pass_user_field_value.id)
-                .values(value_file_id=file_id)
-            )
-
-        await session.commit()
@@ -2,7 +2,7 @@ from typing import Any
 
 from jinja2 import Template
 from loguru import logger
-from sqlalchemy import func, select, update
+from sqlalchemy import select, update
 from telegram import Bot, InlineKeyboardMarkup, Message, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.constants import ParseMode
 
@@ -11,7 +11,7 @@ from src.bot.helpers.fields.values.calculate import user_calculate_after_registr
 from src.bot.helpers.keyboards.user_currents import get_user_current_keyboard
 from src.bot.telegram.application import BBApplication
 from src.utils.custom_types import GroupStatusEnum, UserStatusEnum
-from src.utils.db_model import Group, Settings, User
+from src.utils.db_model import Field, Group, Settings, User, UserStatistic
 
 
 async def update_user_registration_and_send_message(
@@ -43,29 +43,57 @@ async def update_user_registration_and_send_message(
         if not updated_user:
             raise CouldNotUpdateUserRegistrationError
 
-        reply_markup = reply_keyboad_override or await get_user_current_keyboard(app, updated_user)
-        await message.reply_markdown(text, reply_markup=reply_markup)
-
-        # Расчитать поля пользователя если он закончил регистрацию или был удалён контекст ответа на вопрос
-        if (
-            user_update_values.get("status") == UserStatusEnum.ACTIVE
-            or user_update_values.get("curr_reply_message_id", -1) is None
-            or user_update_values.get("change_field_message_id", -1) is None
-        ):
-            await user_calculate_after_registration_fields(app, updated_user)
+        # Счётчик активных пользователей увеличен триггером в этой же транзакции и заблокирован до её завершения,
+        # поэтому каждая активация получает своё значение
+        active_users_count = None
+        if user_update_values.get("status") == UserStatusEnum.ACTIVE:
+            active_users_count = await session.scalar(
+                select(UserStatistic.count)
+                .where(UserStatistic.kind == "status")
+                .where(UserStatistic.key == UserStatusEnum.ACTIVE.name)
+            )
 
+        session.expunge(updated_user)
         await session.commit()
 
-    # Посчитать количество зарегистрированных пользователей если пользователь был активирован
+    reply_markup = reply_keyboad_override or await get_user_current_keyboard(app, updated_user)
+    await message.reply_markdown(text, reply_markup=reply_markup)
+
+    # Расчитать поля пользователя если он закончил регистрацию или был удалён контекст ответа на вопрос
     if user_update_values.get("status") == UserStatusEnum.ACTIVE:
-        await _count_registered_users_and_send_message_to_all_admins(app, settings)
+        await user_calculate_after_registration_fields(app, updated_user)
+    elif (
+        user_update_values.get("curr_reply_message_id", -1) is None
+        or user_update_values.get("change_field_message_id", -1) is None
+    ):
+        await user_calculate_after_registration_fields(app, updated_user, await _get_context_field_keys(app, user))
+
+    # Оповестить администраторов о количестве зарегистрированных пользователей если пользователь был активирован
+    if user_update_values.get("status") == UserStatusEnum.ACTIVE:
+        if active_users_count is None:
+            logger.warning("No active users counter found, user statistics are initialized by UI")
+            return
+        await _send_registered_users_count_to_all_admins(app, settings, active_users_count)
+
+
+async def _get_context_field_keys(app: BBApplication, user: User) -> list[str] | None:
+    """
+    Ключи полей, которые пользователь мог изменить в завершаемом контексте
+
+    При изменении поля это само поле, при ответе на сообщение - поля ветки текущего поля
+    """
+    if not user.curr_field:
+        return None
+    if user.change_field_message_id:
+        return [user.curr_field.key]
+    async with app.provider.db_sessionmaker() as session:
+        return list(await session.scalars(select(Field.key).where(Field.branch_id == user.curr_field.branch_id)))
 
 
-async def _count_registered_users_and_send_message_to_all_admins(app: BBApplication, settings: Settings) -> None:
-    """Посчитать количество зарегистрированных пользователей и выслать сообщение всем администраторм"""
+async def _send_registered_users_count_to_all_admins(app: BBApplication, settings: Settings, user_count: int) -> None:
+    """Выслать сообщение о количестве зарегистрированных пользователей всем администраторам при достижении отметки"""
     bot: Bot = app.bot
     async with app.provider.db_sessionmaker() as session:
-        user_count = await session.scalar(select(func.count()).where(User.status == UserStatusEnum.ACTIVE))
         if user_count and user_count % int(settings.group_admin_report_every_x_active_users_int) == 0:
             logger.debug(f"Performing admins notification about counted users {user_count=}")
             admin_groups = await session.scalars(
@@ -0,0 +1,31 @@
+from loguru import logger
+from sqlalchemy import delete, select
+from telegram.ext import CallbackContext
+
+from src.bot.helpers.fields.values.calculate import recompute_after_registration_fields
+from src.bot.telegram.application import BBApplication
+from src.utils.db_model import ComputedFieldRecompute
+
+
+async def job(context: CallbackContext) -> None:  # type: ignore
+    """Пересчёт полей, вычисляемых после регистрации, из очереди"""
+    app: BBApplication = context.application  # type: ignore
+
+    async with app.provider.db_sessionmaker() as session:
+        recomputes = list(await session.execute(select(ComputedFieldRecompute.id, ComputedFieldRecompute.field_id)))
+
+    if not recomputes:
+        return
+
+    # Запросы, поставленные в очередь во время пересчёта, останутся для следующего запуска
+    last_recompute_id = max(recompute.id for recompute in recomputes)
+    field_ids = sorted({recompute.field_id for recompute in recomputes})
+
+    logger.debug(f"Start recomputing fields {field_ids=}")
+    values_saved = await recompute_after_registration_fields(app, field_ids)
+
+    async with app.provider.db_sessionmaker() as session:
+        await session.execute(delete(ComputedFieldRecompute).where(ComputedFieldRecompute.id <= last_recompute_id))
+        await session.commit()
+
+    await app.write_log(f"Recomputed fields {field_ids} for all users, saved {values_saved} values")
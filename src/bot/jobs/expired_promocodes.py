@@ -11,6 +11,7 @@ from telegram.ext import CallbackContext
 from src.bot.telegram.application import BBApplication
 from src.utils.custom_types import GroupStatusEnum, PromocodeStatusEnum
 from src.utils.db_model import Group, Promocode
+from src.utils.db_notifications import PROMOCODES_CHANGED_CHANNEL, notify
 
 
 async def job(context: CallbackContext) -> None:  # type: ignore
@@ -39,6 +40,7 @@ async def job(context: CallbackContext) -> None:  # type: ignore
             .where(Promocode.id.in_([expired_promocode.id for expired_promocode in expired_promocodes]))
             .values(status=PromocodeStatusEnum.EXPIRED)
         )
+        await notify(session, PROMOCODES_CHANGED_CHANNEL)
 
         admin_groups = await session.scalars(
             select(Group).where(Group.status.in_([GroupStatusEnum.ADMIN, GroupStatusEnum.SUPER_ADMIN]))
@@ -56,5 +58,6 @@ async def job(context: CallbackContext) -> None:  # type: ignore
         logger.success("Send expired promocodes to superadmin groups")
 
         await session.commit()
+        app.promocodes_cache.invalidate()
 
     logger.debug("Done check expired promocodes")
@@ -0,0 +1,187 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from loguru import logger
+from sqlalchemy import and_, delete, exists, or_, select, update
+from sqlalchemy.orm import aliased
+from telegram.ext import CallbackContext
+
+from src.bot.helpers.telegram.iter_telegram_file_chunks import iter_telegram_file_chunks
+from src.bot.telegram.application import BBApplication
+from src.utils.custom_types import FileIngestionStatusEnum
+from src.utils.db_model import FileIngestion
+from src.utils.minio_client import ThumbnailableFileType
+
+FILE_INGESTION_MAX_ATTEMPTS = 5
+"""Количество попыток загрузки файла"""
+
+FILE_INGESTION_LEASE = timedelta(minutes=10)
+"""Время, после которого незавершённая загрузка (например, после перезапуска) будет выполнена повторно"""
+
+_running_file_ingestions: set[asyncio.Task[None]] = set()
+"""Выполняемые загрузки"""
+
+
+async def job(context: CallbackContext) -> None:  # type: ignore
+    """
+    Загрузка файлов пользователей из очереди в хранилище
+
+    Задача не ждёт завершения загрузок: из очереди забирается столько файлов, сколько загрузок можно начать,
+    каждая загрузка выполняется отдельной задачей приложения
+    """
+    app: BBApplication = context.application  # type: ignore
+
+    limit = app.provider.config.file_ingestion_concurrency - len(_running_file_ingestions)
+    if limit <= 0:
+        return
+
+    file_ingestions = await _claim_file_ingestions(app, limit)
+    if not file_ingestions:
+        return
+
+    logger.debug(f"Start ingesting {len(file_ingestions)} files")
+
+    for file_ingestion in file_ingestions:
+        task = app.create_task(_ingest_file(app, file_ingestion), name=f"file_ingestion_{file_ingestion.id}")
+        _running_file_ingestions.add(task)
+        task.add_done_callback(_running_file_ingestions.discard)
+
+
+async def _claim_file_ingestions(app: BBApplication, limit: int) -> list[FileIngestion]:
+    """
+    Забрать из очереди ожидающие загрузки и зависшие загрузки
+
+    Из нескольких записей с одним именем объекта сохраняется только последняя, а более ранние удаляются;
+    пока объект с этим именем загружается, записи с тем же именем не забираются
+    """
+    now = datetime.now()  # noqa: DTZ005
+    stale_locked_at = now - FILE_INGESTION_LEASE
+    same_object = aliased(FileIngestion)
+
+    async with app.provider.db_sessionmaker() as session:
+        await session.execute(
+            delete(FileIngestion)
+            .where(
+                or_(
+                    FileIngestion.status == FileIngestionStatusEnum.PENDING,
+                    and_(
+                        FileIngestion.status == FileIngestionStatusEnum.IN_PROGRESS,
+                        FileIngestion.locked_at <= stale_locked_at,
+                    ),
+                )
+            )
+            .where(
+                exists().where(
+                    same_object.bucket == FileIngestion.bucket,
+                    same_object.thumbnail_filename == FileIngestion.thumbnail_filename,
+                    same_object.id > FileIngestion.id,
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        file_ingestions = list(
+            await session.scalars(
+                select(FileIngestion)
+                .where(
+                    or_(
+                        and_(
+                            FileIngestion.status == FileIngestionStatusEnum.PENDING,
+                            or_(FileIngestion.next_attempt_at.is_(None), FileIngestion.next_attempt_at <= now),
+                        ),
+                        and_(
+                            FileIngestion.status == FileIngestionStatusEnum.IN_PROGRESS,
+                            FileIngestion.locked_at <= stale_locked_at,
+                        ),
+                    )
+                )
+                .where(
+                    ~exists().where(
+                        same_object.bucket == FileIngestion.bucket,
+                        same_object.thumbnail_filename == FileIngestion.thumbnail_filename,
+                        same_object.status == FileIngestionStatusEnum.IN_PROGRESS,
+                        same_object.locked_at > stale_locked_at,
+                    )
+                )
+                .order_by(FileIngestion.id.asc())
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+        )
+
+        if file_ingestions:
+            await session.execute(
+                update(FileIngestion)
+                .where(FileIngestion.id.in_([file_ingestion.id for file_ingestion in file_ingestions]))
+                .values(
+                    status=FileIngestionStatusEnum.IN_PROGRESS,
+                    locked_at=now,
+                    attempts=FileIngestion.attempts + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        # Отсоединить загруженные объекты, чтобы они не были сброшены при фиксации транзакции
+        session.expunge_all()
+        await session.commit()
+
+    return file_ingestions
+
+
+async def _ingest_file(app: BBApplication, file_ingestion: FileIngestion) -> None:
+    """
+    Загрузить один файл и сохранить результат попытки
+
+    Загруженный файл удаляется из очереди, прерванная загрузка (например, при остановке бота)
+    возвращается в очередь без учёта попытки
+    """
+    attempts = file_ingestion.attempts + 1
+
+    try:
+        file = await app.bot.get_file(file_ingestion.file_id)
+        await app.provider.minio.upload_original_and_thumbnail(
+            bucket=file_ingestion.bucket,
+            thumbnail_filename=file_ingestion.thumbnail_filename,
+            original_chunks=iter_telegram_file_chunks(file),
+            thumbnailable_file_type=ThumbnailableFileType(
+                content_type=file_ingestion.content_type,
+                extension=file_ingestion.extension,
+                thumbnailable=file_ingestion.thumbnailable,
+            ),
+        )
+    except asyncio.CancelledError:
+        logger.warning(f"File ingestion {file_ingestion.id=} was interrupted, returning it to the queue")
+        async with app.provider.db_sessionmaker() as session:
+            await session.execute(
+                update(FileIngestion)
+                .where(FileIngestion.id == file_ingestion.id)
+                .values(status=FileIngestionStatusEnum.PENDING, attempts=file_ingestion.attempts, locked_at=None)
+            )
+            await session.commit()
+        raise
+    except Exception as e:
+        status = (
+            FileIngestionStatusEnum.FAILED
+            if attempts >= FILE_INGESTION_MAX_ATTEMPTS
+            else FileIngestionStatusEnum.PENDING
+        )
+        logger.warning(
+            f"Could not ingest file {file_ingestion.id=} on attempt {attempts} and set {status=} for error {e}"
+        )
+        async with app.provider.db_sessionmaker() as session:
+            await session.execute(
+                update(FileIngestion)
+                .where(FileIngestion.id == file_ingestion.id)
+                .values(
+                    status=status,
+                    next_attempt_at=datetime.now() + timedelta(seconds=2**attempts),  # noqa: DTZ005
+                    locked_at=None,
+                    last_error=str(e),
+                )
+            )
+            await session.commit()
+        return
+
+    async with app.provider.db_sessionmaker() as session:
+        await session.execute(delete(FileIngestion).where(FileIngestion.id == file_ingestion.id))
+        await session.commit()
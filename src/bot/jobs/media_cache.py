@@ -0,0 +1,9 @@
+from telegram.ext import CallbackContext
+
+from src.bot.telegram.application import BBApplication
+
+
+async def job(context: CallbackContext) -> None:  # type: ignore
+    """Запись новых идентификаторов файлов Telegram в БД"""
+    app: BBApplication = context.application  # type: ignore
+    await app.media_cache.flush()
@@ -1,6 +1,6 @@
 from jinja2 import Template
 from loguru import logger
-from sqlalchemy import select, update
+from sqlalchemy import Select, select, update
 from telegram.ext import CallbackContext
 
 from src.bot.helpers.telegram.prepare_field_file_value_and_type import prepare_field_file_value_and_type
@@ -18,6 +18,17 @@ from src.utils.db_model import (
 )
 
 
+def select_personal_notifications_to_deliver() -> Select[tuple[User, Field, UserFieldValue]]:
+    """Select запрос персональных уведомлений, ожидающих отправки"""
+    return (
+        select(User, Field, UserFieldValue)
+        .where(Field.id == UserFieldValue.field_id)
+        .where(User.id == UserFieldValue.user_id)
+        .where(Field.status == FieldStatusEnum.PERSONAL_NOTIFICATION)
+        .where(UserFieldValue.personal_notification_status == PersonalNotificationStatusEnum.TO_DELIVER)
+    )
+
+
 async def job(context: CallbackContext) -> None:  # type: ignore
     """Рассылка персональных уведомлений"""
     app: BBApplication = context.application  # type: ignore
@@ -25,13 +36,7 @@ async def job(context: CallbackContext) -> None:  # type: ignore
     logger.debug("Start personal notifications job")
 
     async with app.provider.db_sessionmaker() as session:
-        personal_notifications_to_deliver = await session.execute(
-            select(User, Field, UserFieldValue)
-            .where(Field.id == UserFieldValue.field_id)
-            .where(User.id == UserFieldValue.user_id)
-            .where(Field.status == FieldStatusEnum.PERSONAL_NOTIFICATION)
-            .where(UserFieldValue.personal_notification_status == PersonalNotificationStatusEnum.TO_DELIVER)
-        )
+        personal_notifications_to_deliver = await session.execute(select_personal_notifications_to_deliver())
 
     for (
         user,
@@ -81,30 +86,23 @@ async def job(context: CallbackContext) -> None:  # type: ignore
                         },
                     )
 
-                file, file_type = await prepare_field_file_value_and_type(app, field, user_field_value)
+                file, file_type, media_key = await prepare_field_file_value_and_type(app, field, user_field_value)
 
-                file_id = await send_message_and_return_file_id(
+                await send_message_and_return_file_id(
                     app=app,
                     user=user,
                     text=message_text,
                     file=file,
                     file_type=file_type,
                     filename=user_field_value.value,
+                    media_key=media_key,
                 )
-
-                if file_id and type(file) is not str:
-                    await session.execute(
-                        update(UserFieldValue)
-                        .where(UserFieldValue.id == user_field_value.id)
-                        .values(value_file_id=file_id)
-                    )
                 await session.commit()
 
         except Exception:
             logger.debug(
                 f"Could not perform personal notification to user {user.id=} of field {field.id=} for unknown reason"
             )
-            file_id = None
 
     logger.debug("Done personal notifications job")
 
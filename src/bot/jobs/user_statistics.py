@@ -0,0 +1,14 @@
+from loguru import logger
+from telegram.ext import CallbackContext
+
+from src.bot.telegram.application import BBApplication
+from src.utils.user_statistics import rollup_user_statistics
+
+
+async def job(context: CallbackContext) -> None:  # type: ignore
+    """Перенос накопленных изменений в счётчики пользователей"""
+    app: BBApplication = context.application  # type: ignore
+    async with app.provider.db_engine.begin() as conn:
+        moved = await rollup_user_statistics(conn)
+    if moved:
+        logger.debug(f"Rolled up {moved} user statistics changes")
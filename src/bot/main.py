@@ -18,7 +18,8 @@ if __name__ == "__main__":
 
     logger.info("Getting current bot status...")
     loop = asyncio.new_event_loop()
-    loop.run_until_complete(app.update_bot_status())
+    with app.provider.startup_profile.stage("bot status"):
+        loop.run_until_complete(app.update_bot_status())
 
     if app.status == BotStatusEnum.OFF:
         logger.warning("Bot should be OFF... so exiting... Bye!")
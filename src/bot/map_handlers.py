@@ -18,7 +18,15 @@ from src.bot.handlers.users import full_text_answer_callback_handlers as user_fu
 from src.bot.handlers.users import pass_submit_handlers as user_pass_submit_handlers
 from src.bot.handlers.users import start_help_handlers as user_start_help_handlers
 from src.bot.handlers.users import text_file_handlers as user_text_file_handlers
-from src.bot.jobs import expired_promocodes, notifications, personal_notifications
+from src.bot.jobs import (
+    computed_fields,
+    expired_promocodes,
+    file_ingestion,
+    media_cache,
+    notifications,
+    personal_notifications,
+    user_statistics,
+)
 from src.bot.telegram import default_handlers
 from src.bot.telegram.application import BBApplication
 from src.bot.telegram.callback_constants import (
@@ -98,6 +106,8 @@ def map_default_handlers(app: BBApplication) -> None:
                 CommandHandler(app.HELP_COMMAND, groups_base_handlers.help_handler, filters=ChatType.GROUPS),
             ],
             block=False,
+            name="group_approve_passes",
+            persistent=True,
         ),
         group=app.UPDATE_GROUP_GROUP_REQUEST,
     )
@@ -153,6 +163,8 @@ def map_default_handlers(app: BBApplication) -> None:
                 ),
             ],
             block=False,
+            name="user_submit_pass",
+            persistent=True,
         ),
         group=app.UPDATE_GROUP_USER_REQUEST,
     )
@@ -222,4 +234,8 @@ def map_default_handlers(app: BBApplication) -> None:
     app.job_queue.run_repeating(notifications.job, interval=10, name="notifications")
     app.job_queue.run_repeating(personal_notifications.job, interval=10, name="personal_notifications")
     app.job_queue.run_repeating(expired_promocodes.job, interval=10, name="expired_promocodes")
+    app.job_queue.run_repeating(file_ingestion.job, interval=2, name="file_ingestion")
+    app.job_queue.run_repeating(media_cache.job, interval=5, name="media_cache")
+    app.job_queue.run_repeating(computed_fields.job, interval=10, name="computed_fields")
+    app.job_queue.run_repeating(user_statistics.job, interval=10, name="user_statistics")
     logger.info("Starting notify jobs")
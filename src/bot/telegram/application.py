@@ -1,24 +1,37 @@
-import sys
+import asyncio
+import functools
+import time
 from asyncio import Queue
-from collections.abc import Callable, Coroutine
-from datetime import datetime
+from collections.abc import Callable, Coroutine, Generator
+from datetime import timedelta
 from typing import Any
 
 from loguru import logger
-from sqlalchemy import insert, update
-from telegram import (
-    Bot,
-    BotCommand,
-    BotDescription,
-    BotName,
-    BotShortDescription,
+from sqlalchemy import update
+from telegram import Bot, BotCommand, Update
+from telegram.ext import (
+    Application,
+    BaseHandler,
+    BasePersistence,
+    BaseUpdateProcessor,
+    CallbackContext,
+    ContextTypes,
+    Updater,
 )
-from telegram.ext import Application, BasePersistence, BaseUpdateProcessor, CallbackContext, ContextTypes, Updater
 
 from src.bot.exceptions import JobQueueNotFoundError
+from src.bot.telegram.log_writer import BBLogWriter
+from src.bot.telegram.media_cache import TelegramMediaCache
+from src.bot.telegram.metrics import BBJobQueue, BBMetricsServer, collect_backlog, measure_handler, observe_update
+from src.bot.telegram.persistence import BBPersistence
+from src.bot.telegram.promocodes_cache import PromocodesMessageCache
 from src.utils.bb_provider import BBProvider
 from src.utils.custom_types import BotStatusEnum
-from src.utils.db_model import BotStatus, Log
+from src.utils.db_model import BotStatus
+from src.utils.db_notifications import PROMOCODES_CHANGED_CHANNEL, DBNotificationListener
+from src.utils.metrics import registry
+from src.utils.tracing import Trace, current_trace
+from src.utils.user_statistics import install_user_statistics, user_statistics_installed
 
 
 class BBApplication(Application):  # type: ignore
@@ -63,19 +76,130 @@ class BBApplication(Application):  # type: ignore
         )
         self.provider = provider
         self.status = BotStatusEnum.OFF
+        self.media_cache = TelegramMediaCache(provider)
+        self.log_writer = BBLogWriter(provider)
+        self.metrics_server: BBMetricsServer | None = None
+        self.promocodes_cache = PromocodesMessageCache(provider)
+        self.db_listener = DBNotificationListener(provider.db_engine)
+        self.db_listener.subscribe(PROMOCODES_CHANGED_CHANNEL, self.promocodes_cache.invalidate)
+
+        self._running_tasks: set[asyncio.Task[Any]] = set()
+        self._is_stopping = False
+
+    def add_handler(self, handler: BaseHandler, group: int = 0) -> None:  # type: ignore
+        """Добавить обработчик с учётом времени его выполнения в метриках"""
+        measure_handler(handler)
+        super().add_handler(handler, group)
+
+    async def update_persistence(self) -> None:
+        """Сохранить данные чатов и состояния диалогов - изменения цикла записываются в БД одной транзакцией"""
+        await super().update_persistence()
+        if isinstance(self.persistence, BBPersistence):
+            await self.persistence.write_pending()
+
+    def create_task(
+        self,
+        coroutine: Generator[Any, None, Any] | Coroutine[Any, Any, Any],
+        update: object | None = None,
+        *,
+        name: str | None = None,
+    ) -> asyncio.Task[Any]:
+        """Создать задачу - задачи неблокирующих обработчиков обновления учитываются в его трассировке"""
+        task = super().create_task(coroutine, update, name=name)
+        self._running_tasks.add(task)
+        task.add_done_callback(self._running_tasks.discard)
+        trace = current_trace.get()
+        if update is not None and trace is not None:
+            trace.pending_tasks.append(task)
+        return task
+
+    async def process_update(self, update: object) -> None:
+        """
+        Обработать обновление с трассировкой
+
+        Обновление считается обработанным после завершения всех его обработчиков, в том числе неблокирующих
+        """
+        trace = Trace()
+        trace_token = current_trace.set(trace)
+        started_at = time.perf_counter()
+        try:
+            await super().process_update(update)
+        finally:
+            current_trace.reset(trace_token)
+            if trace.pending_tasks:
+                asyncio.gather(*trace.pending_tasks, return_exceptions=True).add_done_callback(
+                    lambda _: self.on_update_processed(update, trace, time.perf_counter() - started_at)
+                )
+            else:
+                self.on_update_processed(update, trace, time.perf_counter() - started_at)
+
+    def on_update_processed(self, update: object, trace: Trace, elapsed: float) -> None:
+        """
+        Учесть обработанное обновление в метриках, медленные обновления записываются в лог
+
+        Вызывается после завершения всех обработчиков обновления
+        """
+        observe_update(
+            trace,
+            elapsed,
+            update.update_id if isinstance(update, Update) else None,
+            self.provider.config.slow_update_threshold,
+        )
 
     async def update_bot_status(self) -> None:
         """Обновить статус бота - используется при старте программы"""
         bot_status = await self.provider.bot_status
         self.status = bot_status.bot_status
 
+    async def stop_gracefully(self) -> None:
+        """
+        Плавно остановить бота
+
+        Прекращает получение обновлений и запуск задач по расписанию, ожидает завершения обрабатываемых обновлений,
+        задач приложения и выполняемых задач по расписанию не дольше `shutdown_drain_timeout`,
+        незавершённые к этому времени задачи отменяются; затем записывает накопленные данные и завершает `run_polling`
+
+        Неполученные обновления остаются в Telegram и будут получены ботом после перезапуска
+        """
+        if self.updater and self.updater.running:
+            await self.updater.stop()
+            logger.info("Stopped fetching updates")
+
+        running_tasks = set(self._running_tasks)
+        if self.job_queue and self.job_queue.scheduler.running:
+            self.job_queue.scheduler.pause()
+            logger.info("Paused job queue")
+        if isinstance(self.job_queue, BBJobQueue):
+            running_tasks |= self.job_queue.running_tasks
+
+        current_task = asyncio.current_task()
+        running_tasks = {task for task in running_tasks if task is not current_task and not task.done()}
+        if running_tasks:
+            logger.info(f"Waiting for {len(running_tasks)} running updates and tasks")
+            _, not_done = await asyncio.wait(running_tasks, timeout=self.provider.config.shutdown_drain_timeout)
+            if not_done:
+                logger.warning(f"Cancelling {len(not_done)} unfinished updates and tasks")
+                for task in not_done:
+                    task.cancel()
+
+        await self.update_persistence()
+        await self.log_writer.flush()
+        await self.media_cache.flush()
+
+        self.stop_running()
+
     async def _bot_status_switch_job(self, _: CallbackContext) -> None:  # type: ignore
+        if self._is_stopping:
+            return
+
         await self.update_bot_status()
 
         if self.status == BotStatusEnum.ON:
-            return logger.debug("Checked bot status... should be on, so continuing")
+            logger.debug("Checked bot status... should be on, so continuing")
+            return
 
         logger.warning(f"Got bot status {self.status=}... so restarting")
+        self._is_stopping = True
 
         async with self.provider.db_sessionmaker() as session:
             if self.status in [BotStatusEnum.RESTART, BotStatusEnum.RESTARTING]:
@@ -88,7 +212,7 @@ class BBApplication(Application):  # type: ignore
 
             await session.commit()
 
-            sys.exit(0)
+        await self.stop_gracefully()
 
     async def _post_init(self, _: Application) -> None:  # type: ignore
         """
@@ -108,43 +232,53 @@ class BBApplication(Application):  # type: ignore
 
         logger.info("Performing DB writes...")
 
-        if self.status in [BotStatusEnum.RESTART, BotStatusEnum.RESTARTING]:
-            async with self.provider.db_sessionmaker() as session:
-                await session.execute(update(BotStatus).values(bot_status=BotStatusEnum.ON))
-                await session.commit()
-            await self.write_log("Starting in `standard` mode after restart")
+        with self.provider.startup_profile.stage("post init db writes"):
+            if self.status in [BotStatusEnum.RESTART, BotStatusEnum.RESTARTING]:
+                async with self.provider.db_sessionmaker() as session:
+                    await session.execute(update(BotStatus).values(bot_status=BotStatusEnum.ON))
+                    await session.commit()
+                await self.write_log("Starting in `standard` mode after restart")
+
+            elif self.status == BotStatusEnum.SERVICE:
+                await self.write_log("Starting in `service` mode")
 
-        elif self.status == BotStatusEnum.SERVICE:
-            await self.write_log("Starting in `service` mode")
+            elif self.status == BotStatusEnum.ON:
+                await self.write_log("Starting in `standard` mode")
 
-        elif self.status == BotStatusEnum.ON:
-            await self.write_log("Starting in `standard` mode")
+            else:
+                await self.write_log("Starting in `strange mode`, recheck code!")
 
-        else:
-            await self.write_log("Starting in `strange mode`, recheck code!")
+            await self._ensure_user_statistics()
 
-        settings = await self.provider.settings
+        with self.provider.startup_profile.stage("post init bot api"):
+            # Запросы к Telegram Bot API выполняются одновременно - сначала получение, затем нужные изменения
+            settings, bot_my_name, bot_my_short_description, bot_my_description, bot_my_comands = await asyncio.gather(
+                self.provider.settings,
+                bot.get_my_name(),
+                bot.get_my_short_description(),
+                bot.get_my_description(),
+                bot.get_my_commands(),
+            )
 
-        bot_my_name: BotName = await bot.get_my_name()
-        if bot_my_name.name != settings.bot_my_name_plain:
-            await bot.set_my_name(settings.bot_my_name_plain)
-            logger.info("Found difference in my name - updated")
+            updates: list[Coroutine[Any, Any, bool]] = []
+            if bot_my_name.name != settings.bot_my_name_plain:
+                updates.append(bot.set_my_name(settings.bot_my_name_plain))
+                logger.info("Found difference in my name - updating")
 
-        bot_my_short_description: BotShortDescription = await bot.get_my_short_description()
-        if bot_my_short_description.short_description != settings.bot_my_short_description_plain:
-            await bot.set_my_short_description(settings.bot_my_short_description_plain)
-            logger.info("Found difference in my short description - updated")
+            if bot_my_short_description.short_description != settings.bot_my_short_description_plain:
+                updates.append(bot.set_my_short_description(settings.bot_my_short_description_plain))
+                logger.info("Found difference in my short description - updating")
 
-        bot_my_description: BotDescription = await bot.get_my_description()
-        if bot_my_description.description != settings.bot_my_description_plain:
-            await bot.set_my_description(settings.bot_my_description_plain)
-            logger.info("Found difference in my description - updated")
+            if bot_my_description.description != settings.bot_my_description_plain:
+                updates.append(bot.set_my_description(settings.bot_my_description_plain))
+                logger.info("Found difference in my description - updating")
 
-        bot_my_comands: tuple[BotCommand] = await bot.get_my_commands()  # type: ignore
-        my_commands = (BotCommand(self.HELP_COMMAND, settings.bot_help_command_description_plain),)
-        if bot_my_comands != my_commands:
-            await bot.set_my_commands(my_commands)
-            logger.info("Found difference in my commands - updated")
+            my_commands = (BotCommand(self.HELP_COMMAND, settings.bot_help_command_description_plain),)
+            if bot_my_comands != my_commands:
+                updates.append(bot.set_my_commands(my_commands))
+                logger.info("Found difference in my commands - updating")
+
+            await asyncio.gather(*updates)
 
         if not self.job_queue:
             raise JobQueueNotFoundError
@@ -152,15 +286,44 @@ class BBApplication(Application):  # type: ignore
         self.job_queue.run_repeating(self._bot_status_switch_job, interval=5)
         logger.info("Started bot status switch job")
 
+        self.job_queue.run_repeating(self._flush_logs_job, interval=self.provider.config.log_flush_interval)
+        self.job_queue.run_repeating(self._logs_retention_job, interval=timedelta(hours=1), first=0)
+        logger.info("Started logs jobs")
+
+        if self.provider.config.bot_metrics_port:
+            registry.add_collector(functools.partial(collect_backlog, self.provider))
+            self.metrics_server = BBMetricsServer(self.provider.config.bot_metrics_port)
+            await self.metrics_server.start()
+
+        self.db_listener.start()
+
+        self.provider.startup_profile.report()
         logger.info("Post init complete...")
 
+    async def _ensure_user_statistics(self) -> None:
+        """Установить триггеры счётчиков пользователей, если БД не была инициализирована из UI после их добавления"""
+        async with self.provider.db_engine.begin() as conn:
+            if not await user_statistics_installed(conn):
+                logger.warning("User statistics triggers are not installed... installing")
+                await install_user_statistics(conn)
+
     async def _post_stop(self, _: Application) -> None:  # type: ignore
         """Внутренняя функция, используемая для логгирования остановки бота"""
         logger.warning("Writing logs before stop")
         await self.write_log("Stopped an application")
+        await self.log_writer.flush()
+        await self.media_cache.flush()
+        await self.db_listener.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        self.provider.minio.close()
 
     async def write_log(self, message: str) -> None:
-        """Запись лога в БД"""
-        async with self.provider.db_sessionmaker() as session:
-            await session.execute(insert(Log).values(timestamp=datetime.now(), message=message))  # noqa: DTZ005
-            await session.commit()
+        """Запись лога в БД - лог записывается пачкой вместе с другими логами"""
+        await self.log_writer.write(message)
+
+    async def _flush_logs_job(self, _: CallbackContext) -> None:  # type: ignore
+        await self.log_writer.flush()
+
+    async def _logs_retention_job(self, _: CallbackContext) -> None:  # type: ignore
+        await self.log_writer.apply_retention()
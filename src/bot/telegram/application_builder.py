@@ -1,6 +1,8 @@
 from telegram.ext import ApplicationBuilder
 
 from src.bot.telegram.application import BBApplication
+from src.bot.telegram.metrics import BBJobQueue, MeasuredHTTPXRequest
+from src.bot.telegram.persistence import BBPersistence
 from src.utils.bb_provider import BBProvider
 
 
@@ -8,7 +10,13 @@ class BBApplicationBuilder(ApplicationBuilder):  # type: ignore
     """
     Переопределённый класс `ApplicationBuilder` для нужд этого приложения
 
-    Создаёт проводник ресурсов и устанавливает токен для бота из него
+    Создаёт проводник ресурсов и устанавливает токен и адрес Telegram Bot API для бота из него
+
+    Адрес может указывать на эмулятор `src.tg_emulator` для отладки без реального токена
+
+    Запросы к Telegram Bot API и задачи учитываются в метриках
+
+    Данные чатов и состояния диалогов сохраняются в БД между перезапусками
     """
 
     def __init__(self) -> None:
@@ -16,6 +24,18 @@ class BBApplicationBuilder(ApplicationBuilder):  # type: ignore
 
         self._provider = BBProvider()
         self._token = self._provider.config.tg_token
+        self.base_url(self._provider.config.tg_base_url)
+        self.base_file_url(self._provider.config.tg_base_file_url)
 
         self._application_class = BBApplication
         self._application_kwargs = {"provider": self._provider}
+
+        self.request(MeasuredHTTPXRequest(connection_pool_size=256))
+        self.get_updates_request(MeasuredHTTPXRequest())
+        self.job_queue(BBJobQueue(slow_threshold=self._provider.config.slow_job_threshold))
+        self.persistence(BBPersistence(self._provider, self._provider.config.persistence_update_interval))
+
+    @property
+    def provider(self) -> BBProvider:
+        """Проводник ресурсов создаваемого приложения"""
+        return self._provider
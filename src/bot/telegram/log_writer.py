@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from loguru import logger
+from sqlalchemy import insert
+
+from src.utils.bb_provider import BBProvider
+from src.utils.db_model import Log
+from src.utils.log_partitions import drop_expired_log_partitions, ensure_log_partitions, get_log_partition_month
+
+
+class BBLogWriter:
+    """
+    Буферизованная запись логов в БД
+
+    Логи накапливаются в памяти и записываются одним запросом при заполнении буфера
+    или по задаче, выполняемой с интервалом `log_flush_interval`
+
+    Если БД недоступна, в памяти хранится не больше `log_buffer_max_size` логов - более старые отбрасываются
+    """
+
+    def __init__(self, provider: BBProvider) -> None:
+        self.provider = provider
+        self.batch_size = provider.config.log_batch_size
+        self.buffer_max_size = provider.config.log_buffer_max_size
+
+        self._buffer: list[tuple[datetime, str]] = []
+        self._partition_months: set[datetime] = set()
+        self._lock = asyncio.Lock()
+
+    async def write(self, message: str) -> None:
+        """Поставить лог в очередь на запись"""
+        self._buffer.append((datetime.now(), message))  # noqa: DTZ005
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Записать накопленные логи в БД"""
+        async with self._lock:
+            if not self._buffer:
+                return
+
+            buffer, self._buffer = self._buffer, []
+            try:
+                async with self.provider.db_engine.begin() as conn:
+                    missing_partition_timestamps = [
+                        timestamp
+                        for timestamp, _ in buffer
+                        if get_log_partition_month(timestamp) not in self._partition_months
+                    ]
+                    if missing_partition_timestamps:
+                        self._partition_months |= await ensure_log_partitions(conn, missing_partition_timestamps)
+                    await conn.execute(
+                        insert(Log), [{"timestamp": timestamp, "message": message} for timestamp, message in buffer]
+                    )
+            except Exception:
+                self._buffer = buffer + self._buffer
+                dropped = len(self._buffer) - self.buffer_max_size
+                if dropped > 0:
+                    del self._buffer[:dropped]
+                    logger.warning(f"Dropped {dropped} oldest logs since they could not be written")
+                raise
+
+        logger.debug(f"Written {len(buffer)} logs")
+
+    async def apply_retention(self) -> None:
+        """Удалить партиции логов старше срока хранения"""
+        if self.provider.config.log_retention_days <= 0:
+            return
+
+        older_than = datetime.now() - timedelta(days=self.provider.config.log_retention_days)  # noqa: DTZ005
+        async with self.provider.db_engine.begin() as conn:
+            dropped = await drop_expired_log_partitions(conn, older_than)
+
+        if dropped:
+            self._partition_months.clear()
+            logger.info(f"Dropped expired logs partitions {dropped}")
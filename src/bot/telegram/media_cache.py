@@ -0,0 +1,165 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Literal
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.utils.bb_provider import BBProvider
+from src.utils.db_model import TelegramMedia
+
+MEDIA_CACHE_MAX_ENTRIES = 10000
+"""Количество идентификаторов файлов, хранимых в памяти"""
+
+MEDIA_CACHE_OBJECT_TTL = 5
+"""Время в секундах, в течение которого объект хранилища не проверяется повторно, например при рассылке"""
+
+
+@dataclass(frozen=True)
+class MediaCacheKey:
+    bucket: str
+    object_name: str
+    etag: str
+    kind: Literal["image", "document"]
+
+
+class TelegramMediaCache:
+    """
+    Кеш идентификаторов файлов Telegram для объектов хранилища
+
+    Ключ содержит ETag объекта, поэтому неизменённый объект не загружается в Telegram повторно,
+    в том числе после сброса `value_file_id` или `photo_file_id` при изменении из UI
+
+    Новые идентификаторы записываются в БД пачками задачей `media_cache`
+
+    Ключ кеша для имени файла запоминается на `MEDIA_CACHE_OBJECT_TTL` секунд, поэтому при отправке одного файла
+    многим получателям хранилище и БД проверяются один раз
+    """
+
+    def __init__(self, provider: BBProvider, max_entries: int = MEDIA_CACHE_MAX_ENTRIES) -> None:
+        self.provider = provider
+        self.max_entries = max_entries
+
+        self._file_ids: OrderedDict[MediaCacheKey, str] = OrderedDict()
+        self._pending: dict[MediaCacheKey, str] = {}
+        self._recent_keys: dict[tuple[str, str, str], tuple[MediaCacheKey, float]] = {}
+
+    async def prepare(
+        self, bucket: str, filename: str, kind: Literal["image", "document"], file_id: str | None = None
+    ) -> tuple[str | BytesIO | None, MediaCacheKey | None]:
+        """
+        Подготовить файл для отправки
+
+        Возвращает известный идентификатор файла, идентификатор из кеша или содержимое файла из хранилища,
+        а также ключ кеша, если файл был загружен из хранилища - по нему запоминается полученный идентификатор
+        """
+        if file_id:
+            return file_id, None
+
+        now = time.monotonic()
+        recent_key, expires_at = self._recent_keys.get((bucket, filename, kind), (None, 0.0))
+        if recent_key and expires_at >= now:
+            cached_file_id = self._file_ids.get(recent_key)
+            if cached_file_id:
+                self._file_ids.move_to_end(recent_key)
+                return cached_file_id, None
+
+        minio = self.provider.minio
+        object_name = await minio.resolve_object_name(bucket, filename)
+        etag = await minio.stat_etag(bucket, object_name)
+        if etag is None:
+            logger.debug(f"File {filename} not found in MinIO bucket {bucket}")
+            return None, None
+
+        key = MediaCacheKey(bucket=bucket, object_name=object_name, etag=etag, kind=kind)
+        cached_file_id = await self._get(key)
+        if cached_file_id:
+            logger.debug(f"Using cached Telegram file id for {filename} from MinIO bucket {bucket}")
+            self._remember_recent_key(bucket, filename, key, now)
+            return cached_file_id, None
+
+        # Ключ строится по ETag загруженного содержимого - объект мог измениться после получения ETag
+        file, _, etag = await minio.download_object(bucket, object_name)
+        if file is None or etag is None:
+            return file, None
+
+        key = MediaCacheKey(bucket=bucket, object_name=object_name, etag=etag, kind=kind)
+        self._remember_recent_key(bucket, filename, key, now)
+        return file, key
+
+    def remember(self, key: MediaCacheKey | None, file_id: str | None) -> None:
+        """Запомнить идентификатор файла, полученный при отправке, для записи в БД"""
+        if not key or not file_id:
+            return
+        self._put(key, file_id)
+        self._pending[key] = file_id
+
+    async def flush(self) -> None:
+        """Записать новые идентификаторы файлов в БД одним запросом"""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        logger.debug(f"Writing {len(pending)} Telegram file ids")
+        try:
+            async with self.provider.db_sessionmaker() as session:
+                statement = insert(TelegramMedia).values(
+                    [
+                        {
+                            "bucket": key.bucket,
+                            "object_name": key.object_name,
+                            "etag": key.etag,
+                            "kind": key.kind,
+                            "file_id": file_id,
+                        }
+                        for key, file_id in pending.items()
+                    ]
+                )
+                await session.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=[
+                            TelegramMedia.bucket,
+                            TelegramMedia.object_name,
+                            TelegramMedia.etag,
+                            TelegramMedia.kind,
+                        ],
+                        set_={"file_id": statement.excluded.file_id},
+                    )
+                )
+                await session.commit()
+        except Exception:
+            self._pending = pending | self._pending
+            raise
+
+    def _remember_recent_key(self, bucket: str, filename: str, key: MediaCacheKey, now: float) -> None:
+        if len(self._recent_keys) >= self.max_entries:
+            self._recent_keys = {name: value for name, value in self._recent_keys.items() if value[1] >= now}
+        self._recent_keys[(bucket, filename, key.kind)] = (key, now + MEDIA_CACHE_OBJECT_TTL)
+
+    def _put(self, key: MediaCacheKey, file_id: str) -> None:
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        while len(self._file_ids) > self.max_entries:
+            self._file_ids.popitem(last=False)
+
+    async def _get(self, key: MediaCacheKey) -> str | None:
+        file_id = self._file_ids.get(key)
+        if file_id:
+            self._file_ids.move_to_end(key)
+            return file_id
+
+        async with self.provider.db_sessionmaker() as session:
+            file_id = await session.scalar(
+                select(TelegramMedia.file_id).where(
+                    TelegramMedia.bucket == key.bucket,
+                    TelegramMedia.object_name == key.object_name,
+                    TelegramMedia.etag == key.etag,
+                    TelegramMedia.kind == key.kind,
+                )
+            )
+        if file_id:
+            self._put(key, file_id)
+        return file_id
@@ -0,0 +1,247 @@
+import asyncio
+import functools
+import time
+from collections.abc import AsyncIterator, Callable, Coroutine
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import func, select
+from telegram.ext import BaseHandler, ConversationHandler, JobQueue
+from telegram.request import HTTPXRequest
+
+from src.utils.bb_provider import BBProvider
+from src.utils.custom_types import FileIngestionStatusEnum, NotificationStatusEnum, PersonalNotificationStatusEnum
+from src.utils.db_model import FileIngestion, Notification, UserFieldValue
+from src.utils.metrics import COUNT_BUCKETS, METRICS_CONTENT_TYPE, registry
+from src.utils.tracing import Trace, current_trace, record_span
+
+update_duration_seconds = registry.histogram(
+    "bb_update_duration_seconds", "Время обработки обновления", labels=("handler",)
+)
+update_db_queries = registry.histogram(
+    "bb_update_db_queries", "Количество запросов к БД за обновление", labels=("handler",), buckets=COUNT_BUCKETS
+)
+update_db_checkouts = registry.histogram(
+    "bb_update_db_checkouts",
+    "Количество получений соединений из пула за обновление",
+    labels=("handler",),
+    buckets=COUNT_BUCKETS,
+)
+update_db_pool_wait_seconds = registry.histogram(
+    "bb_update_db_pool_wait_seconds", "Время ожидания соединений из пула за обновление", labels=("handler",)
+)
+handler_duration_seconds = registry.histogram(
+    "bb_handler_duration_seconds", "Время выполнения обработчика", labels=("handler",)
+)
+telegram_api_seconds = registry.histogram(
+    "bb_telegram_api_seconds", "Время выполнения запросов к Telegram Bot API", labels=("method",)
+)
+telegram_api_responses_total = registry.counter(
+    "bb_telegram_api_responses_total", "Ответы Telegram Bot API по кодам", labels=("method", "status")
+)
+job_duration_seconds = registry.histogram("bb_job_duration_seconds", "Время выполнения задачи", labels=("job",))
+job_errors_total = registry.counter("bb_job_errors_total", "Количество ошибок задачи", labels=("job",))
+backlog_size = registry.gauge("bb_backlog_size", "Размер очереди на отправку или загрузку", labels=("queue",))
+
+
+def get_callback_name(callback: Callable[..., Any]) -> str:
+    return f"{callback.__module__}.{callback.__qualname__}"
+
+
+def measure_handler(handler: BaseHandler) -> None:  # type: ignore
+    """
+    Подменить функцию обработчика на функцию, учитывающую время выполнения в метриках и трассировке
+
+    Для ConversationHandler подменяются функции всех вложенных обработчиков
+    """
+    if isinstance(handler, ConversationHandler):
+        nested = [*handler.entry_points, *handler.fallbacks]
+        for state_handlers in handler.states.values():
+            nested += state_handlers
+        for nested_handler in nested:
+            measure_handler(nested_handler)
+        return
+
+    callback = handler.callback
+    name = get_callback_name(callback)
+
+    @functools.wraps(callback)
+    async def _measured_callback(*args: Any, **kwargs: Any) -> Any:
+        trace = current_trace.get()
+        if trace:
+            trace.handlers.append(name)
+        started_at = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        finally:
+            handler_duration_seconds.observe(time.perf_counter() - started_at, handler=name)
+
+    handler.callback = _measured_callback
+
+
+def observe_update(trace: Trace, elapsed: float, update_id: int | None, slow_threshold: float) -> None:
+    """Учесть трассировку обработанного обновления и записать медленное обновление в лог"""
+    update_duration_seconds.observe(elapsed, handler=trace.handler)
+    update_db_queries.observe(trace.queries, handler=trace.handler)
+    update_db_checkouts.observe(trace.checkouts, handler=trace.handler)
+    update_db_pool_wait_seconds.observe(trace.pool_wait_seconds, handler=trace.handler)
+
+    if slow_threshold and elapsed >= slow_threshold:
+        logger.warning(
+            f"Slow update {update_id=} took {elapsed:.3f}s with handlers {trace.handlers}: "
+            f"{trace.format_breakdown(elapsed)}"
+        )
+
+
+class MeasuredHTTPXRequest(HTTPXRequest):
+    """Запросы к Telegram Bot API с учётом времени выполнения и кодов ответа"""
+
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> tuple[int, bytes]:
+        api_method = "file" if "/file/bot" in url else url.rsplit("/", 1)[-1]
+        status = "error"
+        started_at = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+            status = str(code)
+            return code, payload
+        finally:
+            elapsed = time.perf_counter() - started_at
+            telegram_api_seconds.observe(elapsed, method=api_method)
+            telegram_api_responses_total.inc(method=api_method, status=status)
+            record_span(f"telegram.{api_method}", elapsed)
+
+    async def stream(self, url: str, chunk_size: int) -> AsyncIterator[bytes]:
+        """Загружать файл по частям тем же клиентом и пулом соединений, что и запросы к Bot API"""
+        status = "error"
+        started_at = time.perf_counter()
+        try:
+            async with self._client.stream("GET", url) as response:
+                status = str(response.status_code)
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(chunk_size):
+                    yield chunk
+        finally:
+            elapsed = time.perf_counter() - started_at
+            telegram_api_seconds.observe(elapsed, method="file")
+            telegram_api_responses_total.inc(method="file", status=status)
+            record_span("telegram.file", elapsed)
+
+
+class BBJobQueue(JobQueue):  # type: ignore
+    """
+    Очередь задач, учитывающая время выполнения и ошибки задач
+
+    Каждый запуск задачи трассируется, медленные запуски записываются в лог,
+    выполняемые запуски доступны в `running_tasks` для ожидания при остановке бота
+    """
+
+    def __init__(self, slow_threshold: float = 0) -> None:
+        super().__init__()
+        self.slow_threshold = slow_threshold
+        self.running_tasks: set[asyncio.Task[Any]] = set()
+
+    def _measured(
+        self, callback: Callable[[Any], Coroutine[Any, Any, Any]], name: str | None
+    ) -> Callable[[Any], Coroutine[Any, Any, Any]]:
+        job_name = name or callback.__name__
+
+        @functools.wraps(callback)
+        async def _measured_callback(context: Any) -> Any:
+            task = asyncio.current_task()
+            if task is not None:
+                self.running_tasks.add(task)
+            trace = Trace(handlers=[job_name])
+            trace_token = current_trace.set(trace)
+            started_at = time.perf_counter()
+            try:
+                return await callback(context)
+            except Exception:
+                job_errors_total.inc(job=job_name)
+                raise
+            finally:
+                self.running_tasks.discard(task)  # type: ignore
+                elapsed = time.perf_counter() - started_at
+                current_trace.reset(trace_token)
+                job_duration_seconds.observe(elapsed, job=job_name)
+                if self.slow_threshold and elapsed >= self.slow_threshold:
+                    logger.warning(f"Slow job {job_name} took {elapsed:.3f}s: {trace.format_breakdown(elapsed)}")
+
+        return _measured_callback
+
+    def run_once(self, callback: Any, *args: Any, **kwargs: Any) -> Any:
+        return super().run_once(self._measured(callback, kwargs.get("name")), *args, **kwargs)
+
+    def run_repeating(self, callback: Any, *args: Any, **kwargs: Any) -> Any:
+        return super().run_repeating(self._measured(callback, kwargs.get("name")), *args, **kwargs)
+
+
+async def collect_backlog(provider: BBProvider) -> None:
+    """Обновить размеры очередей на отправку и загрузку"""
+    async with provider.db_sessionmaker() as session:
+        backlog_size.set(
+            await session.scalar(
+                select(func.count())
+                .select_from(UserFieldValue)
+                .where(UserFieldValue.personal_notification_status == PersonalNotificationStatusEnum.TO_DELIVER)
+            )
+            or 0,
+            queue="personal_notifications",
+        )
+        backlog_size.set(
+            await session.scalar(
+                select(func.count())
+                .select_from(Notification)
+                .where(Notification.status == NotificationStatusEnum.TO_DELIVER)
+            )
+            or 0,
+            queue="notifications",
+        )
+        backlog_size.set(
+            await session.scalar(
+                select(func.count())
+                .select_from(FileIngestion)
+                .where(FileIngestion.status == FileIngestionStatusEnum.PENDING)
+            )
+            or 0,
+            queue="file_ingestions",
+        )
+
+
+class BBMetricsServer:
+    """Минимальный HTTP сервер, отдающий метрики процесса бота по адресу `/metrics`"""
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, host="0.0.0.0", port=self.port)
+        logger.info(f"Started metrics server on port {self.port}")
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode(errors="replace").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+
+            if len(request_line) >= 2 and request_line[0] == "GET" and request_line[1].split("?")[0] == "/metrics":
+                status, content_type, body = "200 OK", METRICS_CONTENT_TYPE, (await registry.render()).encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"Not Found"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.warning(f"Could not serve metrics request for error {e}")
+        finally:
+            writer.close()
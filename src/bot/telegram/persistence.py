@@ -0,0 +1,168 @@
+import asyncio
+import json
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from telegram.ext import BasePersistence, PersistenceInput
+
+from src.utils.bb_provider import BBProvider
+from src.utils.db_model import BotPersistenceData
+
+CHAT_DATA_KIND = "chat_data"
+"""Вид записи с данными чата"""
+
+CONVERSATION_KIND_PREFIX = "conversation:"
+"""Префикс вида записи с состоянием диалога, за которым следует имя диалога"""
+
+
+class BBPersistence(BasePersistence):  # type: ignore
+    """
+    Хранение данных чатов и состояний диалогов в Postgres
+
+    Изменения накапливаются в памяти, повторные изменения одной записи схлопываются,
+    а накопленное записывается одной транзакцией после каждого цикла `Application.update_persistence`
+
+    Данные чата загружаются при первом обновлении из этого чата, а не все при запуске;
+    при запуске загружаются только незавершённые диалоги
+    """
+
+    def __init__(self, provider: BBProvider, update_interval: float) -> None:
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.provider = provider
+
+        self._pending: dict[tuple[str, str], Any | None] = {}
+        self._loaded_chat_ids: set[int] = set()
+        self._stored_chat_ids: set[int] = set()
+        self._lock = asyncio.Lock()
+
+    async def get_chat_data(self) -> dict[int, dict[Any, Any]]:
+        """Данные чатов загружаются по одному в `refresh_chat_data`"""
+        return {}
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict[Any, Any]) -> None:
+        """Загрузить данные чата при первом обновлении из него"""
+        if chat_id in self._loaded_chat_ids:
+            return
+
+        async with self.provider.db_sessionmaker() as session:
+            data = await session.scalar(
+                select(BotPersistenceData.data)
+                .where(BotPersistenceData.kind == CHAT_DATA_KIND)
+                .where(BotPersistenceData.key == str(chat_id))
+            )
+
+        # Изменения, сделанные до загрузки, важнее сохранённых
+        if data:
+            chat_data.update({key: value for key, value in data.items() if key not in chat_data})
+            self._stored_chat_ids.add(chat_id)
+        self._loaded_chat_ids.add(chat_id)
+
+    async def update_chat_data(self, chat_id: int, data: dict[Any, Any]) -> None:
+        if not data and chat_id not in self._stored_chat_ids:
+            return
+        self._pending[(CHAT_DATA_KIND, str(chat_id))] = data or None
+        if data:
+            self._stored_chat_ids.add(chat_id)
+        else:
+            self._stored_chat_ids.discard(chat_id)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._pending[(CHAT_DATA_KIND, str(chat_id))] = None
+        self._stored_chat_ids.discard(chat_id)
+
+    async def get_conversations(self, name: str) -> dict[tuple[int | str, ...], object]:
+        async with self.provider.db_sessionmaker() as session:
+            conversations = await session.execute(
+                select(BotPersistenceData.key, BotPersistenceData.data).where(
+                    BotPersistenceData.kind == f"{CONVERSATION_KIND_PREFIX}{name}"
+                )
+            )
+            return {tuple(json.loads(key)): state for key, state in conversations}
+
+    async def update_conversation(self, name: str, key: tuple[int | str, ...], new_state: object | None) -> None:
+        self._pending[(f"{CONVERSATION_KIND_PREFIX}{name}", json.dumps(key))] = new_state
+
+    async def flush(self) -> None:
+        """Записать накопленные изменения при остановке бота"""
+        await self.write_pending()
+
+    async def write_pending(self) -> None:
+        """
+        Записать накопленные изменения одной транзакцией
+
+        При ошибке изменения остаются в памяти и записываются при следующем вызове, если не были перезаписаны;
+        записи, которые нельзя сериализовать в JSON, пропускаются с ошибкой в логе
+        """
+        async with self._lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+            try:
+                # Данные сериализуются до первого ожидания, чтобы не записать изменённые во время записи словари
+                deleted = [key for key, data in pending.items() if data is None]
+                upserted = []
+                for (kind, key), data in pending.items():
+                    if data is None:
+                        continue
+                    try:
+                        upserted.append({"kind": kind, "key": key, "data": json.loads(json.dumps(data))})
+                    except (TypeError, ValueError) as e:
+                        logger.error(f"Could not serialize bot persistence data {kind=} {key=}: {e}")
+
+                async with self.provider.db_sessionmaker() as session:
+                    if deleted:
+                        await session.execute(
+                            delete(BotPersistenceData).where(
+                                tuple_(BotPersistenceData.kind, BotPersistenceData.key).in_(deleted)
+                            )
+                        )
+                    if upserted:
+                        upsert = insert(BotPersistenceData).values(upserted)
+                        await session.execute(
+                            upsert.on_conflict_do_update(
+                                index_elements=[BotPersistenceData.kind, BotPersistenceData.key],
+                                set_={"data": upsert.excluded.data},
+                            )
+                        )
+                    await session.commit()
+            except Exception as e:
+                self._pending = pending | self._pending
+                logger.error(f"Could not write bot persistence data: {e}")
+                return
+
+        logger.debug(f"Written bot persistence data: {len(upserted)} updated, {len(deleted)} deleted")
+
+    # Данные пользователей, бота и inline-кнопок не используются и не хранятся
+
+    async def get_user_data(self) -> dict[int, dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_user_data(self, user_id: int, data: dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict[Any, Any]) -> None:
+        pass
@@ -0,0 +1,54 @@
+import time
+
+from jinja2 import Template
+from loguru import logger
+from sqlalchemy import select
+
+from src.utils.bb_provider import BBProvider
+from src.utils.custom_types import PromocodeStatusEnum
+from src.utils.db_model import Promocode
+
+
+class PromocodesMessageCache:
+    """
+    Кеш сообщения с активными промокодами, отрисованного по шаблону из настроек
+
+    Сбрасывается задачей `expired_promocodes` и оповещением об изменении промокодов из UI,
+    время хранения ограничено на случай пропущенного оповещения
+    """
+
+    def __init__(self, provider: BBProvider) -> None:
+        self.provider = provider
+
+        self._template: str | None = None
+        self._message: str | None = None
+        self._rendered_at = 0.0
+        self._generation = 0
+
+    def invalidate(self) -> None:
+        """Сбросить отрисованное сообщение"""
+        self._generation += 1
+        self._message = None
+
+    async def get(self, template: str) -> str:
+        """Получить сообщение с активными промокодами, при изменении шаблона сообщение отрисовывается заново"""
+        if (
+            self._message is not None
+            and self._template == template
+            and time.monotonic() - self._rendered_at < self.provider.config.promocodes_cache_ttl
+        ):
+            return self._message
+
+        generation = self._generation
+        async with self.provider.db_sessionmaker() as session:
+            promocodes = list(
+                await session.scalars(select(Promocode).where(Promocode.status == PromocodeStatusEnum.ACTIVE))
+            )
+        message = await Template(template, enable_async=True).render_async(promocodes=promocodes)
+
+        if generation == self._generation:
+            logger.debug(f"Cached promocodes message with {len(promocodes)} promocodes")
+            self._template = template
+            self._message = message
+            self._rendered_at = time.monotonic()
+        return message
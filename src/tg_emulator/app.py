@@ -0,0 +1,143 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Annotated, Any
+
+from fastapi import FastAPI, Form, Request, UploadFile
+from fastapi.exceptions import HTTPException
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from starlette.datastructures import UploadFile as StarletteUploadFile
+
+from src.tg_emulator.config import create_emulator_config
+from src.tg_emulator.emulator import JsonDict, Params, TelegramBotAPIEmulator, UploadedFile
+from src.tg_emulator.exceptions import BotAPIError
+
+description = """
+Эмулятор Telegram Bot API для нагрузочной и интеграционной отладки бота
+
+Бот подключается к эмулятору переменными окружения `TG_BASE_URL` и `TG_BASE_FILE_URL`,
+сообщения пользователей эмулируются запросами к `/emulator`
+"""
+
+config = create_emulator_config()
+emulator = TelegramBotAPIEmulator(config)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    yield
+    await emulator.close()
+
+
+app = FastAPI(title="Telegram Bot API emulator", description=description, lifespan=lifespan)
+
+
+class CallbackQueryRequest(BaseModel):
+    message_id: int
+    data: str
+
+
+async def _read_upload(upload: UploadFile | None) -> UploadedFile | None:
+    if not upload:
+        return None
+    return UploadedFile(content=await upload.read(), filename=upload.filename, content_type=upload.content_type)
+
+
+async def read_params(request: Request) -> Params:
+    """Параметры запроса к Bot API из строки запроса, JSON тела или формы"""
+    values: dict[str, Any] = dict(request.query_params)
+    files: dict[str, UploadedFile] = {}
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        values |= await request.json()
+    elif content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+        async with request.form() as form:
+            for key, value in form.multi_items():
+                if isinstance(value, StarletteUploadFile):
+                    files[key] = await _read_upload(value)  # type: ignore
+                else:
+                    values[key] = value
+
+    return Params(values, files)
+
+
+@app.api_route("/bot{token}/{method}", methods=["GET", "POST"], tags=["bot_api"])
+async def bot_api(token: str, method: str, request: Request) -> JSONResponse:  # noqa: ARG001
+    """Методы Telegram Bot API"""
+    try:
+        result = await emulator.call(method, await read_params(request))
+    except BotAPIError as e:
+        return JSONResponse(e.to_dict(), status_code=e.error_code)
+    return JSONResponse({"ok": True, "result": result})
+
+
+@app.get("/file/bot{token}/{file_path:path}", tags=["bot_api"])
+async def bot_api_file(token: str, file_path: str) -> Response:  # noqa: ARG001
+    """Скачивание файлов по пути, полученному методом `getFile`"""
+    stored = emulator.get_file_content(file_path)
+    if not stored:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(stored.content, media_type=stored.mime_type or "application/octet-stream")
+
+
+@app.post("/emulator/updates", tags=["emulator"])
+async def push_update(update: JsonDict) -> JsonDict:
+    """Добавить произвольное обновление"""
+    return emulator.push_update(update)
+
+
+@app.post("/emulator/users/{user_id}/messages", tags=["emulator"])
+async def user_send_message(
+    user_id: int,
+    text: Annotated[str | None, Form()] = None,
+    first_name: Annotated[str | None, Form()] = None,
+    username: Annotated[str | None, Form()] = None,
+    language_code: Annotated[str | None, Form()] = None,
+    photo: UploadFile | None = None,
+    document: UploadFile | None = None,
+) -> JsonDict:
+    """Эмулировать сообщение пользователя боту: текст, фото или документ с подписью"""
+    return emulator.user_send_message(
+        user_id,
+        text=text,
+        photo=await _read_upload(photo),
+        document=await _read_upload(document),
+        first_name=first_name,
+        username=username,
+        language_code=language_code,
+    )
+
+
+@app.post("/emulator/users/{user_id}/callback_queries", tags=["emulator"])
+async def user_press_button(user_id: int, callback_query: CallbackQueryRequest) -> JsonDict:
+    """Эмулировать нажатие кнопки встроенной клавиатуры сообщения бота"""
+    try:
+        return emulator.user_press_button(user_id, callback_query.message_id, callback_query.data)
+    except BotAPIError as e:
+        raise HTTPException(status_code=e.error_code, detail=e.description) from e
+
+
+@app.get("/emulator/chats/{chat_id}/messages", tags=["emulator"])
+async def chat_messages(chat_id: int) -> list[JsonDict]:
+    """Сообщения чата от старых к новым, включая отправленные ботом"""
+    return emulator.chat_messages(chat_id)
+
+
+@app.get("/emulator/chats/{chat_id}/keyboard", tags=["emulator"])
+async def chat_keyboard(chat_id: int) -> list[list[str]]:
+    """Тексты кнопок клавиатуры, которую пользователь видит в чате сейчас"""
+    return emulator.chat_keyboard(chat_id)
+
+
+@app.get("/emulator/stats", tags=["emulator"])
+async def stats() -> JsonDict:
+    """Количество вызовов методов Bot API, ответов 429 и ожидающих обновлений"""
+    return emulator.stats()
+
+
+@app.post("/emulator/reset", tags=["emulator"])
+async def reset() -> JsonDict:
+    """Очистить состояние эмулятора между прогонами"""
+    emulator.reset()
+    return emulator.stats()
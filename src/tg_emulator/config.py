@@ -0,0 +1,43 @@
+from dotenv import find_dotenv, load_dotenv
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class EmulatorConfig(BaseSettings):
+    """
+    Конфигурация эмулятора Telegram Bot API
+
+    Поля устанавливаются переменными окружения с префиксом `TG_EMULATOR_`
+
+    Например, `TG_EMULATOR_LATENCY`
+    """
+
+    model_config = SettingsConfigDict(env_prefix="TG_EMULATOR_")
+
+    port: int = 8081
+
+    bot_id: int = 1000000000
+    bot_username: str = "boxed_bot"
+    bot_first_name: str = "Boxed Bot"
+
+    latency: float = 0.0
+    """Задержка ответа на каждый запрос к Bot API в секундах"""
+    latency_jitter: float = 0.0
+    """Случайное отклонение задержки в секундах в обе стороны"""
+
+    global_rate_limit: int = 30
+    """Количество отправляемых сообщений в секунду во все чаты, 0 - без ограничения"""
+    chat_rate_limit: int = 0
+    """Количество отправляемых сообщений в секунду в один чат, 0 - без ограничения"""
+    flood_probability: float = 0.0
+    """Вероятность ответа 429 на отправку сообщения вне зависимости от ограничений"""
+
+    max_messages_per_chat: int = 1000
+    """Количество хранимых сообщений каждого чата - более старые сообщения нельзя переслать или изменить"""
+
+
+def create_emulator_config() -> EmulatorConfig:
+    """
+    Создание конфига эмулятора из переменных окружения
+    """
+    load_dotenv(find_dotenv())
+    return EmulatorConfig()
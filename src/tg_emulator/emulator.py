@@ -0,0 +1,732 @@
+import asyncio
+import hashlib
+import io
+import itertools
+import json
+import math
+import mimetypes
+import random
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict, deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, Literal
+
+import httpx
+from loguru import logger
+
+from src.tg_emulator.config import EmulatorConfig
+from src.tg_emulator.exceptions import BotAPIError
+
+JsonDict = dict[str, Any]
+
+FLOOD_CONTROLLED_METHODS = frozenset(
+    {
+        "sendmessage",
+        "sendphoto",
+        "senddocument",
+        "forwardmessage",
+        "forwardmessages",
+        "copymessage",
+        "copymessages",
+        "editmessagetext",
+    }
+)
+"""Методы, на которые распространяются ограничения частоты отправки сообщений"""
+
+MAX_BATCH_MESSAGES = 100
+"""Наибольшее количество сообщений в одном вызове forwardMessages и copyMessages"""
+
+COPIED_MESSAGE_CONTENT = ("text", "entities", "photo", "document", "caption", "caption_entities")
+"""Поля сообщения, переносимые при пересылке и копировании"""
+
+
+@dataclass
+class UploadedFile:
+    """Файл, загруженный в запросе"""
+
+    content: bytes
+    filename: str | None = None
+    content_type: str | None = None
+
+
+@dataclass
+class StoredFile:
+    """Файл, хранящийся в эмуляторе и доступный по идентификатору"""
+
+    file_id: str
+    file_unique_id: str
+    file_path: str
+    content: bytes
+    filename: str | None
+    mime_type: str | None
+
+    def to_file(self) -> JsonDict:
+        return {
+            "file_id": self.file_id,
+            "file_unique_id": self.file_unique_id,
+            "file_size": len(self.content),
+            "file_path": self.file_path,
+        }
+
+
+class Params:
+    """
+    Параметры запроса к Bot API
+
+    Значения приходят как из JSON тела запроса, так и из формы, где все значения - строки,
+    а сложные значения закодированы в JSON
+    """
+
+    def __init__(self, values: JsonDict, files: dict[str, UploadedFile] | None = None) -> None:
+        self.values = values
+        self.files = files or {}
+
+    def get_str(self, name: str, default: str | None = None) -> str | None:
+        value = self.values.get(name)
+        return default if value is None else str(value)
+
+    def get_int(self, name: str, default: int | None = None) -> int | None:
+        value = self.values.get(name)
+        if value is None or value == "":
+            return default
+        try:
+            return int(value)
+        except ValueError as e:
+            raise BotAPIError(400, f"Bad Request: invalid {name} specified") from e
+
+    def get_required_int(self, name: str) -> int:
+        value = self.get_int(name)
+        if value is None:
+            raise BotAPIError(400, f"Bad Request: {name} is empty")
+        return value
+
+    def get_json(self, name: str, default: Any = None) -> Any:
+        value = self.values.get(name)
+        if value is None or value == "":
+            return default
+        if not isinstance(value, str):
+            return value
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError as e:
+            raise BotAPIError(400, f"Bad Request: can't parse {name} JSON object") from e
+
+    def get_file(self, name: str) -> UploadedFile | str | None:
+        """Загруженный файл или идентификатор ранее загруженного файла"""
+        if name in self.files:
+            return self.files[name]
+        value = self.get_str(name)
+        if value and value.startswith("attach://"):
+            return self.files.get(value.removeprefix("attach://"))
+        return value
+
+
+class TelegramBotAPIEmulator:
+    """
+    Эмулятор Telegram Bot API для одного бота
+
+    Хранит чаты, сообщения и файлы в памяти, доставляет обновления через `getUpdates` или веб-хук
+
+    Пользователи эмулируются методами `user_send_message` и `user_press_button`
+
+    Каждый запрос к Bot API выполняется с настроенной задержкой, отправка сообщений ограничивается
+    по частоте с ответом 429 как в Telegram
+    """
+
+    def __init__(self, config: EmulatorConfig) -> None:
+        self.config = config
+        self.bot_user: JsonDict = {
+            "id": config.bot_id,
+            "is_bot": True,
+            "first_name": config.bot_first_name,
+            "username": config.bot_username,
+            "can_join_groups": True,
+            "can_read_all_group_messages": False,
+            "supports_inline_queries": False,
+        }
+
+        self.calls: Counter[str] = Counter()
+        self.flood_responses = 0
+
+        self._names: dict[str, str] = {"": config.bot_first_name}
+        self._descriptions: dict[str, str] = {}
+        self._short_descriptions: dict[str, str] = {}
+        self._commands: dict[tuple[str, str], list[JsonDict]] = {}
+
+        self._webhook_url: str | None = None
+        self._webhook_secret: str | None = None
+        self._webhook_client: httpx.AsyncClient | None = None
+        self._webhook_tasks: set[asyncio.Task[None]] = set()
+
+        self._update_ids = itertools.count(1)
+        self._updates: deque[JsonDict] = deque()
+        self._updates_event = asyncio.Event()
+
+        self._chats: dict[int, JsonDict] = {}
+        self._message_ids: defaultdict[int, itertools.count[int]] = defaultdict(lambda: itertools.count(1))
+        self._messages: defaultdict[int, OrderedDict[int, JsonDict]] = defaultdict(OrderedDict)
+        self._keyboards: dict[int, list[list[str]]] = {}
+        self._files: dict[str, StoredFile] = {}
+        self._files_by_path: dict[str, StoredFile] = {}
+
+        self._global_window: deque[float] = deque()
+        self._chat_windows: defaultdict[int, deque[float]] = defaultdict(deque)
+
+        self._methods: dict[str, Callable[[Params], Awaitable[Any]]] = {
+            "getme": self.get_me,
+            "logout": self.return_true,
+            "close": self.return_true,
+            "getupdates": self.get_updates,
+            "setwebhook": self.set_webhook,
+            "deletewebhook": self.delete_webhook,
+            "getwebhookinfo": self.get_webhook_info,
+            "sendmessage": self.send_message,
+            "sendphoto": self.send_photo,
+            "senddocument": self.send_document,
+            "forwardmessage": self.forward_message,
+            "forwardmessages": self.forward_messages,
+            "copymessage": self.copy_message,
+            "copymessages": self.copy_messages,
+            "editmessagetext": self.edit_message_text,
+            "editmessagereplymarkup": self.edit_message_reply_markup,
+            "deletemessage": self.delete_message,
+            "answercallbackquery": self.return_true,
+            "getfile": self.get_file,
+            "getmyname": self.get_my_name,
+            "setmyname": self.set_my_name,
+            "getmydescription": self.get_my_description,
+            "setmydescription": self.set_my_description,
+            "getmyshortdescription": self.get_my_short_description,
+            "setmyshortdescription": self.set_my_short_description,
+            "getmycommands": self.get_my_commands,
+            "setmycommands": self.set_my_commands,
+            "deletemycommands": self.delete_my_commands,
+        }
+
+    async def call(self, method: str, params: Params) -> Any:
+        """Выполнить метод Bot API - возвращает поле `result` ответа или выбрасывает `BotAPIError`"""
+        self.calls[method] += 1
+        if self.config.latency or self.config.latency_jitter:
+            jitter = random.uniform(-self.config.latency_jitter, self.config.latency_jitter)
+            await asyncio.sleep(max(self.config.latency + jitter, 0))
+
+        method_handler = self._methods.get(method.lower())
+        if not method_handler:
+            raise BotAPIError(404, "Not Found")
+
+        chat_id = params.get_int("chat_id")
+        if method.lower() in FLOOD_CONTROLLED_METHODS and chat_id is not None:
+            self._check_flood(chat_id)
+
+        return await method_handler(params)
+
+    async def close(self) -> None:
+        if self._webhook_tasks:
+            await asyncio.gather(*self._webhook_tasks, return_exceptions=True)
+        if self._webhook_client:
+            await self._webhook_client.aclose()
+            self._webhook_client = None
+
+    def _check_flood(self, chat_id: int) -> None:
+        if self.config.flood_probability and random.random() < self.config.flood_probability:
+            self._raise_flood(1)
+
+        now = time.monotonic()
+        windows = (
+            (self._global_window, self.config.global_rate_limit),
+            (self._chat_windows[chat_id], self.config.chat_rate_limit),
+        )
+        for window, limit in windows:
+            if not limit:
+                continue
+            while window and now - window[0] >= 1:
+                window.popleft()
+            if len(window) >= limit:
+                self._raise_flood(max(math.ceil(1 - (now - window[0])), 1))
+
+        for window, limit in windows:
+            if limit:
+                window.append(now)
+
+    def _raise_flood(self, retry_after: int) -> None:
+        self.flood_responses += 1
+        raise BotAPIError(429, f"Too Many Requests: retry after {retry_after}", {"retry_after": retry_after})
+
+    ### Чаты, сообщения и файлы ###
+
+    def _chat(self, chat_id: int) -> JsonDict:
+        if chat_id not in self._chats:
+            self._chats[chat_id] = {"id": chat_id, "type": "private" if chat_id > 0 else "group"}
+        return self._chats[chat_id]
+
+    def _new_message(self, chat_id: int, sender: JsonDict, **content: Any) -> JsonDict:
+        message = {
+            "message_id": next(self._message_ids[chat_id]),
+            "date": int(time.time()),
+            "chat": self._chat(chat_id),
+            "from": sender,
+            **{key: value for key, value in content.items() if value is not None},
+        }
+        messages = self._messages[chat_id]
+        messages[message["message_id"]] = message
+        while len(messages) > self.config.max_messages_per_chat:
+            messages.popitem(last=False)
+        return message
+
+    def _get_message(self, chat_id: int, message_id: int, error: str) -> JsonDict:
+        message = self._messages.get(chat_id, {}).get(message_id)
+        if not message:
+            raise BotAPIError(400, f"Bad Request: {error}")
+        return message
+
+    def chat_messages(self, chat_id: int) -> list[JsonDict]:
+        """Сохранённые сообщения чата от старых к новым"""
+        return list(self._messages.get(chat_id, {}).values())
+
+    def chat_keyboard(self, chat_id: int) -> list[list[str]]:
+        """Тексты кнопок клавиатуры, которую пользователь видит в чате сейчас"""
+        return self._keyboards.get(chat_id, [])
+
+    def _remember_keyboard(self, chat_id: int, params: Params) -> None:
+        """Клавиатура остаётся у пользователя до замены другой клавиатурой или удаления, как в клиенте Telegram"""
+        reply_markup = params.get_json("reply_markup")
+        if not isinstance(reply_markup, dict):
+            return
+        if "keyboard" in reply_markup:
+            self._keyboards[chat_id] = [
+                [button["text"] if isinstance(button, dict) else str(button) for button in row]
+                for row in reply_markup["keyboard"]
+            ]
+        elif reply_markup.get("remove_keyboard"):
+            self._keyboards.pop(chat_id, None)
+
+    def _store_file(self, uploaded: UploadedFile, kind: Literal["photo", "document"]) -> StoredFile:
+        file_unique_id = hashlib.sha256(uploaded.content).hexdigest()[:16]
+        file_id = f"{kind}-{uuid.uuid4().hex}"
+        extension = mimetypes.guess_extension(uploaded.content_type or "") or ""
+        if uploaded.filename and "." in uploaded.filename:
+            extension = "." + uploaded.filename.rsplit(".", 1)[-1]
+        stored = StoredFile(
+            file_id=file_id,
+            file_unique_id=file_unique_id,
+            file_path=f"{kind}s/{file_id}{extension}",
+            content=uploaded.content,
+            filename=uploaded.filename,
+            mime_type=uploaded.content_type or mimetypes.guess_type(uploaded.filename or "")[0],
+        )
+        self._files[file_id] = stored
+        self._files_by_path[stored.file_path] = stored
+        return stored
+
+    def _resolve_file(self, params: Params, name: str, kind: Literal["photo", "document"]) -> StoredFile:
+        file = params.get_file(name)
+        if isinstance(file, UploadedFile):
+            return self._store_file(file, kind)
+        if file and file in self._files:
+            return self._files[file]
+        raise BotAPIError(400, "Bad Request: wrong file identifier/HTTP URL specified")
+
+    def get_file_content(self, file_path: str) -> StoredFile | None:
+        """Файл по пути, выданному методом `getFile`"""
+        return self._files_by_path.get(file_path)
+
+    def stored_file_ids(self) -> list[str]:
+        return list(self._files)
+
+    @staticmethod
+    def _photo_sizes(stored: StoredFile) -> list[JsonDict]:
+        width, height = 0, 0
+        try:
+            from PIL import Image  # noqa: PLC0415
+
+            with Image.open(io.BytesIO(stored.content)) as image:
+                width, height = image.size
+        except Exception:
+            logger.debug(f"Could not read image size of {stored.file_id}")
+        return [
+            {
+                "file_id": stored.file_id,
+                "file_unique_id": stored.file_unique_id,
+                "file_size": len(stored.content),
+                "width": width,
+                "height": height,
+            }
+        ]
+
+    @staticmethod
+    def _document(stored: StoredFile) -> JsonDict:
+        document = {
+            "file_id": stored.file_id,
+            "file_unique_id": stored.file_unique_id,
+            "file_size": len(stored.content),
+            "file_name": stored.filename,
+            "mime_type": stored.mime_type,
+        }
+        return {key: value for key, value in document.items() if value is not None}
+
+    @staticmethod
+    def _inline_reply_markup(params: Params) -> JsonDict | None:
+        """В сообщениях Telegram возвращает только встроенные клавиатуры"""
+        reply_markup = params.get_json("reply_markup")
+        if isinstance(reply_markup, dict) and "inline_keyboard" in reply_markup:
+            return reply_markup
+        return None
+
+    ### Обновления ###
+
+    def _push_update(self, update: JsonDict) -> JsonDict:
+        update.setdefault("update_id", next(self._update_ids))
+        if self._webhook_url:
+            task = asyncio.create_task(self._deliver_webhook(self._webhook_url, update))
+            self._webhook_tasks.add(task)
+            task.add_done_callback(self._webhook_tasks.discard)
+        else:
+            self._updates.append(update)
+            self._updates_event.set()
+        return update
+
+    async def _deliver_webhook(self, url: str, update: JsonDict) -> None:
+        if not self._webhook_client:
+            self._webhook_client = httpx.AsyncClient(timeout=60)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self._webhook_secret} if self._webhook_secret else {}
+        try:
+            response = await self._webhook_client.post(url, json=update, headers=headers)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Could not deliver update {update['update_id']} to webhook for error {e}")
+
+    def push_update(self, update: JsonDict) -> JsonDict:
+        """Добавить произвольное обновление - если не указан `update_id`, он будет присвоен"""
+        return self._push_update(dict(update))
+
+    def user_send_message(
+        self,
+        user_id: int,
+        text: str | None = None,
+        photo: UploadedFile | None = None,
+        document: UploadedFile | None = None,
+        first_name: str | None = None,
+        username: str | None = None,
+        language_code: str | None = None,
+    ) -> JsonDict:
+        """
+        Эмулировать сообщение пользователя боту в личном чате
+
+        Команды в начале текста отмечаются сущностью `bot_command`, файлы становятся доступны через `getFile`
+        """
+        user = {
+            "id": user_id,
+            "is_bot": False,
+            "first_name": first_name or f"User {user_id}",
+            **({"username": username} if username else {}),
+            **({"language_code": language_code} if language_code else {}),
+        }
+        self._chats[user_id] = {
+            "id": user_id,
+            "type": "private",
+            "first_name": user["first_name"],
+            **({"username": username} if username else {}),
+        }
+
+        content: JsonDict = {}
+        text_key, entities_key = ("caption", "caption_entities") if photo or document else ("text", "entities")
+        if text:
+            content[text_key] = text
+            if text.startswith("/"):
+                content[entities_key] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        if photo:
+            content["photo"] = self._photo_sizes(self._store_file(photo, "photo"))
+        if document:
+            content["document"] = self._document(self._store_file(document, "document"))
+
+        return self._push_update({"message": self._new_message(user_id, user, **content)})
+
+    def user_press_button(self, user_id: int, message_id: int, data: str) -> JsonDict:
+        """Эмулировать нажатие пользователем кнопки встроенной клавиатуры сообщения бота"""
+        message = self._get_message(user_id, message_id, "message not found")
+        chat = self._chat(user_id)
+        user = {"id": user_id, "is_bot": False, "first_name": chat.get("first_name", f"User {user_id}")}
+        return self._push_update(
+            {
+                "callback_query": {
+                    "id": uuid.uuid4().hex,
+                    "from": user,
+                    "chat_instance": str(user_id),
+                    "message": message,
+                    "data": data,
+                }
+            }
+        )
+
+    def stats(self) -> JsonDict:
+        return {
+            "calls": dict(self.calls),
+            "flood_responses": self.flood_responses,
+            "pending_updates": len(self._updates),
+            "chats": len(self._chats),
+            "files": len(self._files),
+        }
+
+    def reset(self) -> None:
+        """Очистить чаты, сообщения, файлы, обновления и статистику, настройки бота сохраняются"""
+        self.calls.clear()
+        self.flood_responses = 0
+        self._updates.clear()
+        self._chats.clear()
+        self._message_ids.clear()
+        self._messages.clear()
+        self._files.clear()
+        self._files_by_path.clear()
+        self._global_window.clear()
+        self._chat_windows.clear()
+        self._keyboards.clear()
+
+    ### Методы Bot API ###
+
+    async def return_true(self, _: Params) -> bool:
+        return True
+
+    async def get_me(self, _: Params) -> JsonDict:
+        return self.bot_user
+
+    async def get_updates(self, params: Params) -> list[JsonDict]:
+        if self._webhook_url:
+            raise BotAPIError(
+                409,
+                "Conflict: can't use getUpdates method while webhook is active; "
+                "use deleteWebhook to delete the webhook first",
+            )
+
+        offset = params.get_int("offset", 0) or 0
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+
+        timeout = params.get_int("timeout", 0) or 0
+        if not self._updates and timeout > 0:
+            self._updates_event.clear()
+            try:
+                await asyncio.wait_for(self._updates_event.wait(), timeout)
+            except TimeoutError:
+                return []
+
+        limit = params.get_int("limit", 100) or 100
+        return list(itertools.islice(self._updates, limit))
+
+    async def set_webhook(self, params: Params) -> bool:
+        url = params.get_str("url")
+        if not url:
+            return await self.delete_webhook(params)
+        self._webhook_url = url
+        self._webhook_secret = params.get_str("secret_token")
+        if params.get_json("drop_pending_updates", default=False):
+            self._updates.clear()
+        for update in list(self._updates):
+            self._push_update(update)
+        self._updates.clear()
+        return True
+
+    async def delete_webhook(self, params: Params) -> bool:
+        self._webhook_url = None
+        self._webhook_secret = None
+        if params.get_json("drop_pending_updates", default=False):
+            self._updates.clear()
+        return True
+
+    async def get_webhook_info(self, _: Params) -> JsonDict:
+        return {
+            "url": self._webhook_url or "",
+            "has_custom_certificate": False,
+            "pending_update_count": len(self._updates),
+        }
+
+    async def send_message(self, params: Params) -> JsonDict:
+        text = params.get_str("text")
+        if not text:
+            raise BotAPIError(400, "Bad Request: message text is empty")
+        self._remember_keyboard(params.get_required_int("chat_id"), params)
+        return self._new_message(
+            params.get_required_int("chat_id"),
+            self.bot_user,
+            text=text,
+            entities=params.get_json("entities"),
+            reply_markup=self._inline_reply_markup(params),
+        )
+
+    async def send_photo(self, params: Params) -> JsonDict:
+        stored = self._resolve_file(params, "photo", "photo")
+        self._remember_keyboard(params.get_required_int("chat_id"), params)
+        return self._new_message(
+            params.get_required_int("chat_id"),
+            self.bot_user,
+            photo=self._photo_sizes(stored),
+            caption=params.get_str("caption"),
+            reply_markup=self._inline_reply_markup(params),
+        )
+
+    async def send_document(self, params: Params) -> JsonDict:
+        stored = self._resolve_file(params, "document", "document")
+        self._remember_keyboard(params.get_required_int("chat_id"), params)
+        return self._new_message(
+            params.get_required_int("chat_id"),
+            self.bot_user,
+            document=self._document(stored),
+            caption=params.get_str("caption"),
+            reply_markup=self._inline_reply_markup(params),
+        )
+
+    async def forward_message(self, params: Params) -> JsonDict:
+        original = self._get_message(
+            params.get_required_int("from_chat_id"),
+            params.get_required_int("message_id"),
+            "message to forward not found",
+        )
+        return self._new_message(
+            params.get_required_int("chat_id"),
+            self.bot_user,
+            forward_origin={"type": "user", "date": original["date"], "sender_user": original["from"]},
+            **{key: original[key] for key in COPIED_MESSAGE_CONTENT if key in original},
+        )
+
+    async def copy_message(self, params: Params) -> JsonDict:
+        original = self._get_message(
+            params.get_required_int("from_chat_id"),
+            params.get_required_int("message_id"),
+            "message to copy not found",
+        )
+        content = {key: original[key] for key in COPIED_MESSAGE_CONTENT if key in original}
+        caption = params.get_str("caption")
+        if caption is not None:
+            content["caption"] = caption
+        self._remember_keyboard(params.get_required_int("chat_id"), params)
+        message = self._new_message(
+            params.get_required_int("chat_id"), self.bot_user, reply_markup=self._inline_reply_markup(params), **content
+        )
+        return {"message_id": message["message_id"]}
+
+    def _batch_messages(self, params: Params) -> list[JsonDict]:
+        """Найденные сообщения пакетной пересылки, отсутствующие сообщения пропускаются как в Bot API"""
+        message_ids = params.get_json("message_ids")
+        if not isinstance(message_ids, list) or not 1 <= len(message_ids) <= MAX_BATCH_MESSAGES:
+            raise BotAPIError(400, "Bad Request: message_ids must contain from 1 to 100 identifiers")
+        if any(previous >= current for previous, current in itertools.pairwise(message_ids)):
+            raise BotAPIError(400, "Bad Request: message identifiers must be in strictly increasing order")
+        chat_messages = self._messages.get(params.get_required_int("from_chat_id"), {})
+        return [chat_messages[message_id] for message_id in message_ids if message_id in chat_messages]
+
+    async def forward_messages(self, params: Params) -> list[JsonDict]:
+        chat_id = params.get_required_int("chat_id")
+        return [
+            {
+                "message_id": self._new_message(
+                    chat_id,
+                    self.bot_user,
+                    forward_origin={"type": "user", "date": original["date"], "sender_user": original["from"]},
+                    **{key: original[key] for key in COPIED_MESSAGE_CONTENT if key in original},
+                )["message_id"]
+            }
+            for original in self._batch_messages(params)
+        ]
+
+    async def copy_messages(self, params: Params) -> list[JsonDict]:
+        chat_id = params.get_required_int("chat_id")
+        return [
+            {
+                "message_id": self._new_message(
+                    chat_id,
+                    self.bot_user,
+                    **{key: original[key] for key in COPIED_MESSAGE_CONTENT if key in original},
+                )["message_id"]
+            }
+            for original in self._batch_messages(params)
+        ]
+
+    async def edit_message_text(self, params: Params) -> JsonDict | bool:
+        if params.get_str("inline_message_id"):
+            return True
+        message = self._get_message(
+            params.get_required_int("chat_id"), params.get_required_int("message_id"), "message to edit not found"
+        )
+        text = params.get_str("text")
+        if not text:
+            raise BotAPIError(400, "Bad Request: message text is empty")
+        reply_markup = self._inline_reply_markup(params)
+        if message.get("text") == text and message.get("reply_markup") == reply_markup:
+            raise BotAPIError(400, "Bad Request: message is not modified")
+        message["text"] = text
+        message["edit_date"] = int(time.time())
+        self._set_reply_markup(message, reply_markup)
+        return message
+
+    async def edit_message_reply_markup(self, params: Params) -> JsonDict | bool:
+        if params.get_str("inline_message_id"):
+            return True
+        message = self._get_message(
+            params.get_required_int("chat_id"), params.get_required_int("message_id"), "message to edit not found"
+        )
+        reply_markup = self._inline_reply_markup(params)
+        if message.get("reply_markup") == reply_markup:
+            raise BotAPIError(400, "Bad Request: message is not modified")
+        message["edit_date"] = int(time.time())
+        self._set_reply_markup(message, reply_markup)
+        return message
+
+    @staticmethod
+    def _set_reply_markup(message: JsonDict, reply_markup: JsonDict | None) -> None:
+        if reply_markup:
+            message["reply_markup"] = reply_markup
+        else:
+            message.pop("reply_markup", None)
+
+    async def delete_message(self, params: Params) -> bool:
+        chat_id, message_id = params.get_required_int("chat_id"), params.get_required_int("message_id")
+        self._get_message(chat_id, message_id, "message to delete not found")
+        del self._messages[chat_id][message_id]
+        return True
+
+    async def get_file(self, params: Params) -> JsonDict:
+        stored = self._files.get(params.get_str("file_id") or "")
+        if not stored:
+            raise BotAPIError(400, "Bad Request: invalid file_id")
+        return stored.to_file()
+
+    @staticmethod
+    def _language_code(params: Params) -> str:
+        return params.get_str("language_code") or ""
+
+    async def get_my_name(self, params: Params) -> JsonDict:
+        return {"name": self._names.get(self._language_code(params), self._names[""])}
+
+    async def set_my_name(self, params: Params) -> bool:
+        self._names[self._language_code(params)] = params.get_str("name") or self.config.bot_first_name
+        return True
+
+    async def get_my_description(self, params: Params) -> JsonDict:
+        return {"description": self._descriptions.get(self._language_code(params), "")}
+
+    async def set_my_description(self, params: Params) -> bool:
+        self._descriptions[self._language_code(params)] = params.get_str("description") or ""
+        return True
+
+    async def get_my_short_description(self, params: Params) -> JsonDict:
+        return {"short_description": self._short_descriptions.get(self._language_code(params), "")}
+
+    async def set_my_short_description(self, params: Params) -> bool:
+        self._short_descriptions[self._language_code(params)] = params.get_str("short_description") or ""
+        return True
+
+    def _commands_key(self, params: Params) -> tuple[str, str]:
+        scope = params.get_json("scope", default={"type": "default"})
+        return json.dumps(scope, sort_keys=True), self._language_code(params)
+
+    async def get_my_commands(self, params: Params) -> list[JsonDict]:
+        return self._commands.get(self._commands_key(params), [])
+
+    async def set_my_commands(self, params: Params) -> bool:
+        self._commands[self._commands_key(params)] = params.get_json("commands", default=[])
+        return True
+
+    async def delete_my_commands(self, params: Params) -> bool:
+        self._commands.pop(self._commands_key(params), None)
+        return True
@@ -0,0 +1,17 @@
+from typing import Any
+
+
+class BotAPIError(Exception):
+    """Ошибка Bot API, возвращаемая клиенту в формате Telegram"""
+
+    def __init__(self, error_code: int, description: str, parameters: dict[str, Any] | None = None) -> None:
+        super().__init__(description)
+        self.error_code = error_code
+        self.description = description
+        self.parameters = parameters
+
+    def to_dict(self) -> dict[str, Any]:
+        response: dict[str, Any] = {"ok": False, "error_code": self.error_code, "description": self.description}
+        if self.parameters:
+            response["parameters"] = self.parameters
+        return response
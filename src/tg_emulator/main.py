@@ -0,0 +1,11 @@
+import uvicorn
+from loguru import logger
+
+from src.tg_emulator.app import app, config
+
+if __name__ == "__main__":
+    logger.info(f"Starting Telegram Bot API emulator on port {config.port}...")
+    try:
+        uvicorn.run(app=app, host="0.0.0.0", port=config.port, reload=False)
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Done! Have a great day!")
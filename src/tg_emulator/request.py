@@ -0,0 +1,61 @@
+import json
+from typing import Any
+
+from telegram.request import BaseRequest, RequestData
+
+from src.tg_emulator.emulator import Params, TelegramBotAPIEmulator, UploadedFile
+from src.tg_emulator.exceptions import BotAPIError
+
+
+class EmulatorRequest(BaseRequest):
+    """
+    Транспорт python-telegram-bot, выполняющий запросы к эмулятору Telegram Bot API в том же процессе
+
+    Используется в замерах производительности, чтобы исключить из них работу HTTP
+    """
+
+    def __init__(self, emulator: TelegramBotAPIEmulator) -> None:
+        self.emulator = emulator
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,  # noqa: ARG002
+        request_data: RequestData | None = None,
+        read_timeout: Any = None,  # noqa: ARG002
+        write_timeout: Any = None,  # noqa: ARG002
+        connect_timeout: Any = None,  # noqa: ARG002
+        pool_timeout: Any = None,  # noqa: ARG002
+    ) -> tuple[int, bytes]:
+        if "/file/bot" in url:
+            file_path = url.split("/file/bot", 1)[1].split("/", 1)[-1]
+            stored = self.emulator.get_file_content(file_path)
+            if not stored:
+                return 404, json.dumps(BotAPIError(404, "Not Found").to_dict()).encode()
+            return 200, stored.content
+
+        files: dict[str, UploadedFile] = {}
+        if request_data and request_data.contains_files:
+            for name, (filename, content, content_type) in request_data.multipart_data.items():
+                files[name] = UploadedFile(
+                    content=content if isinstance(content, bytes) else content.read(),
+                    filename=filename,
+                    content_type=content_type,
+                )
+
+        params = Params(dict(request_data.parameters) if request_data else {}, files)
+        try:
+            result = await self.emulator.call(url.rsplit("/", 1)[-1], params)
+        except BotAPIError as e:
+            return e.error_code, json.dumps(e.to_dict()).encode()
+        return 200, json.dumps({"ok": True, "result": result}).encode()
@@ -1,8 +1,10 @@
+import time
+from collections.abc import Awaitable, Callable
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.exceptions import HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
 from starlette.status import HTTP_401_UNAUTHORIZED
@@ -23,6 +25,8 @@ from src.ui.routers import (
     settings,
     users,
 )
+from src.utils.metrics import COUNT_BUCKETS, METRICS_CONTENT_TYPE, registry
+from src.utils.tracing import Trace, current_trace
 
 description = """
 UI сервис для управления ботами в коробках
@@ -89,8 +93,22 @@ tags_metadata = [
         "name": "healthz",
         "description": "Проверка того что приложение живо",
     },
+    {
+        "name": "metrics",
+        "description": "Метрики Prometheus",
+    },
 ]
 
+request_duration_seconds = registry.histogram(
+    "bb_ui_request_duration_seconds", "Время обработки запроса UI", labels=("route", "method")
+)
+request_db_queries = registry.histogram(
+    "bb_ui_request_db_queries", "Количество запросов к БД за запрос UI", labels=("route",), buckets=COUNT_BUCKETS
+)
+request_db_pool_wait_seconds = registry.histogram(
+    "bb_ui_request_db_pool_wait_seconds", "Время ожидания соединений из пула за запрос UI", labels=("route",)
+)
+
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):  # noqa: ANN201
@@ -99,6 +117,7 @@ async def lifespan(_: FastAPI):  # noqa: ANN201
     """
     await provider.async_init()
     yield
+    provider.minio.close()
 
 
 app = FastAPI(
@@ -150,6 +169,37 @@ async def healz() -> PlainTextResponse:
     return PlainTextResponse("OK")
 
 
+@app.middleware("http")
+async def measure_request(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    """
+    Учитывает время обработки запроса и использование БД в метриках
+
+    Если запрос выполняется внутри уже отслеживаемой единицы работы, например при проверке бюджета запросов,
+    запрос учитывается в её трассировке
+    """
+    trace = current_trace.get() or Trace()
+    trace_token = current_trace.set(trace)
+    started_at = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        current_trace.reset(trace_token)
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        request_duration_seconds.observe(time.perf_counter() - started_at, route=route, method=request.method)
+        request_db_queries.observe(trace.queries, route=route)
+        request_db_pool_wait_seconds.observe(trace.pool_wait_seconds, route=route)
+
+
+if provider.config.ui_metrics_enabled:
+
+    @app.get(f"{provider.config.path_prefix}/metrics", tags=["metrics"])
+    async def metrics() -> Response:
+        """
+        Возвращает метрики в текстовом формате Prometheus
+        """
+        return Response(await registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 app.include_router(login.router)
 app.include_router(minio.router)
 
@@ -0,0 +1,48 @@
+/////////
+/// Loads all images marked with `minio-batch-image` class in batches
+/// Each batch is a single request to `/minio/batch` returning packed thumbnails
+/////////
+const MINIO_BATCH_SIZE = 100;
+
+function minioBatchLoad(uri_prefix, images) {
+    const objects = images.map((image) => ({
+        bucket: image.dataset.minioBucket,
+        filename: image.dataset.minioFilename,
+    }));
+    return fetch(`${uri_prefix}/minio/batch`, {
+        method: 'POST',
+        body: JSON.stringify({objects: objects}),
+        headers: {
+            'Content-Type': 'application/json',
+            Accept: 'application/octet-stream'
+        },
+    })
+    .then((responce) => responce.arrayBuffer())
+    .then((buffer) => {
+        /// Unpack index length, index and payload
+        const index_length = new DataView(buffer).getUint32(0);
+        const index = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, index_length)));
+        const payload_start = 4 + index_length;
+        index.forEach((item, idx) => {
+            if (item.offset === null) {
+                return;
+            }
+            const blob = new Blob(
+                [new Uint8Array(buffer, payload_start + item.offset, item.length)],
+                {type: item.mime}
+            );
+            images[idx].src = URL.createObjectURL(blob);
+        });
+    });
+}
+
+$(() => {
+    const images = $('.minio-batch-image').toArray();
+    if (images.length === 0) {
+        return;
+    }
+    const uri_prefix = images[0].dataset.uriPrefix;
+    for (let start = 0; start < images.length; start += MINIO_BATCH_SIZE) {
+        minioBatchLoad(uri_prefix, images.slice(start, start + MINIO_BATCH_SIZE));
+    }
+})
@@ -13,6 +13,7 @@ from sqlalchemy.exc import IntegrityError
 from src.ui.app import provider
 from src.ui.keycloak import KeycloakUser
 from src.utils.db_model import Base
+from src.utils.db_notifications import notify
 
 templates = Jinja2Templates(directory=f"{provider.config.app_home}/src/ui/templates")
 
@@ -119,11 +120,14 @@ def prepare_attrs_object_from_request(
     return attrs
 
 
-async def try_to_save_attrs(db_type: type[Base], db_attrs: dict[str | int, dict[str, Any]]) -> JSONResponse:
+async def try_to_save_attrs(
+    db_type: type[Base], db_attrs: dict[str | int, dict[str, Any]], notify_channel: str | None = None
+) -> JSONResponse:
     """
     Общая функция для сохранения записей в БД
     * db_type: type[Base] - тип объекта БД
     * db_attrs: dict[str | int, dict[str, Any]] - сохраняемые объекты БД: идентификатор или new и данные полей
+    * notify_channel: str | None = None - канал оповещения бота об изменении, оповещение отправляется при сохранении
     """
     async with provider.db_sessionmaker() as session:
         for idx, db_attr in db_attrs.items():
@@ -131,6 +135,8 @@ async def try_to_save_attrs(db_type: type[Base], db_attrs: dict[str | int, dict[
                 await session.execute(insert(db_type).values(**db_attr))
             else:
                 await session.execute(update(db_type).where(db_type.__table__.c["id"] == idx).values(**db_attr))
+        if notify_channel:
+            await notify(session, notify_channel)
         try:
             await session.commit()
             logger.success(f"Updated table {db_type.__name__}")
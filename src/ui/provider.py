@@ -1,7 +1,7 @@
 from fastapi import Request
 from fastapi.security import OAuth2AuthorizationCodeBearer
 from loguru import logger
-from sqlalchemy import insert, select
+from sqlalchemy import insert, select, text
 from sqlalchemy.exc import IntegrityError
 
 from src.ui.keycloak import Keycloak
@@ -12,8 +12,15 @@ from src.utils.db_model import (
     BotStatus,
     Field,
     FieldBranch,
+    Log,
+    NewsPost,
+    NewsPostTag,
     Settings,
 )
+from src.utils.log_partitions import ensure_log_partitions
+from src.utils.minio_cache import MinIODiskCache
+from src.utils.schema_version import get_saved_schema_version, get_schema_version, save_schema_version
+from src.utils.user_statistics import install_user_statistics
 
 
 class OAuth2AuthorizationCodeBearerOrCookie(OAuth2AuthorizationCodeBearer):
@@ -50,6 +57,13 @@ class Provider(BBProvider):
             verify=self.config.keycloak_verify,
         )
 
+        if self.config.minio_cache_dir:
+            self.minio.cache = MinIODiskCache(
+                directory=self.config.minio_cache_dir,
+                max_size_bytes=self.config.minio_cache_max_size_mb * 1024 * 1024,
+                etag_ttl=self.config.minio_cache_etag_ttl,
+            )
+
         self.oauth2_scheme = OAuth2AuthorizationCodeBearerOrCookie(
             authorizationUrl=f"{self.config.keycloak_url}/relams/{self.config.keycloak_realm}/protocol/openid-connect/auth",
             tokenUrl=f"{self.config.keycloak_url}/relams/{self.config.keycloak_realm}/protocol/openid-connect/token",
@@ -58,22 +72,54 @@ class Provider(BBProvider):
     async def async_init(self) -> None:
         """
         Асинхронная инциализация
+
+        Если версия схемы БД совпадает с сохранённой после прошлой инициализации - создание таблиц
+        и шаги инициализации пропускаются
         """
         logger.info("Async initializing...")
 
+        schema_version = get_schema_version()
+        with self.startup_profile.stage("schema version check"):
+            async with self.db_engine.connect() as conn:
+                saved_schema_version = await get_saved_schema_version(conn)
+        if saved_schema_version == schema_version:
+            logger.success("DB schema version matches... skipping initialization")
+            self.startup_profile.report()
+            return
+
         logger.info("Initializing DB...")
-        async with self.db_engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        with self.startup_profile.stage("create tables"):
+            async with self.db_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
 
         logger.info("Initializing BotStatus table...")
-        await self._async_init_bot_status()
+        with self.startup_profile.stage("bot status"):
+            await self._async_init_bot_status()
 
         logger.info("Initializing Settings table...")
-        await self._async_init_settings()
+        with self.startup_profile.stage("settings"):
+            await self._async_init_settings()
 
         logger.info("Initializing FieldBranches and Fields tables...")
-        await self._async_init_fields()
+        with self.startup_profile.stage("fields"):
+            await self._async_init_fields()
+
+        logger.info("Initializing logs table...")
+        with self.startup_profile.stage("logs"):
+            await self._async_init_logs()
+
+        logger.info("Initializing news post tags...")
+        with self.startup_profile.stage("news post tags"):
+            await self._async_init_news_post_tags()
+
+        logger.info("Initializing user statistics...")
+        with self.startup_profile.stage("user statistics"):
+            await self._async_init_user_statistics()
 
+        async with self.db_engine.begin() as conn:
+            await save_schema_version(conn, schema_version)
+
+        self.startup_profile.report()
         logger.info("Done async initialize...")
 
     async def _async_init_bot_status(self) -> None:
@@ -217,6 +263,52 @@ class Provider(BBProvider):
                 await session.rollback()
                 logger.error("Did not initialize FieldBranches and Fields tables...")
 
+    async def _async_init_logs(self) -> None:
+        """
+        Внутренняя функция для переноса логов из непартиционированной таблицы `logs` прошлых версий
+        """
+        async with self.db_engine.begin() as conn:
+            if not await conn.scalar(text("SELECT to_regclass('logs')")):
+                logger.success("No legacy logs table found... skipping")
+                return
+
+            legacy_months = await conn.scalars(text("SELECT DISTINCT date_trunc('month', timestamp) FROM logs"))
+            await ensure_log_partitions(conn, legacy_months.all())
+            await conn.execute(
+                text(
+                    f"INSERT INTO {Log.__tablename__} (timestamp, message) "
+                    "SELECT timestamp, message FROM logs ORDER BY id"
+                )
+            )
+            await conn.execute(text("DROP TABLE logs"))
+        logger.success("Moved legacy logs into partitioned logs table...")
+
+    async def _async_init_news_post_tags(self) -> None:
+        """
+        Внутренняя функция для заполнения нормализованных тегов новостей, опубликованных до появления таблицы тегов
+
+        Теги, сохранённые со знаками препинания, удаляются и заполняются заново так же, как при публикации
+        """
+        async with self.db_engine.begin() as conn:
+            await conn.execute(text(f"DELETE FROM {NewsPostTag.__tablename__} WHERE tag !~ '^\\w+$'"))
+            result = await conn.execute(
+                text(
+                    f"INSERT INTO {NewsPostTag.__tablename__} (tag, news_post_id) "
+                    f"SELECT DISTINCT lower(tag[1]), {NewsPost.__tablename__}.id "
+                    f"FROM {NewsPost.__tablename__}, regexp_matches({NewsPost.__tablename__}.tags, '#(\\w+)', 'g') tag "
+                    "ON CONFLICT DO NOTHING"
+                )
+            )
+        logger.success(f"Filled {result.rowcount} news post tags...")
+
+    async def _async_init_user_statistics(self) -> None:
+        """
+        Внутренняя функция для установки триггеров счётчиков пользователей, счётчики пересчитываются только при установке
+        """
+        async with self.db_engine.begin() as conn:
+            await install_user_statistics(conn)
+        logger.success("Installed user statistics...")
+
     def prepare_error_prefix(self, idx: str | int, prefix_name: str) -> str:
         return f"{prefix_name} {idx if idx != 'new' else provider.config.i18n.new_record}:"
 
@@ -1,4 +1,5 @@
-from typing import Annotated
+from enum import Enum
+from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, Request
 from fastapi.exceptions import HTTPException
@@ -8,7 +9,7 @@ from fastapi.responses import (
     RedirectResponse,
 )
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import func, insert, select
 from starlette.status import HTTP_302_FOUND
 
 from src.ui.app import provider
@@ -21,10 +22,19 @@ from src.ui.helpers import (
 )
 from src.ui.keycloak import KEYCLOAK_ROLE, KeycloakUser
 from src.utils.custom_types import FieldStatusEnum, FieldTypeEnum
-from src.utils.db_model import Field, FieldBranch
+from src.utils.db_model import ComputedFieldRecompute, Field, FieldBranch
 
 router = APIRouter(prefix=provider.config.path_prefix, dependencies=[Depends(RequireRoles([KEYCLOAK_ROLE]))])
 
+RECOMPUTE_FIELD_ATTRS = [
+    "status",
+    "type",
+    "question_markdown_or_j2_template",
+    "validation_regexp",
+    "validation_remove_regexp",
+]
+"""Атрибуты поля, при изменении которых значения вычисляемого после регистрации поля пересчитываются"""
+
 
 @router.get("/fields", tags=["fields"])
 async def get_fields() -> RedirectResponse:
@@ -141,4 +151,61 @@ async def post_fields(branch_id: int, request: Request) -> JSONResponse:
                 f"{error_prefix} {provider.config.i18n.error_jinja2_field_should_be_full_text_or_boolean}",
             )
 
-    return await try_to_save_attrs(Field, fields_attrs)
+    recompute_field_keys = await _get_recompute_field_keys(fields_attrs)
+
+    response = await try_to_save_attrs(Field, fields_attrs)
+
+    if recompute_field_keys:
+        await _enqueue_fields_recompute(recompute_field_keys)
+
+    return response
+
+
+async def _get_recompute_field_keys(fields_attrs: dict[str | int, dict[str, Any]]) -> list[str]:
+    """Ключи новых и изменённых полей, вычисляемых после регистрации, значения которых надо пересчитать"""
+    async with provider.db_sessionmaker() as session:
+        saved_fields = {
+            field.id: field
+            for field in await session.scalars(
+                select(Field).where(Field.id.in_([idx for idx in fields_attrs if isinstance(idx, int)]))
+            )
+        }
+
+    recompute_field_keys: list[str] = []
+    for idx, field in fields_attrs.items():
+        status = _comparable_attr(field.get("status"))
+        if status != FieldStatusEnum.JINJA2_FROM_USER_AFTER_REGISTRATION.value or not field.get("key"):
+            continue
+        saved_field = saved_fields.get(idx) if isinstance(idx, int) else None
+        if saved_field is None or any(
+            attr in field and _comparable_attr(field[attr]) != _comparable_attr(getattr(saved_field, attr))
+            for attr in RECOMPUTE_FIELD_ATTRS
+        ):
+            recompute_field_keys.append(field["key"])
+    return recompute_field_keys
+
+
+def _comparable_attr(value: Any) -> Any:
+    """
+    Значение атрибута поля для сравнения сохранённого поля с подготовленными данными запроса
+
+    Перечисления сравниваются по значению, пустые строки - как отсутствие значения
+    """
+    if isinstance(value, Enum):
+        return value.value
+    if value == "":
+        return None
+    return value
+
+
+async def _enqueue_fields_recompute(field_keys: list[str]) -> None:
+    """Поставить в очередь пересчёт полей для всех пользователей - пересчёт выполняет бот"""
+    async with provider.db_sessionmaker() as session:
+        await session.execute(
+            insert(ComputedFieldRecompute).from_select(
+                ["timestamp", "field_id"],
+                select(func.now(), Field.id).where(Field.key.in_(field_keys)),
+            )
+        )
+        await session.commit()
+    logger.info(f"Enqueued recompute of fields {field_keys=}")
@@ -1,8 +1,10 @@
+from datetime import datetime
 from typing import Annotated
+from urllib.parse import urlencode
 
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse
+from sqlalchemy import select, tuple_
 
 from src.ui.app import provider
 from src.ui.dependencies import RequireRoles, get_user
@@ -12,14 +14,73 @@ from src.utils.db_model import Log
 
 router = APIRouter(prefix=provider.config.path_prefix, dependencies=[Depends(RequireRoles([KEYCLOAK_ROLE]))])
 
+LOGS_PAGE_SIZE = 100
+"""Количество логов на странице по умолчанию"""
+
+LOGS_MAX_PAGE_SIZE = 1000
+"""Максимальное количество логов в одном запросе"""
+
+
+async def select_logs(
+    search: str | None,
+    since: datetime | None,
+    until: datetime | None,
+    before_timestamp: datetime | None,
+    before_id: int | None,
+    limit: int,
+) -> list[Log]:
+    """
+    Получить страницу логов от новых к старым
+
+    Страницы выбираются по ключу (время, идентификатор) последнего лога предыдущей страницы,
+    поэтому запрос использует первичный ключ и не зависит от номера страницы
+    """
+    statement = select(Log)
+    if search:
+        statement = statement.where(Log.message.icontains(search, autoescape=True))
+    if since:
+        statement = statement.where(Log.timestamp >= since)
+    if until:
+        statement = statement.where(Log.timestamp < until)
+    if before_timestamp and before_id is not None:
+        statement = statement.where(tuple_(Log.timestamp, Log.id) < tuple_(before_timestamp, before_id))
+
+    async with provider.db_sessionmaker() as session:
+        return list(await session.scalars(statement.order_by(Log.timestamp.desc(), Log.id.desc()).limit(limit)))
+
+
+def get_logs_next_page_params(logs: list[Log], limit: int) -> dict[str, str | int] | None:
+    """Параметры запроса следующей страницы или None, если страница последняя"""
+    if len(logs) < limit:
+        return None
+    return {"before_timestamp": logs[-1].timestamp.isoformat(), "before_id": logs[-1].id}
+
 
 @router.get("/logs", tags=["logs"])
-async def logs(request: Request, user: Annotated[KeycloakUser, Depends(get_user)]) -> HTMLResponse:
+async def logs(
+    request: Request,
+    user: Annotated[KeycloakUser, Depends(get_user)],
+    search: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    before_timestamp: datetime | None = None,
+    before_id: int | None = None,
+) -> HTMLResponse:
     """
     Показывает текущие логи работы бота
     """
-    async with provider.db_sessionmaker() as session:
-        logs = await session.scalars(select(Log).order_by(Log.id.desc()).limit(1000))
+    logs = await select_logs(search, since, until, before_timestamp, before_id, LOGS_PAGE_SIZE)
+
+    filters = {
+        key: value
+        for key, value in {
+            "search": search,
+            "since": since.isoformat() if since else None,
+            "until": until.isoformat() if until else None,
+        }.items()
+        if value
+    }
+    next_page_params = get_logs_next_page_params(logs, LOGS_PAGE_SIZE)
 
     return template(
         request=request,
@@ -27,4 +88,29 @@ async def logs(request: Request, user: Annotated[KeycloakUser, Depends(get_user)
         template_name="logs.j2.html",
         title=provider.config.i18n.logs,
         logs=logs,
+        filters=filters,
+        next_page_query=urlencode(filters | next_page_params) if next_page_params else None,
+    )
+
+
+@router.get("/logs/api", tags=["logs"])
+async def logs_api(
+    search: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    before_timestamp: datetime | None = None,
+    before_id: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=LOGS_MAX_PAGE_SIZE)] = LOGS_PAGE_SIZE,
+) -> JSONResponse:
+    """
+    Возвращает страницу логов работы бота от новых к старым
+
+    Для получения следующей страницы следует передать параметры из поля `next` ответа
+    """
+    logs = await select_logs(search, since, until, before_timestamp, before_id, limit)
+    return JSONResponse(
+        {
+            "logs": [{"id": log.id, "timestamp": log.timestamp.isoformat(), "message": log.message} for log in logs],
+            "next": get_logs_next_page_params(logs, limit),
+        }
     )
@@ -1,6 +1,9 @@
 import base64
+import json
+import struct
+from typing import Any
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi.exceptions import HTTPException
 from fastapi.responses import (
     JSONResponse,
@@ -14,6 +17,9 @@ from src.ui.keycloak import KEYCLOAK_ROLE
 
 router = APIRouter(prefix=provider.config.path_prefix, dependencies=[Depends(RequireRoles([KEYCLOAK_ROLE]))])
 
+MINIO_BATCH_MAX_OBJECTS = 200
+"""Максимальное количество файлов в одном пакетном запросе"""
+
 
 @router.get("/minio/base64/{bucket}/{filename}", tags=["minio"])
 async def get_minio_b64(bucket: str, filename: str) -> Response:
@@ -30,6 +36,66 @@ async def get_minio_b64(bucket: str, filename: str) -> Response:
     )
 
 
+def get_minio_batch_objects(request_data: Any) -> list[tuple[str, str]]:
+    """
+    Проверяет пакетный запрос и возвращает пары бакета и имени файла
+
+    Пример запроса: `{'objects': [{'bucket': 'images', 'filename': 'name.1.thumbnail.jpg'}, ...]}`
+    """
+    if not isinstance(request_data, dict) or not isinstance(request_data.get("objects"), list):
+        raise HTTPException(500, provider.config.i18n.error_bad_minio_batch_request)
+
+    objects: list[tuple[str, str]] = []
+    for obj in request_data["objects"]:
+        if (
+            not isinstance(obj, dict)
+            or not isinstance(obj.get("bucket"), str)
+            or not isinstance(obj.get("filename"), str)
+        ):
+            raise HTTPException(500, f"{provider.config.i18n.error_bad_minio_batch_request} {obj=}")
+        objects.append((obj["bucket"], obj["filename"]))
+
+    if len(objects) > MINIO_BATCH_MAX_OBJECTS:
+        raise HTTPException(500, f"{provider.config.i18n.error_bad_minio_batch_request} {len(objects)=}")
+
+    return objects
+
+
+@router.post("/minio/batch", tags=["minio"])
+async def post_minio_batch(request: Request) -> Response:
+    """
+    Прокси к minio, который возвращает несколько файлов (эскизов) одним бинарным ответом
+
+    Формат ответа:
+    * 4 байта - длина индекса в байтах (big-endian)
+    * индекс - JSON список `{bucket, filename, mime, offset, length}` в порядке запроса,
+      `offset` равен `null` если файл не найден
+    * содержимое всех найденных файлов подряд
+    """
+    objects = get_minio_batch_objects(await request.json())
+    downloaded = await provider.minio.download_many(objects)
+
+    index: list[dict[str, str | int | None]] = []
+    payload: list[bytes] = []
+    offset = 0
+    for (bucket, filename), (bio, content_type) in zip(objects, downloaded, strict=True):
+        if not bio:
+            index.append({"bucket": bucket, "filename": filename, "mime": None, "offset": None, "length": 0})
+            continue
+        content = bio.getvalue()
+        index.append(
+            {"bucket": bucket, "filename": filename, "mime": content_type, "offset": offset, "length": len(content)}
+        )
+        payload.append(content)
+        offset += len(content)
+
+    index_bytes = json.dumps(index, ensure_ascii=False).encode()
+    return Response(
+        content=b"".join([struct.pack(">I", len(index_bytes)), index_bytes, *payload]),
+        media_type="application/octet-stream",
+    )
+
+
 @router.get("/minio/{bucket}/{filename}", tags=["minio"])
 async def get_minio_stream(bucket: str, filename: str) -> Response:
     """Прокси к minio, который возвращает файл"""
@@ -19,6 +19,7 @@ from src.ui.helpers import (
 from src.ui.keycloak import KEYCLOAK_ROLE, KeycloakUser
 from src.utils.custom_types import PromocodeStatusEnum
 from src.utils.db_model import Promocode
+from src.utils.db_notifications import PROMOCODES_CHANGED_CHANNEL
 
 router = APIRouter(prefix=provider.config.path_prefix, dependencies=[Depends(RequireRoles([KEYCLOAK_ROLE]))])
 
@@ -49,4 +50,4 @@ async def post_promocodes(request: Request) -> JSONResponse:
     request_data = await get_request_data_or_responce(request, "promocodes")
     logger.debug(f"Got promocodes update request with {request_data=}")
     promocodes_attrs = prepare_attrs_object_from_request(request_data, status=PromocodeStatusEnum)
-    return await try_to_save_attrs(Promocode, promocodes_attrs)
+    return await try_to_save_attrs(Promocode, promocodes_attrs, notify_channel=PROMOCODES_CHANGED_CHANNEL)
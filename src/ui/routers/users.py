@@ -36,6 +36,7 @@ from src.utils.db_model import (
     User,
     UserFieldValue,
 )
+from src.utils.user_pivot import select_users_plain_dicts
 
 router = APIRouter(prefix=provider.config.path_prefix, dependencies=[Depends(RequireRoles([KEYCLOAK_ROLE]))])
 
@@ -185,8 +186,7 @@ async def get_users_report() -> Response:
     logger.debug("Starting prepare of users full report")
 
     async with provider.db_sessionmaker() as session:
-        users_selected = await session.execute(select(User).order_by(User.id.asc()))
-        users_df = pd.DataFrame([user.to_plain_dict(i18n=provider.config.i18n) for user in users_selected.scalars()])
+        users_df = pd.DataFrame(await select_users_plain_dicts(session, i18n=provider.config.i18n))
 
         logger.debug(f"Users df:\n{users_df}")
 
@@ -4,9 +4,12 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from src.utils.config_model import create_config
+from src.utils.db_metrics import MeasuredAsyncAdaptedQueuePool, instrument_engine
 from src.utils.db_model import BotStatus, Settings
 from src.utils.exceptions import NoBotStatusError, NoSettingsError
 from src.utils.minio_client import MinIOClient
+from src.utils.minio_content_index import MinIOContentIndex
+from src.utils.startup_profile import StartupProfile
 
 
 class BBProvider:
@@ -16,6 +19,7 @@ class BBProvider:
 
     def __init__(self) -> None:
         self.config = create_config()
+        self.startup_profile = StartupProfile(self.config.startup_profile)
         self.db_engine = create_async_engine(
             f"postgresql+asyncpg://{self.config.postgres_user}:{self.config.postgres_password.get_secret_value()}@{self.config.postgres_host}/{self.config.postgres_db}",
             echo=False,
@@ -24,14 +28,24 @@ class BBProvider:
             pool_recycle=300,
             pool_pre_ping=True,
             pool_use_lifo=True,
+            poolclass=MeasuredAsyncAdaptedQueuePool,
         )
+        instrument_engine(self.db_engine)
         self.db_sessionmaker = async_sessionmaker(bind=self.db_engine)
         self.minio = MinIOClient(
             self.config.minio_host,
             self.config.minio_secure,
             self.config.minio_access_key,
             self.config.minio_secret_key.get_secret_value(),
+            pool_size=self.config.minio_pool_size,
+            connect_timeout=self.config.minio_connect_timeout,
+            read_timeout=self.config.minio_read_timeout,
+            operation_timeout=self.config.minio_operation_timeout,
+            image_pool_workers=self.config.minio_image_pool_workers,
+            image_pool_queue_size=self.config.minio_image_pool_queue_size,
         )
+        if self.config.minio_content_addressed:
+            self.minio.content_index = MinIOContentIndex(self.db_sessionmaker)
         self.tz = ZoneInfo(self.config.tz)
 
     @property
@@ -149,6 +149,7 @@ class I18n(BaseModel, extra="forbid"):
     download_users_report: str
     error_answer_options_can_only_be_shown_with_full_text_field: str
     error_bad_field_request: str
+    error_bad_minio_batch_request: str
     error_cannot_set_parent_key_id_in_keyboard_key_object_while_status_is_news: str
     error_could_not_restore_previous_api_call: str
     error_could_not_update_bot_status: str
@@ -238,6 +239,11 @@ class I18n(BaseModel, extra="forbid"):
     keyboard: str
     logout: str
     logs: str
+    logs_filter: str
+    logs_next_page: str
+    logs_search: str
+    logs_since: str
+    logs_until: str
     message: str
     new_record: str
     news_tag: str
@@ -341,6 +347,8 @@ class ConfigYaml(BaseSettings):
     path_prefix: str
 
     tg_token: str
+    tg_base_url: str = "https://api.telegram.org/bot"
+    tg_base_file_url: str = "https://api.telegram.org/file/bot"
 
     postgres_host: str
     postgres_db: str
@@ -351,6 +359,41 @@ class ConfigYaml(BaseSettings):
     minio_secure: bool
     minio_access_key: str
     minio_secret_key: SecretStr
+    minio_pool_size: int = 32
+    minio_connect_timeout: float = 5
+    minio_read_timeout: float = 60
+    minio_operation_timeout: float = 120
+    minio_image_pool_workers: int = 2
+    minio_image_pool_queue_size: int = 16
+
+    file_ingestion_concurrency: int = 4
+
+    minio_cache_dir: str | None = None
+    minio_cache_max_size_mb: int = 512
+    minio_cache_etag_ttl: float = 5
+
+    minio_content_addressed: bool = False
+
+    log_batch_size: int = 100
+    log_flush_interval: float = 5
+    log_buffer_max_size: int = 10000
+    log_retention_days: int = 90
+
+    bot_metrics_port: int | None = None
+    ui_metrics_enabled: bool = False
+
+    slow_update_threshold: float = 1.0
+    slow_job_threshold: float = 30.0
+
+    promocodes_cache_ttl: float = 300
+
+    computed_fields_batch_size: int = 500
+
+    persistence_update_interval: float = 10
+
+    shutdown_drain_timeout: float = 30
+
+    startup_profile: bool = False
 
     keycloak_url: str
     keycloak_realm: str
@@ -201,6 +201,19 @@ class PassSubmitStatusEnum(Enum):
     """Пропуск одобрен"""
 
 
+class FileIngestionStatusEnum(Enum):
+    """Статус загрузки файла пользователя в хранилище"""
+
+    PENDING = "pending"
+    """Файл ожидает загрузки"""
+    IN_PROGRESS = "in_progress"
+    """Файл загружается"""
+    DONE = "done"
+    """Файл загружен"""
+    FAILED = "failed"
+    """Файл не удалось загрузить за все попытки"""
+
+
 class UserFieldDataPlain(NamedTuple):
     """Значение поля пользователя"""
 
@@ -236,3 +249,20 @@ class UserDataPrepared(NamedTuple):
     chat_id: int
     username: str | None
     fields: dict[int, UserFieldDataPrepared]
+
+
+class UserStatistics(NamedTuple):
+    """Агрегированные данные пользователей для отчётов"""
+
+    total: int
+    """Количество пользователей"""
+    by_status: dict[str, int]
+    """Количество пользователей по статусам"""
+    by_pass_status: dict[str, int]
+    """Количество пользователей по статусам пропуска"""
+    branches_completed: dict[str, int]
+    """Количество пользователей, ответивших на последний вопрос ветки, по ключам веток"""
+    fields_answered: dict[str, int]
+    """Количество непустых ответов по ключам полей"""
+    fields_true: dict[str, int]
+    """Количество положительных ответов по ключам булевых полей"""
@@ -0,0 +1,82 @@
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.utils.metrics import registry
+from src.utils.tracing import current_trace
+
+db_queries_total = registry.counter("bb_db_queries_total", "Количество запросов к БД")
+db_query_seconds = registry.histogram("bb_db_query_seconds", "Время выполнения запросов к БД")
+db_pool_checkouts_total = registry.counter("bb_db_pool_checkouts_total", "Количество получений соединений из пула")
+db_pool_wait_seconds = registry.histogram("bb_db_pool_wait_seconds", "Время ожидания соединения из пула")
+db_pool_checked_out = registry.gauge("bb_db_pool_checked_out", "Количество выданных соединений пула")
+
+QUERY_STARTED_AT_KEY = "bb_query_started_at"
+"""Ключ `Connection.info` со стеком времени начала выполняемых запросов"""
+
+
+class MeasuredAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, учитывающий время ожидания свободного соединения"""
+
+    def _do_get(self) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - started_at
+            db_pool_wait_seconds.observe(elapsed)
+            trace = current_trace.get()
+            if trace:
+                trace.pool_wait_seconds += elapsed
+
+
+def _on_before_cursor_execute(conn: Any, *_: Any) -> None:
+    conn.info.setdefault(QUERY_STARTED_AT_KEY, []).append(time.perf_counter())
+
+
+def _on_after_cursor_execute(conn: Any, _: Any, statement: str, *__: Any) -> None:
+    started_at_stack = conn.info.get(QUERY_STARTED_AT_KEY)
+    if not started_at_stack:
+        return
+    elapsed = time.perf_counter() - started_at_stack.pop()
+
+    db_queries_total.inc()
+    db_query_seconds.observe(elapsed)
+    trace = current_trace.get()
+    if trace:
+        trace.queries += 1
+        trace.db_seconds += elapsed
+        if trace.statements is not None:
+            trace.statements.append(statement)
+
+
+def _on_handle_error(context: Any) -> None:
+    if context.connection is None:
+        return
+    started_at_stack = context.connection.info.get(QUERY_STARTED_AT_KEY)
+    if started_at_stack:
+        started_at_stack.pop()
+
+
+def _on_checkout(*_: Any) -> None:
+    db_pool_checkouts_total.inc()
+    db_pool_checked_out.inc()
+    trace = current_trace.get()
+    if trace:
+        trace.checkouts += 1
+
+
+def _on_checkin(*_: Any) -> None:
+    db_pool_checked_out.inc(-1)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подключить учёт запросов и соединений движка БД"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _on_before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _on_after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _on_handle_error)
+    event.listen(engine.sync_engine.pool, "checkout", _on_checkout)
+    event.listen(engine.sync_engine.pool, "checkin", _on_checkin)
@@ -1,7 +1,8 @@
 from datetime import datetime
-from typing import Literal
+from typing import Any
 
-from sqlalchemy import BigInteger, Column, ForeignKey, Integer
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, PrimaryKeyConstraint, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -16,6 +17,7 @@ from src.utils.custom_types import (
     FieldBranchStatusEnum,
     FieldStatusEnum,
     FieldTypeEnum,
+    FileIngestionStatusEnum,
     GroupStatusEnum,
     KeyboardKeyStatusEnum,
     NotificationStatusEnum,
@@ -24,10 +26,10 @@ from src.utils.custom_types import (
     PromocodeStatusEnum,
     ReplyTypeEnum,
     UserDataPrepared,
-    UserFieldDataPlain,
     UserFieldDataPrepared,
     UserStatusEnum,
 )
+from src.utils.pivot import PivotField, PlainDictType, pivot_columns, pivot_row
 
 
 class Base(MappedAsDataclass, DeclarativeBase):
@@ -47,6 +49,19 @@ class BotStatus(Base):
     """Статус открытия регстрации"""
 
 
+class SchemaVersion(Base):
+    """
+    Версия схемы БД, с которой была выполнена инициализация UI
+
+    При совпадении версии UI пропускает создание таблиц и шаги инициализации
+    """
+
+    __tablename__ = "schema_version"
+
+    version: Mapped[str] = mapped_column(primary_key=True, nullable=False)
+    """Хеш DDL таблиц и ревизии шагов инициализации"""
+
+
 class Group(Base):
     """Группа, в которую бот будет высылать уведомления"""
 
@@ -314,7 +329,7 @@ class User(Base):
         self,
         branch_id: int | None = None,
         i18n: I18n | None = None,
-        result_dict_type: Literal["full", "ordered_pass_report"] = "full",
+        result_dict_type: PlainDictType = "full",
     ) -> dict[str, str | int | None]:
         """
         Преобразовать в плоский словарь для табличной выгрузки
@@ -324,37 +339,17 @@ class User(Base):
           full - Выгрузка всех полей пользователя (статичных и дополнительных)
           ordered_pass_report - Только отсортированные данные для отчёта пропусков
         """
-        user_dict: dict[str, str | int | None] = {}
-        if result_dict_type == "full":
-            user_dict |= {"id": self.id, "chat_id": self.chat_id, "username": self.username}
-
-        fields_dict: dict[str, UserFieldDataPlain] = {}
-        for field_value in self.fields_values:
-            field_value: UserFieldValue
-            field: Field = field_value.field
-
-            check_if_field_in_branch: bool = not branch_id or branch_id == field.branch_id
-            check_if_field_in_result: bool = result_dict_type == "full" or (
-                field.report_order is not None and field.report_order >= 1
-            )
-            if check_if_field_in_branch and check_if_field_in_result:
-                value = field_value.value
-                if field.type == FieldTypeEnum.BOOLEAN and i18n:
-                    if value == "true":
-                        value = i18n.yes
-                    elif value == "false":
-                        value = i18n.no
-
-                if result_dict_type == "full":
-                    field_order_key = f"{field.branch_id:04d}_{field.order_place:04d}"
-                elif result_dict_type == "ordered_pass_report":
-                    field_order_key = f"{field.report_order:04d}"
-
-                fields_dict |= {field_order_key: UserFieldDataPlain(key=field.key, value=value)}
-        user_dict |= {fv.key: fv.value for _, fv in sorted(fields_dict.items(), key=lambda item: item[0])}
-        if result_dict_type == "ordered_pass_report":
-            user_dict |= {"id": self.id}
-        return user_dict
+        fields = sorted((field_value.field for field_value in self.fields_values), key=lambda field: field.id)
+        columns = pivot_columns(
+            (
+                PivotField(field.id, field.key, field.type, field.branch_id, field.order_place, field.report_order)
+                for field in fields
+            ),
+            branch_id,
+            result_dict_type,
+        )
+        values = {field_value.field_id: field_value.value for field_value in self.fields_values}
+        return pivot_row(columns, self.id, self.chat_id, self.username, values, i18n, result_dict_type)
 
     def prepare(self) -> UserDataPrepared:
         """Подготовка упрощённых данных пользователя"""
@@ -415,6 +410,167 @@ class UserFieldValue(Base):
     personal_notification_status: Mapped[PersonalNotificationStatusEnum] = mapped_column(nullable=True, default=None)
 
 
+class UserStatistic(Base):
+    """
+    Счётчик пользователей для отчётов
+
+    Поддерживается триггерами БД на таблицах пользователей и значений полей: изменения накапливаются
+    в `UserStatisticDelta` и периодически переносятся в счётчики, кроме счётчика активных пользователей,
+    который обновляется сразу
+    """
+
+    __tablename__ = "user_statistics"
+    __table_args__ = (PrimaryKeyConstraint("kind", "key"),)
+
+    kind: Mapped[str] = mapped_column(nullable=False)
+    """Вид счётчика: `status`, `pass_status`, `field_values` или `field_true`"""
+    key: Mapped[str] = mapped_column(nullable=False)
+    """Статус пользователя или идентификатор поля"""
+    count: Mapped[int] = mapped_column(nullable=False, default=0, type_=BigInteger)
+    """Количество"""
+
+
+class UserStatisticDelta(Base):
+    """
+    Изменение счётчика пользователей, ещё не перенесённое в `UserStatistic`
+
+    Триггеры добавляют изменения отдельными строками, чтобы одновременные изменения не ждали блокировки строки счётчика
+    """
+
+    __tablename__ = "user_statistic_deltas"
+
+    id: Mapped[int] = mapped_column(primary_key=True, nullable=False, type_=BigInteger)
+    """Уникальный идентификатор"""
+    kind: Mapped[str] = mapped_column(nullable=False)
+    """Вид счётчика"""
+    key: Mapped[str] = mapped_column(nullable=False)
+    """Статус пользователя или идентификатор поля"""
+    delta: Mapped[int] = mapped_column(nullable=False, type_=BigInteger)
+    """Изменение количества"""
+
+
+class ComputedFieldRecompute(Base):
+    """
+    Очередь пересчёта полей, вычисляемых после регистрации, для всех пользователей
+
+    Заполняется UI при изменении шаблона или статуса поля, обрабатывается задачей бота `computed_fields`
+    """
+
+    __tablename__ = "computed_field_recomputes"
+
+    id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
+    """Уникальный идентификатор"""
+    timestamp: Mapped[datetime] = mapped_column()
+    """Время постановки в очередь"""
+    field_id: Mapped[int] = mapped_column(ForeignKey(Field.id), nullable=False)
+    """Идентификатор пересчитываемого поля"""
+
+
+class BotPersistenceData(Base):
+    """
+    Сохраняемые между перезапусками данные бота: данные чатов и состояния диалогов
+
+    Хранятся только непустые данные чатов и незавершённые диалоги
+    """
+
+    __tablename__ = "bot_persistence_data"
+    __table_args__ = (PrimaryKeyConstraint("kind", "key"),)
+
+    kind: Mapped[str] = mapped_column(nullable=False)
+    """Вид данных: `chat_data` или `conversation:<имя диалога>`"""
+    key: Mapped[str] = mapped_column(nullable=False)
+    """Идентификатор чата или ключ диалога в JSON"""
+    data: Mapped[Any] = mapped_column(JSONB, nullable=False)
+    """Данные чата или состояние диалога"""
+
+
+class FileIngestion(Base):
+    """Очередь загрузки файлов пользователей из Telegram в хранилище"""
+
+    __tablename__ = "file_ingestions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
+    """Уникальный идентификатор"""
+    timestamp: Mapped[datetime] = mapped_column()
+    """Время постановки в очередь"""
+
+    file_id: Mapped[str] = mapped_column()
+    """Идентификатор файла в Telegram"""
+    bucket: Mapped[str] = mapped_column()
+    """Бакет, в который загружается файл"""
+    thumbnail_filename: Mapped[str] = mapped_column()
+    """Имя файла эскиза (совпадает с именем файла для файлов без эскиза)"""
+    content_type: Mapped[str] = mapped_column()
+    """Тип содержимого файла"""
+    extension: Mapped[str] = mapped_column()
+    """Расширение файла"""
+    thumbnailable: Mapped[bool] = mapped_column()
+    """Требуется ли вычислять эскиз"""
+
+    status: Mapped[FileIngestionStatusEnum] = mapped_column(
+        nullable=False, index=True, default=FileIngestionStatusEnum.PENDING
+    )
+    """Статус загрузки"""
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    """Количество выполненных попыток загрузки"""
+    next_attempt_at: Mapped[datetime | None] = mapped_column(default=None)
+    """Время, не раньше которого будет выполнена следующая попытка"""
+    locked_at: Mapped[datetime | None] = mapped_column(default=None)
+    """Время начала текущей попытки загрузки"""
+    last_error: Mapped[str | None] = mapped_column(default=None)
+    """Текст последней ошибки"""
+
+
+class StoredObject(Base):
+    """
+    Соответствие имён файлов в хранилище объектам, сохранённым по хешу содержимого
+
+    Используется только при включённом хранении файлов по хешу содержимого
+    """
+
+    __tablename__ = "stored_objects"
+    __table_args__ = (UniqueConstraint("bucket", "filename"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
+    """Уникальный идентификатор"""
+
+    bucket: Mapped[str] = mapped_column(nullable=False)
+    """Бакет файла"""
+    filename: Mapped[str] = mapped_column(nullable=False)
+    """Имя файла, по которому к нему обращаются бот и UI"""
+    digest: Mapped[str] = mapped_column(nullable=False, index=True)
+    """sha256 содержимого файла в hex"""
+    object_name: Mapped[str] = mapped_column(nullable=False)
+    """Имя объекта в хранилище, под которым сохранено содержимое"""
+    size: Mapped[int] = mapped_column(nullable=False, type_=BigInteger)
+    """Размер содержимого в байтах"""
+
+
+class TelegramMedia(Base):
+    """
+    Идентификаторы файлов Telegram, полученные при отправке объектов хранилища
+
+    Ключ содержит ETag объекта, поэтому изменённый объект загружается в Telegram заново
+    """
+
+    __tablename__ = "telegram_media"
+    __table_args__ = (UniqueConstraint("bucket", "object_name", "etag", "kind"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
+    """Уникальный идентификатор"""
+
+    bucket: Mapped[str] = mapped_column(nullable=False)
+    """Бакет объекта"""
+    object_name: Mapped[str] = mapped_column(nullable=False)
+    """Имя объекта в хранилище"""
+    etag: Mapped[str] = mapped_column(nullable=False)
+    """ETag объекта"""
+    kind: Mapped[str] = mapped_column(nullable=False)
+    """Тип отправки: `image` или `document`"""
+    file_id: Mapped[str] = mapped_column(nullable=False)
+    """Идентификатор файла в Telegram"""
+
+
 class KeyboardKey(Base):
     """Кнопки клавиатуры"""
 
@@ -464,13 +620,22 @@ class Notification(Base):
 
 
 class Log(Base):
-    """Лог"""
+    """
+    Лог
 
-    __tablename__ = "logs"
+    Таблица партиционирована по месяцам времени создания лога, партиции создаются при записи логов
+    и удаляются по истечении срока хранения
+    """
 
-    id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
+    __tablename__ = "bot_logs"
+    __table_args__ = (
+        PrimaryKeyConstraint("timestamp", "id"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+    id: Mapped[int] = mapped_column(nullable=False, autoincrement=True, type_=BigInteger)
     """Уникальынй идентификатор"""
-    timestamp: Mapped[datetime] = mapped_column()
+    timestamp: Mapped[datetime] = mapped_column(nullable=False)
     """Время создания лога"""
     message: Mapped[str] = mapped_column()
     """Сообщение лога"""
@@ -679,6 +844,22 @@ class NewsPost(Base):
     """Теги сообщения"""
 
 
+class NewsPostTag(Base):
+    """
+    Нормализованный тег новостного сообщения
+
+    Теги хранятся в нижнем регистре без `#`, первичный ключ используется для поиска последних новостей по тегу
+    """
+
+    __tablename__ = "news_post_tags"
+    __table_args__ = (PrimaryKeyConstraint("tag", "news_post_id"),)
+
+    tag: Mapped[str] = mapped_column(nullable=False)
+    """Тег"""
+    news_post_id: Mapped[int] = mapped_column(ForeignKey(NewsPost.id), nullable=False)
+    """Идентификатор новостного сообщения"""
+
+
 class Promocode(Base):
     """Доступные промокоды"""
 
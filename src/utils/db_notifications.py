@@ -0,0 +1,92 @@
+import asyncio
+import contextlib
+from collections import defaultdict
+from collections.abc import Callable
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+PROMOCODES_CHANGED_CHANNEL = "promocodes_changed"
+"""Канал оповещения об изменении промокодов"""
+
+LISTENER_RECONNECT_DELAY = 5
+"""Время ожидания перед повторным подключением слушателя оповещений в секундах"""
+
+
+async def notify(session: AsyncSession, channel: str) -> None:
+    """Оповестить слушателей канала - оповещение доставляется при фиксации транзакции сессии"""
+    await session.execute(select(func.pg_notify(channel, "")))
+
+
+class DBNotificationListener:
+    """
+    Слушатель оповещений Postgres `LISTEN/NOTIFY` на отдельном соединении
+
+    При каждом подключении вызываются все подписчики, так как оповещения, отправленные без подключения, теряются
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+
+        self._callbacks: dict[str, list[Callable[[], None]]] = defaultdict(list)
+        self._task: asyncio.Task[None] | None = None
+
+    def subscribe(self, channel: str, callback: Callable[[], None]) -> None:
+        """Вызывать `callback` при каждом оповещении в канале"""
+        self._callbacks[channel].append(callback)
+
+    def start(self) -> None:
+        if self._task is None and self._callbacks:
+            self._task = asyncio.create_task(self._run(), name="db_notification_listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def _notify_all(self) -> None:
+        for callbacks in self._callbacks.values():
+            for callback in callbacks:
+                callback()
+
+    def _on_notification(self, _: Any, __: int, channel: str, ___: str) -> None:
+        logger.debug(f"Got DB notification in {channel=}")
+        for callback in self._callbacks.get(channel, []):
+            callback()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"DB notification listener failed, reconnecting: {e}")
+            await asyncio.sleep(LISTENER_RECONNECT_DELAY)
+
+    async def _listen(self) -> None:
+        async with self.engine.connect() as conn:
+            raw_connection = await conn.get_raw_connection()
+            driver_connection = raw_connection.driver_connection
+            terminated = asyncio.Event()
+
+            def on_termination(_: Any) -> None:
+                terminated.set()
+
+            driver_connection.add_termination_listener(on_termination)
+            for channel in self._callbacks:
+                await driver_connection.add_listener(channel, self._on_notification)
+            try:
+                self._notify_all()
+                logger.info(f"Listening DB notifications in {list(self._callbacks)}")
+                await terminated.wait()
+            finally:
+                driver_connection.remove_termination_listener(on_termination)
+                if not driver_connection.is_closed():
+                    for channel in self._callbacks:
+                        await driver_connection.remove_listener(channel, self._on_notification)
@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class ImageDerivative:
+    """Производное изображение, вычисляемое при загрузке"""
+
+    name: str
+    """Название, добавляемое в имя файла: `{имя}.{name}.{расширение}`"""
+    max_size: tuple[int, int]
+    """Максимальные размеры изображения"""
+    image_format: str | None = None
+    """Формат PIL, в котором сохраняется изображение, None - формат исходного изображения"""
+    extension: str | None = None
+    """Расширение файла, None - расширение исходного изображения"""
+
+
+THUMBNAIL_DERIVATIVE = ImageDerivative(name="thumbnail", max_size=(256, 256))
+"""Эскиз, имя файла которого сохраняется как значение поля пользователя"""
+
+IMAGE_DERIVATIVES = (
+    THUMBNAIL_DERIVATIVE,
+    ImageDerivative(name="preview", max_size=(1280, 1280)),
+    ImageDerivative(name="preview", max_size=(1280, 1280), image_format="WEBP", extension="webp"),
+)
+"""Все производные изображения, вычисляемые за одно декодирование"""
+
+
+def make_image_derivatives(
+    original_path: str, image_format: str, derivatives: tuple[ImageDerivative, ...]
+) -> list[bytes]:
+    """
+    Вычислить производные изображения за одно декодирование исходного изображения
+
+    Выполняется в отдельном процессе, поэтому принимает и возвращает только простые типы,
+    исходное изображение читается из файла, а не передаётся в процесс
+
+    Возвращает содержимое производных изображений в порядке `derivatives`
+    """
+    # PIL загружается только в процессах пула, а не при запуске бота и UI
+    from PIL import Image  # noqa: PLC0415
+
+    results: list[bytes] = []
+    with Image.open(original_path, formats=[image_format]) as image:
+        image.load()
+        for derivative in derivatives:
+            derivative_image = image.copy()
+            derivative_image.thumbnail(derivative.max_size)
+
+            save_format = derivative.image_format or image_format
+            if save_format == "WEBP" and derivative_image.mode not in ["RGB", "RGBA", "L"]:
+                derivative_image = derivative_image.convert("RGBA" if "A" in derivative_image.getbands() else "RGB")
+
+            derivative_bio = BytesIO()
+            derivative_image.save(derivative_bio, format=save_format)
+            results.append(derivative_bio.getvalue())
+    return results
+
+
+class ImageProcessingPool:
+    """
+    Пул процессов для обработки изображений вне цикла событий
+
+    Количество одновременно ожидающих обработки изображений ограничено,
+    при заполнении очереди загружающие корутины ждут освобождения места
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._semaphore = asyncio.Semaphore(workers + queue_size)
+
+    async def make_derivatives(
+        self, original_path: str, image_format: str, derivatives: tuple[ImageDerivative, ...] = IMAGE_DERIVATIVES
+    ) -> list[tuple[ImageDerivative, bytes]]:
+        """Вычислить производные изображения из файла в пуле процессов"""
+        async with self._semaphore:
+            logger.debug(f"Processing {image_format} image {original_path}")
+            results = await asyncio.get_event_loop().run_in_executor(
+                self._executor, make_image_derivatives, original_path, image_format, derivatives
+            )
+        return list(zip(derivatives, results, strict=True))
+
+    def close(self) -> None:
+        """Остановить пул процессов"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,76 @@
+from collections.abc import Iterable
+from datetime import datetime
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.utils.db_model import Log
+
+LOG_PARTITION_SUFFIX_FORMAT = "%Y_%m"
+"""Формат суффикса имени месячной партиции логов"""
+
+
+def get_log_partition_month(timestamp: datetime) -> datetime:
+    """Начало месяца, которому соответствует партиция логов"""
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def get_log_partition_name(month: datetime) -> str:
+    return f"{Log.__tablename__}_{month.strftime(LOG_PARTITION_SUFFIX_FORMAT)}"
+
+
+def _get_next_month(month: datetime) -> datetime:
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+async def ensure_log_partitions(conn: AsyncConnection, timestamps: Iterable[datetime]) -> set[datetime]:
+    """
+    Создать месячные партиции логов для заданных моментов времени, если их нет
+
+    Возвращает начала месяцев, для которых существуют партиции
+    """
+    months = {get_log_partition_month(timestamp) for timestamp in timestamps}
+    for month in sorted(months):
+        await conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {get_log_partition_name(month)} PARTITION OF {Log.__tablename__} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_get_next_month(month).isoformat()}')"
+            )
+        )
+    return months
+
+
+async def drop_expired_log_partitions(conn: AsyncConnection, older_than: datetime) -> list[str]:
+    """
+    Удалить партиции логов, все записи которых старше заданного момента времени
+
+    Возвращает имена удалённых партиций
+    """
+    partitions = await conn.scalars(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": Log.__tablename__},
+    )
+
+    dropped: list[str] = []
+    for partition in partitions.all():
+        try:
+            month = datetime.strptime(  # noqa: DTZ007
+                partition.removeprefix(f"{Log.__tablename__}_"), LOG_PARTITION_SUFFIX_FORMAT
+            )
+        except ValueError:
+            logger.warning(f"Found unknown logs partition {partition}... skipping")
+            continue
+
+        if _get_next_month(month) <= older_than:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+            dropped.append(partition)
+
+    return dropped
@@ -0,0 +1,197 @@
+import bisect
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import ClassVar
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+"""Границы корзин гистограмм времени выполнения в секундах"""
+
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+"""Границы корзин гистограмм количества операций"""
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """Базовый класс метрики в текстовом формате Prometheus"""
+
+    type_name: ClassVar[str]
+    """Тип метрики в строке `# TYPE`"""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+
+    def _label_values(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> list[str]:
+        """Строки значений метрики"""
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    """Монотонно возрастающий счётчик"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    """Значение, которое может как расти, так и уменьшаться"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._label_values(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+@dataclass
+class _HistogramValues:
+    buckets: list[int]
+    total: float = 0.0
+    count: int = 0
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[LabelValues, _HistogramValues] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        values = self._values.get(key)
+        if not values:
+            values = self._values[key] = _HistogramValues(buckets=[0] * len(self.buckets))
+
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.buckets):
+            values.buckets[idx] += 1
+        values.total += value
+        values.count += 1
+
+    def samples(self) -> list[str]:
+        samples: list[str] = []
+        for key, values in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, values.buckets, strict=True):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labels, key, 'le="' + _format_value(bound) + '"')
+                samples.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _format_labels(self.labels, key, 'le="+Inf"')
+            samples.append(f"{self.name}_bucket{bucket_labels} {values.count}")
+            samples.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(values.total)}")
+            samples.append(f"{self.name}_count{_format_labels(self.labels, key)} {values.count}")
+        return samples
+
+
+@dataclass
+class MetricsRegistry:
+    """
+    Реестр метрик процесса
+
+    Коллекторы вызываются перед каждой выгрузкой метрик и обновляют значения,
+    которые дешевле вычислить по запросу (например, размеры очередей в БД)
+    """
+
+    metrics: dict[str, Metric] = field(default_factory=dict)
+    collectors: list[Callable[[], Awaitable[None]]] = field(default_factory=list)
+
+    def _register(self, metric: Metric) -> Metric:
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))  # type: ignore
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))  # type: ignore
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))  # type: ignore
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]) -> None:
+        self.collectors.append(collector)
+
+    async def render(self) -> str:
+        """Выгрузить все метрики в текстовом формате Prometheus"""
+        for collector in self.collectors:
+            await collector()
+        lines = [line for metric in self.metrics.values() for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+"""Реестр метрик текущего процесса"""
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""Тип содержимого текстового формата Prometheus"""
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+
+from loguru import logger
+
+CACHE_SUBDIRECTORY = "bb-minio-cache"
+"""Поддиректория кеша, в которой нет файлов, кроме файлов кеша, поэтому её можно очищать при запуске"""
+
+ETAGS_MAX_COUNT = 10000
+"""Количество запомненных ETag, после которого из памяти удаляются устаревшие"""
+
+
+@dataclass
+class MinIOCacheEntry:
+    bucket: str
+    filename: str
+    etag: str
+    content_type: str
+    size: int
+
+
+class MinIODiskCache:
+    """
+    Ограниченный по размеру LRU кеш объектов MINIO на диске
+
+    Ключ кеша содержит ETag объекта, поэтому перезапись объекта с тем же именем (например, ботом)
+    приводит к промаху кеша и удалению устаревшей копии
+
+    Полученные ETag объектов хранятся в памяти `etag_ttl` секунд, чтобы повторные обращения
+    к одному объекту не проверяли его в MINIO - перезапись объекта видна не позже чем через это время
+    """
+
+    def __init__(self, directory: str, max_size_bytes: int, etag_ttl: float = 5) -> None:
+        self.directory = Path(directory) / CACHE_SUBDIRECTORY
+        self.max_size_bytes = max_size_bytes
+        self.etag_ttl = etag_ttl
+
+        self._entries: OrderedDict[str, MinIOCacheEntry] = OrderedDict()
+        self._keys_by_name: dict[tuple[str, str], str] = {}
+        self._etags: dict[tuple[str, str], tuple[str, float]] = {}
+        self._size = 0
+        self._lock = asyncio.Lock()
+
+        # Типы контента хранятся только в памяти, поэтому кеш с прошлого запуска не используется
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.iterdir():
+            if path.is_file():
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _key(bucket: str, filename: str, etag: str) -> str:
+        return hashlib.sha256(f"{bucket}/{filename}/{etag}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def get_etag(self, bucket: str, filename: str) -> str | None:
+        """ETag объекта, полученный не раньше чем `etag_ttl` секунд назад"""
+        etag, expires_at = self._etags.get((bucket, filename), (None, 0.0))
+        if expires_at < time.monotonic():
+            self._etags.pop((bucket, filename), None)
+            return None
+        return etag
+
+    def set_etag(self, bucket: str, filename: str, etag: str) -> None:
+        """Запомнить полученный из MINIO ETag объекта"""
+        now = time.monotonic()
+        if len(self._etags) >= ETAGS_MAX_COUNT:
+            self._etags = {name: value for name, value in self._etags.items() if value[1] >= now}
+        self._etags[(bucket, filename)] = (etag, now + self.etag_ttl)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if not entry:
+            return
+        self._size -= entry.size
+        if self._keys_by_name.get((entry.bucket, entry.filename)) == key:
+            del self._keys_by_name[(entry.bucket, entry.filename)]
+        self._path(key).unlink(missing_ok=True)
+
+    async def get(self, bucket: str, filename: str, etag: str) -> tuple[BytesIO, str] | None:
+        """Получить объект из кеша, если в кеше есть копия с тем же ETag"""
+        key = self._key(bucket, filename, etag)
+        async with self._lock:
+            stale_key = self._keys_by_name.get((bucket, filename))
+            if stale_key and stale_key != key:
+                logger.debug(f"Invalidating cached {filename} from MinIO bucket {bucket} since ETag changed")
+                self._remove(stale_key)
+
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            content = await asyncio.get_event_loop().run_in_executor(None, self._path(key).read_bytes)
+        except FileNotFoundError:
+            async with self._lock:
+                self._remove(key)
+            return None
+
+        logger.debug(f"Serving {filename} from MinIO bucket {bucket} from disk cache")
+        return BytesIO(content), entry.content_type
+
+    async def put(self, bucket: str, filename: str, etag: str, content: bytes, content_type: str) -> None:
+        """Поместить объект в кеш, вытесняя давно не используемые объекты при превышении размера"""
+        if len(content) > self.max_size_bytes:
+            return
+
+        key = self._key(bucket, filename, etag)
+        await asyncio.get_event_loop().run_in_executor(None, self._path(key).write_bytes, content)
+
+        async with self._lock:
+            stale_key = self._keys_by_name.get((bucket, filename))
+            if stale_key == key:
+                self._size -= self._entries.pop(key).size
+            elif stale_key:
+                self._remove(stale_key)
+
+            self._entries[key] = MinIOCacheEntry(
+                bucket=bucket,
+                filename=filename,
+                etag=etag,
+                content_type=content_type,
+                size=len(content),
+            )
+            self._keys_by_name[(bucket, filename)] = key
+            self._size += len(content)
+
+            while self._size > self.max_size_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
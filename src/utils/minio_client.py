@@ -1,15 +1,41 @@
 import asyncio
+import hashlib
+import time
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from io import BytesIO
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from typing import IO, TypeVar
 
 import filetype
 from filetype.types import TYPES as FILE_TYPES
 from filetype.types.image import Jpeg
 from loguru import logger
 from minio import Minio, S3Error
-from PIL import Image
 from telegram import Document, PhotoSize
-from urllib3 import BaseHTTPResponse
+from urllib3 import PoolManager, Retry, Timeout
+
+from src.utils.image_processing import ImageDerivative, ImageProcessingPool
+from src.utils.metrics import registry
+from src.utils.minio_cache import MinIODiskCache
+from src.utils.minio_content_index import MinIOContentIndex
+from src.utils.tracing import record_span
+
+T = TypeVar("T")
+
+MINIO_MULTIPART_PART_SIZE = 5 * 1024 * 1024
+"""Размер части multipart загрузки - минимально допустимый в S3"""
+
+CONTENT_ADDRESSED_SPOOL_MAX_SIZE = 1024 * 1024
+"""Размер файла, после которого копия для вычисления хеша содержимого хранится во временном файле"""
+
+minio_operation_seconds = registry.histogram(
+    "bb_minio_operation_seconds", "Время выполнения операций MINIO", labels=("operation",)
+)
+minio_operation_errors_total = registry.counter(
+    "bb_minio_operation_errors_total", "Количество ошибок операций MINIO", labels=("operation", "kind")
+)
 
 
 @dataclass
@@ -19,40 +45,262 @@ class ThumbnailableFileType:
     thumbnailable: bool
 
 
+@dataclass
+class MinIOOperationMetrics:
+    """Метрики одного типа операций MINIO"""
+
+    count: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+class AsyncChunksReader:
+    """
+    Файлоподобный объект для чтения из потока minio-py частей, которые поступают в очередь asyncio
+
+    Очередь ограничена, поэтому загрузка из источника ждёт пока minio-py отправит предыдущие части
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int = 4) -> None:
+        self._loop = loop
+        self._queue: asyncio.Queue[bytes | BaseException | None] = asyncio.Queue(maxsize=max_chunks)
+        self._buffer = bytearray()
+        self._done = False
+
+    async def put(self, chunk: bytes | BaseException | None) -> None:
+        """Передать часть, ошибку источника или `None` как признак окончания"""
+        await self._queue.put(chunk)
+
+    def abort(self, error: BaseException) -> None:
+        """Прервать чтение: отбросить непрочитанные части и передать ошибку читающему потоку"""
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(error)
+
+    def read(self, size: int = -1) -> bytes:
+        """Блокирующее чтение, вызывается только из потока minio-py"""
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            chunk = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+            if isinstance(chunk, BaseException):
+                raise chunk
+            if chunk is None:
+                self._done = True
+                break
+            self._buffer += chunk
+
+        if size < 0:
+            size = len(self._buffer)
+        # Удаление из начала bytearray не копирует оставшиеся данные
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
 class MinIOClient:
     """
     Обёртка для удобного асинхронного взаимодействия с MINIO
+
+    Все блокирующие вызовы minio-py выполняются в собственном пуле потоков,
+    размер которого совпадает с размером пула соединений urllib3 и семафора
+
+    Каждая операция получает и возвращает соединение внутри одного вызова в пуле потоков,
+    поэтому поток занимает не больше одного соединения и не ждёт соединений, занятых ожидающими в очереди операциями
     """
 
-    def __init__(self, host: str, secure: bool, access_key: str, secret_key: str) -> None:  # noqa: FBT001
+    def __init__(
+        self,
+        host: str,
+        secure: bool,  # noqa: FBT001
+        access_key: str,
+        secret_key: str,
+        pool_size: int = 32,
+        connect_timeout: float = 5,
+        read_timeout: float = 60,
+        operation_timeout: float = 120,
+        image_pool_workers: int = 2,
+        image_pool_queue_size: int = 16,
+    ) -> None:
         self.host = host
-        self._client = Minio(self.host, access_key=access_key, secret_key=secret_key, secure=secure)
-        self._semaphore = asyncio.Semaphore(50)
+        self.operation_timeout = operation_timeout
+
+        self._http_client = PoolManager(
+            num_pools=1,
+            maxsize=pool_size,
+            block=True,
+            timeout=Timeout(connect=connect_timeout, read=read_timeout),
+            retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+        )
+        self._client = Minio(
+            self.host,
+            access_key=access_key,
+            secret_key=secret_key,
+            secure=secure,
+            http_client=self._http_client,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="minio")
+        self._semaphore = asyncio.Semaphore(pool_size)
+        self._image_pool = ImageProcessingPool(workers=image_pool_workers, queue_size=image_pool_queue_size)
+
+        self.metrics: dict[str, MinIOOperationMetrics] = {}
+        """Метрики операций по их названиям"""
 
-    async def _put_object(self, bucket: str, filename: str, bio: BytesIO, content_type: str) -> None:
+        self.cache: MinIODiskCache | None = None
+        """Кеш загружаемых объектов на диске, задаётся только для UI"""
+
+        self.content_index: MinIOContentIndex | None = None
+        """Соответствие имён файлов объектам по хешу содержимого, задаётся при включённой дедупликации"""
+
+    async def _run(self, operation: str, func: Callable[[], T]) -> T:
+        """
+        Выполнить блокирующую операцию minio-py в собственном пуле потоков
+
+        Учитывает время выполнения и ошибки в метриках операции и ограничивает время ожидания
+
+        Поток, в котором выполняется операция, нельзя прервать: после превышения времени ожидания он остаётся занятым,
+        пока операция не завершится или не сработают таймауты соединения urllib3, и новые операции ждут в очереди пула
+        """
+        metrics = self.metrics.setdefault(operation, MinIOOperationMetrics())
+        started_at = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                asyncio.get_event_loop().run_in_executor(self._executor, func),
+                timeout=self.operation_timeout,
+            )
+        except TimeoutError:
+            metrics.timeouts += 1
+            minio_operation_errors_total.inc(operation=operation, kind="timeout")
+            raise
+        except Exception:
+            metrics.errors += 1
+            minio_operation_errors_total.inc(operation=operation, kind="error")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started_at
+            metrics.count += 1
+            metrics.total_seconds += elapsed
+            metrics.max_seconds = max(metrics.max_seconds, elapsed)
+            minio_operation_seconds.observe(elapsed, operation=operation)
+            record_span(f"minio.{operation}", elapsed)
+
+    def close(self) -> None:
+        """Остановить пул потоков и закрыть соединения"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._image_pool.close()
+        self._http_client.clear()
+
+    async def _put_object(self, bucket: str, filename: str, data: IO[bytes], length: int, content_type: str) -> None:
         """
         Внутренняя функция для асинхроанного помещения файла в заданный бакет
         """
 
         def _put_object_sync() -> None:
-            bio.seek(0)
+            data.seek(0)
             self._client.put_object(
                 bucket_name=bucket,
                 object_name=filename,
-                data=bio,
-                length=bio.getbuffer().nbytes,
+                data=data,
+                length=length,
                 content_type=content_type,
             )
 
-        await asyncio.get_event_loop().run_in_executor(None, _put_object_sync)
+        await self._run("put_object", _put_object_sync)
 
     async def _upload(self, bucket: str, filename: str, bio: BytesIO, content_type: str) -> None:
         """Асинхронное помещение файла в бакет"""
+        if self.content_index:
+            digest = hashlib.sha256(bio.getvalue()).hexdigest()
+            await self._upload_content_addressed(bucket, filename, bio, bio.getbuffer().nbytes, digest, content_type)
+            return
+
         async with self._semaphore:
             logger.debug(f"Uploading {filename} to MinIO into bukcket {bucket}")
-            await self._put_object(bucket, filename, bio, content_type)
+            await self._put_object(bucket, filename, bio, bio.getbuffer().nbytes, content_type)
         logger.debug(f"Done uploading {filename} to MinIO into bukcket {bucket}")
 
+    def get_content_addressed_filename(self, digest: str, filename: str) -> str:
+        """Имя объекта, сохранённого по хешу содержимого: `sha256-{хеш}.{расширение файла}`"""
+        extension = filename.rsplit(".", 1)[-1] if "." in filename else "bin"
+        return f"sha256-{digest}.{extension}"
+
+    async def _upload_content_addressed(
+        self, bucket: str, filename: str, data: IO[bytes], length: int, digest: str, content_type: str
+    ) -> None:
+        """
+        Помещение файла в бакет по хешу содержимого
+
+        Если объект с таким же содержимым уже сохранён - повторная запись пропускается,
+        а имя файла только ссылается на существующий объект
+        """
+        if not self.content_index:
+            return
+
+        object_name = await self.content_index.find(bucket, digest)
+        if object_name:
+            logger.debug(f"Skipping upload of {filename} to MinIO bucket {bucket} since it is stored as {object_name}")
+        else:
+            object_name = self.get_content_addressed_filename(digest, filename)
+            async with self._semaphore:
+                logger.debug(f"Uploading {filename} to MinIO into bukcket {bucket} as {object_name}")
+                await self._put_object(bucket, object_name, data, length, content_type)
+            logger.debug(f"Done uploading {filename} to MinIO into bukcket {bucket} as {object_name}")
+
+        await self.content_index.link(bucket, filename, digest, object_name, length)
+
+    async def upload_stream(self, bucket: str, filename: str, chunks: AsyncIterator[bytes], content_type: str) -> None:
+        """
+        Асинхронное помещение файла в бакет multipart загрузкой по мере поступления частей
+
+        В памяти одновременно находится не больше одной части multipart загрузки
+
+        Файл не больше одной части загружается целиком до отправки, поэтому место в пуле соединений
+        занимается только на время отправки; для больших файлов место занимается с получения первой части
+        """
+        reader = AsyncChunksReader(asyncio.get_event_loop())
+
+        def _put_object_sync() -> None:
+            self._client.put_object(
+                bucket_name=bucket,
+                object_name=filename,
+                data=reader,
+                length=-1,
+                part_size=MINIO_MULTIPART_PART_SIZE,
+                content_type=content_type,
+            )
+
+        head = bytearray()
+        async for chunk in chunks:
+            head += chunk
+            if len(head) >= MINIO_MULTIPART_PART_SIZE:
+                break
+        else:
+            async with self._semaphore:
+                logger.debug(f"Uploading {filename} to MinIO into bukcket {bucket}")
+                await self._put_object(bucket, filename, BytesIO(head), len(head), content_type)
+            logger.debug(f"Done uploading {filename} to MinIO into bukcket {bucket}")
+            return
+
+        async def _feed() -> None:
+            await reader.put(bytes(head))
+            head.clear()
+            async for chunk in chunks:
+                await reader.put(chunk)
+            await reader.put(None)
+
+        async with self._semaphore:
+            logger.debug(f"Streaming {filename} to MinIO into bukcket {bucket}")
+            put_task = asyncio.ensure_future(self._run("put_object_stream", _put_object_sync))
+            feed_task = asyncio.ensure_future(_feed())
+            try:
+                await asyncio.gather(put_task, feed_task)
+            except BaseException as e:
+                feed_task.cancel()
+                reader.abort(e)
+                await asyncio.gather(put_task, return_exceptions=True)
+                raise
+        logger.debug(f"Done streaming {filename} to MinIO into bukcket {bucket}")
+
     async def upload_guessed(self, bucket: str, filename: str, bio: BytesIO) -> None:
         """Поместить файл в бакет с автоматически определённым типом контента"""
         try:
@@ -107,59 +355,179 @@ class MinIOClient:
     def get_original_filename(self, thumbnail_filename: str) -> str:
         return thumbnail_filename.replace(".thumbnail", "")
 
+    def get_derivative_filename(
+        self, thumbnail_filename: str, derivative: ImageDerivative, thumbnailable_file_type: ThumbnailableFileType
+    ) -> str:
+        """Имя файла производного изображения: `{имя}.{название производного}.{расширение}`"""
+        filename_wo_extension = self.get_original_filename(thumbnail_filename).removesuffix(
+            f".{thumbnailable_file_type.extension}"
+        )
+        return f"{filename_wo_extension}.{derivative.name}.{derivative.extension or thumbnailable_file_type.extension}"
+
     async def upload_original_and_thumbnail(
         self,
         bucket: str,
         thumbnail_filename: str,
-        original_bio: BytesIO,
+        original_chunks: AsyncIterator[bytes],
         thumbnailable_file_type: ThumbnailableFileType,
     ) -> None:
-        """Асинхронное помещение файла в бакет и вычисление эскиза если это доступно"""
-        original_bio.seek(0)
+        """
+        Асинхронное потоковое помещение файла в бакет и вычисление производных изображений если это доступно
+
+        Для изображений копия файла сохраняется во временный файл, который читается в пуле процессов
+        для вычисления эскиза, превью и превью в WebP
+
+        При хранении по хешу содержимого файл сначала сохраняется во временный файл с вычислением хеша,
+        так как имя объекта известно только после получения всего содержимого
+        """
         filename = self.get_original_filename(thumbnail_filename)
-        await self._upload(bucket, filename, original_bio, thumbnailable_file_type.content_type)
 
-        if not thumbnailable_file_type.thumbnailable:
+        if not self.content_index and not thumbnailable_file_type.thumbnailable:
+            await self.upload_stream(bucket, filename, original_chunks, thumbnailable_file_type.content_type)
             return
 
-        image_format = thumbnailable_file_type.content_type.removeprefix("image/").upper()
+        # Изображение передаётся в пул процессов по пути к файлу, поэтому копия всегда сохраняется на диск
+        with (
+            NamedTemporaryFile()
+            if thumbnailable_file_type.thumbnailable
+            else SpooledTemporaryFile(max_size=CONTENT_ADDRESSED_SPOOL_MAX_SIZE)
+        ) as spool:
+            if self.content_index:
+                digest = hashlib.sha256()
+                async for chunk in original_chunks:
+                    spool.write(chunk)
+                    digest.update(chunk)
+                await self._upload_content_addressed(
+                    bucket, filename, spool, spool.tell(), digest.hexdigest(), thumbnailable_file_type.content_type
+                )
+                if not thumbnailable_file_type.thumbnailable:
+                    return
+            else:
 
-        original_bio.seek(0)
-        with Image.open(original_bio, formats=[image_format]) as image:
-            image.thumbnail((256, 256))
+                async def _spooled_chunks() -> AsyncIterator[bytes]:
+                    async for chunk in original_chunks:
+                        spool.write(chunk)
+                        yield chunk
 
-            thumbnail_bio = BytesIO()
-            image.save(thumbnail_bio, format=image_format)
+                await self.upload_stream(bucket, filename, _spooled_chunks(), thumbnailable_file_type.content_type)
 
-            await self._upload(bucket, thumbnail_filename, thumbnail_bio, thumbnailable_file_type.content_type)
+            spool.flush()
+            image_format = thumbnailable_file_type.content_type.removeprefix("image/").upper()
+            derivatives = await self._image_pool.make_derivatives(spool.name, image_format)
+
+        for derivative, content in derivatives:
+            await self._upload(
+                bucket,
+                self.get_derivative_filename(thumbnail_filename, derivative, thumbnailable_file_type),
+                BytesIO(content),
+                f"image/{derivative.extension}" if derivative.extension else thumbnailable_file_type.content_type,
+            )
 
     async def download(self, bucket: str, filename: str) -> tuple[BytesIO | None, str]:
-        """Асинхронная загрузка файла из бакета"""
-        logger.debug(f"Downloading {filename} from MinIO bucket {bucket}")
+        """
+        Асинхронная загрузка файла из бакета
+
+        Если задан кеш - сверяет ETag объекта и отдаёт локальную копию при совпадении,
+        недавно полученный ETag повторно не запрашивается
+
+        Файлы, сохранённые по хешу содержимого, загружаются из объекта, на который ссылается имя файла
+        """
+        filename = await self.resolve_object_name(bucket, filename)
 
-        def _get_object() -> BaseHTTPResponse:
-            return self._client.get_object(bucket, filename)
+        if not self.cache:
+            return await self._download(bucket, filename)
+
+        etag = self.cache.get_etag(bucket, filename)
+        if etag is None:
+            # Срок хранения ETag отсчитывается от проверки в MINIO, а не от последнего обращения
+            etag = await self.stat_etag(bucket, filename)
+            if etag is None:
+                logger.debug(f"File {filename} not found in MinIO bucket {bucket}")
+                return None, "application/octet-stream"
+            self.cache.set_etag(bucket, filename, etag)
+
+        cached = await self.cache.get(bucket, filename, etag)
+        if cached:
+            return cached
+
+        file_bytes, content_type = await self._download(bucket, filename)
+        if file_bytes:
+            await self.cache.put(bucket, filename, etag, file_bytes.getvalue(), content_type)
+        return file_bytes, content_type
+
+    async def resolve_object_name(self, bucket: str, filename: str) -> str:
+        """Имя объекта с содержимым файла с учётом хранения по хешу содержимого"""
+        if self.content_index:
+            return await self.content_index.resolve(bucket, filename) or filename
+        return filename
+
+    async def stat_etag(self, bucket: str, object_name: str) -> str | None:
+        """Получить ETag объекта или None, если объект не найден"""
+
+        def _stat_object() -> str | None:
+            try:
+                return self._client.stat_object(bucket, object_name).etag
+            except S3Error as e:
+                if e.code == "NoSuchKey":
+                    return None
+                raise
+
+        return await self._run("stat_object", _stat_object)
+
+    async def _download(self, bucket: str, filename: str) -> tuple[BytesIO | None, str]:
+        """Внутренняя функция для асинхронной загрузки файла из бакета"""
+        file_bytes, content_type, _ = await self.download_object(bucket, filename)
+        return file_bytes, content_type
+
+    async def download_object(self, bucket: str, object_name: str) -> tuple[BytesIO | None, str, str | None]:
+        """
+        Загрузить объект без кеша и без учёта хранения по хешу содержимого
+
+        Возвращает содержимое, тип контента и ETag загруженного содержимого из того же ответа MINIO
+        """
+        logger.debug(f"Downloading {object_name} from MinIO bucket {bucket}")
+
+        def _get_object() -> tuple[bytes, str | None, str | None]:
+            response = self._client.get_object(bucket, object_name)
+            try:
+                etag = response.getheader("etag")
+                return response.read(), response.getheader("content-type"), etag.replace('"', "") if etag else None
+            finally:
+                response.close()
+                response.release_conn()
 
         try:
-            response = await asyncio.get_event_loop().run_in_executor(None, _get_object)
-            logger.debug(f"Done downloading {filename} from MinIO bucket {bucket}")
-            file_bytes = BytesIO(response.read())
-            content_type = response.getheader("content-type")
+            content, content_type, etag = await self._run("get_object", _get_object)
+            file_bytes = BytesIO(content)
+            logger.debug(f"Done downloading {object_name} from MinIO bucket {bucket}")
         except S3Error as e:
             if e.code == "NoSuchKey":
-                logger.debug(f"File {filename} not found in MinIO bucket {bucket}")
+                logger.debug(f"File {object_name} not found in MinIO bucket {bucket}")
                 file_bytes = None
                 content_type = None
+                etag = None
             else:
                 raise
-        else:
-            response.close()
-            response.release_conn()
 
         if not content_type:
             content_type = "application/octet-stream"
 
-        return file_bytes, content_type
+        return file_bytes, content_type, etag
+
+    async def download_many(self, objects: list[tuple[str, str]]) -> list[tuple[BytesIO | None, str]]:
+        """
+        Асинхронная параллельная загрузка нескольких файлов из бакетов
+
+        * objects: list[tuple[str, str]] - Пары бакета и имени файла
+
+        Возвращает результаты в том же порядке, что и запрошенные файлы
+        """
+
+        async def _download_limited(bucket: str, filename: str) -> tuple[BytesIO | None, str]:
+            async with self._semaphore:
+                return await self.download(bucket, filename)
+
+        return list(await asyncio.gather(*(_download_limited(bucket, filename) for bucket, filename in objects)))
 
     async def create_bucket(self, bucket: str) -> None:
         """
@@ -171,5 +539,5 @@ class MinIOClient:
             if not self._client.bucket_exists(bucket):
                 self._client.make_bucket(bucket)
 
-        await asyncio.get_event_loop().run_in_executor(None, _create_bucket)
+        await self._run("create_bucket", _create_bucket)
         logger.success(f"Created MinIO bucket {bucket} or updated policyes")
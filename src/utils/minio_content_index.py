@@ -0,0 +1,53 @@
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.utils.db_model import StoredObject
+
+
+class MinIOContentIndex:
+    """
+    Соответствие имён файлов объектам MINIO, сохранённым по хешу содержимого
+
+    Одинаковое содержимое хранится в бакете один раз, а имена файлов ссылаются на него
+    """
+
+    def __init__(self, db_sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+        self.db_sessionmaker = db_sessionmaker
+
+    async def resolve(self, bucket: str, filename: str) -> str | None:
+        """Получить имя объекта с содержимым файла или None, если файл сохранён не по хешу"""
+        async with self.db_sessionmaker() as session:
+            return await session.scalar(
+                select(StoredObject.object_name).where(
+                    StoredObject.bucket == bucket,
+                    StoredObject.filename == filename,
+                )
+            )
+
+    async def find(self, bucket: str, digest: str) -> str | None:
+        """Получить имя уже сохранённого объекта с заданным хешем содержимого"""
+        async with self.db_sessionmaker() as session:
+            return await session.scalar(
+                select(StoredObject.object_name)
+                .where(
+                    StoredObject.bucket == bucket,
+                    StoredObject.digest == digest,
+                )
+                .limit(1)
+            )
+
+    async def link(self, bucket: str, filename: str, digest: str, object_name: str, size: int) -> None:
+        """Сохранить ссылку имени файла на объект, перезаписав предыдущую ссылку"""
+        async with self.db_sessionmaker() as session:
+            await session.execute(
+                insert(StoredObject)
+                .values(bucket=bucket, filename=filename, digest=digest, object_name=object_name, size=size)
+                .on_conflict_do_update(
+                    index_elements=[StoredObject.bucket, StoredObject.filename],
+                    set_={"digest": digest, "object_name": object_name, "size": size},
+                )
+            )
+            await session.commit()
+        logger.debug(f"Linked {filename} in MinIO bucket {bucket} to {object_name}")
@@ -0,0 +1,103 @@
+from collections.abc import Iterable, Mapping
+from typing import Literal, NamedTuple
+
+from src.utils.config_model import I18n
+from src.utils.custom_types import FieldTypeEnum
+
+PlainDictType = Literal["full", "ordered_pass_report"]
+"""
+Вид плоского словаря пользователя
+* full - все поля пользователя (статичные и дополнительные) в порядке веток и вопросов
+* ordered_pass_report - только поля отчёта пропусков в порядке отчёта и идентификатор в конце
+"""
+
+
+class PivotField(NamedTuple):
+    """Данные поля, необходимые для построения столбцов"""
+
+    id: int
+    key: str
+    type: FieldTypeEnum
+    branch_id: int
+    order_place: int
+    report_order: int | None
+
+
+class PivotColumnField(NamedTuple):
+    """Поле, значение которого может попасть в столбец сводной таблицы"""
+
+    field_id: int
+    key: str
+    is_boolean: bool
+
+
+class PivotColumn(NamedTuple):
+    """
+    Столбец сводной таблицы пользователей
+
+    Поля с одинаковым порядком занимают один столбец в порядке, в котором они переданы в `pivot_columns`
+    (по возрастанию идентификатора), для каждого пользователя в него попадает значение поля
+    с наибольшим идентификатором среди тех, на которые он ответил
+    """
+
+    fields: tuple[PivotColumnField, ...]
+
+
+def pivot_columns(
+    fields: Iterable[PivotField], branch_id: int | None = None, result_dict_type: PlainDictType = "full"
+) -> list[PivotColumn]:
+    """
+    Упорядоченные столбцы полей сводной таблицы
+
+    Столбцы вычисляются один раз для всех пользователей, поля с совпадающим порядком остаются в одном столбце
+    """
+    ordered: dict[tuple[int, ...], list[PivotColumnField]] = {}
+    for field in fields:
+        if branch_id and branch_id != field.branch_id:
+            continue
+        if result_dict_type == "full":
+            order: tuple[int, ...] = (field.branch_id, field.order_place)
+        elif field.report_order is not None and field.report_order >= 1:
+            order = (field.report_order,)
+        else:
+            continue
+        ordered.setdefault(order, []).append(PivotColumnField(field.id, field.key, field.type == FieldTypeEnum.BOOLEAN))
+    return [PivotColumn(tuple(column_fields)) for _, column_fields in sorted(ordered.items(), key=lambda item: item[0])]
+
+
+def pivot_row(
+    columns: list[PivotColumn],
+    user_id: int,
+    chat_id: int,
+    username: str | None,
+    values: Mapping[int, str],
+    i18n: I18n | None = None,
+    result_dict_type: PlainDictType = "full",
+) -> dict[str, str | int | None]:
+    """
+    Плоский словарь пользователя по столбцам и значениям полей по идентификаторам полей
+
+    В словарь попадают только поля, на которые пользователь ответил
+    """
+    row: dict[str, str | int | None] = {}
+    if result_dict_type == "full":
+        row["id"] = user_id
+        row["chat_id"] = chat_id
+        row["username"] = username
+
+    for column in columns:
+        answered = [column_field for column_field in column.fields if column_field.field_id in values]
+        if not answered:
+            continue
+        column_field = answered[-1]
+        value = values[column_field.field_id]
+        if column_field.is_boolean and i18n:
+            if value == "true":
+                value = i18n.yes
+            elif value == "false":
+                value = i18n.no
+        row[column_field.key] = value
+
+    if result_dict_type == "ordered_pass_report":
+        row["id"] = user_id
+    return row
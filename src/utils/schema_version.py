@@ -0,0 +1,41 @@
+import hashlib
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from src.utils.db_model import Base, SchemaVersion
+
+SCHEMA_INIT_REVISION = 2
+"""
+Ревизия шагов инициализации БД
+
+Увеличивается при изменении шагов инициализации, не меняющих таблицы (триггеры, заполнение данных)
+"""
+
+
+def get_schema_version() -> str:
+    """Версия схемы БД - хеш DDL всех таблиц и индексов модели и ревизии шагов инициализации"""
+    dialect = postgresql.dialect()  # type: ignore
+    ddl = [str(SCHEMA_INIT_REVISION)]
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl.extend(
+            str(CreateIndex(index).compile(dialect=dialect))
+            for index in sorted(table.indexes, key=lambda index: str(index.name))
+        )
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()
+
+
+async def get_saved_schema_version(conn: AsyncConnection) -> str | None:
+    """Версия схемы, сохранённая после последней полной инициализации"""
+    if not await conn.scalar(text(f"SELECT to_regclass('{SchemaVersion.__tablename__}')")):
+        return None
+    return await conn.scalar(select(SchemaVersion.version).limit(1))
+
+
+async def save_schema_version(conn: AsyncConnection, version: str) -> None:
+    """Сохранить версию схемы после полной инициализации"""
+    await conn.execute(delete(SchemaVersion))
+    await conn.execute(insert(SchemaVersion).values(version=version))
@@ -0,0 +1,46 @@
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from loguru import logger
+
+HEAVY_MODULES = ("pandas", "numpy", "xlsxwriter", "PIL")
+"""Тяжёлые библиотеки, которые должны загружаться при первом использовании, а не при запуске"""
+
+
+class StartupProfile:
+    """
+    Замер длительности этапов запуска бота и UI
+
+    Включается настройкой `startup_profile`, результат записывается в лог одним сообщением
+    вместе с уже загруженными тяжёлыми библиотеками
+    """
+
+    def __init__(self, enabled: bool) -> None:  # noqa: FBT001
+        self.enabled = enabled
+
+        self._started_at = time.perf_counter()
+        self._stages: list[tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Замерить длительность этапа запуска"""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages.append((name, time.perf_counter() - started_at))
+
+    def report(self) -> None:
+        """Записать в лог длительность этапов запуска"""
+        if not self.enabled:
+            return
+
+        stages = "\n".join(f"  {name}: {elapsed:.3f}s" for name, elapsed in self._stages)
+        heavy_modules = [module for module in HEAVY_MODULES if module in sys.modules]
+        logger.info(
+            f"Startup profile: {time.perf_counter() - self._started_at:.3f}s since provider creation, "
+            f"{len(sys.modules)} modules loaded, heavy modules loaded {heavy_modules}\n{stages}"
+        )
+        self._stages.clear()
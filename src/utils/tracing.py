@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import time
+from collections.abc import Callable, Coroutine
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+SPAN_GROUPS = ("telegram", "minio")
+"""Группы внешних вызовов, время которых вычитается из времени выполнения кода"""
+
+_record_statements = False
+
+
+def record_statements(enabled: bool = True) -> None:  # noqa: FBT001, FBT002
+    """Сохранять текст запросов к БД в новых трассировках - используется проверкой бюджета запросов"""
+    global _record_statements  # noqa: PLW0603
+    _record_statements = enabled
+
+
+def _new_statements() -> list[str] | None:
+    return [] if _record_statements else None
+
+
+@dataclass
+class SpanStats:
+    """Статистика одного вида вызовов в рамках трассировки"""
+
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+@dataclass
+class Trace:
+    """Трассировка одной единицы работы: обновления бота, задачи или запроса UI"""
+
+    queries: int = 0
+    """Количество запросов к БД"""
+    db_seconds: float = 0.0
+    """Время выполнения запросов к БД"""
+    checkouts: int = 0
+    """Количество получений соединений из пула"""
+    pool_wait_seconds: float = 0.0
+    """Время ожидания соединений из пула"""
+    handlers: list[str] = field(default_factory=list)
+    """Сработавшие обработчики по порядку"""
+    spans: dict[str, SpanStats] = field(default_factory=dict)
+    """Статистика вызовов по их названиям: `telegram.sendMessage`, `minio.get_object`, `helper.<имя>`"""
+    statements: list[str] | None = field(default_factory=_new_statements)
+    """Текст запросов к БД, None - если сохранение запросов не включено"""
+    pending_tasks: list[asyncio.Task[Any]] = field(default_factory=list)
+    """Задачи неблокирующих обработчиков, без завершения которых единица работы не считается выполненной"""
+
+    @property
+    def handler(self) -> str:
+        """Первый сработавший обработчик - используется как метка метрик обновления"""
+        return self.handlers[0] if self.handlers else "unhandled"
+
+    def record(self, span: str, seconds: float) -> None:
+        stats = self.spans.setdefault(span, SpanStats())
+        stats.count += 1
+        stats.seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+
+    def format_breakdown(self, elapsed: float) -> str:
+        """Разбивка времени выполнения по БД, внешним вызовам и вспомогательным функциям"""
+        external_seconds = sum(
+            stats.seconds for span, stats in self.spans.items() if span.split(".", 1)[0] in SPAN_GROUPS
+        )
+        parts = [
+            f"db {self.queries} queries {self.db_seconds:.3f}s",
+            f"pool wait {self.checkouts} checkouts {self.pool_wait_seconds:.3f}s",
+            *(
+                f"{span} {stats.count}x {stats.seconds:.3f}s (max {stats.max_seconds:.3f}s)"
+                for span, stats in sorted(self.spans.items(), key=lambda item: item[1].seconds, reverse=True)
+            ),
+            f"other {max(elapsed - self.db_seconds - self.pool_wait_seconds - external_seconds, 0):.3f}s",
+        ]
+        return ", ".join(parts)
+
+
+current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+"""Трассировка текущей единицы работы, None - если не отслеживается"""
+
+
+def record_span(span: str, seconds: float) -> None:
+    """Учесть вызов в трассировке текущей единицы работы, если она отслеживается"""
+    trace = current_trace.get()
+    if trace:
+        trace.record(span, seconds)
+
+
+def traced[**P, T](func: Callable[P, Coroutine[Any, Any, T]]) -> Callable[P, Coroutine[Any, Any, T]]:
+    """Декоратор асинхронной вспомогательной функции, учитывающий время её выполнения в трассировке"""
+    span = f"helper.{func.__qualname__}"
+
+    @functools.wraps(func)
+    async def _traced(*args: P.args, **kwargs: P.kwargs) -> T:
+        started_at = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            record_span(span, time.perf_counter() - started_at)
+
+    return _traced
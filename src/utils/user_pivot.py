@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+from sqlalchemy import ColumnElement, Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.utils.config_model import I18n
+from src.utils.db_model import Field, User, UserFieldValue
+from src.utils.pivot import PivotField, PlainDictType, pivot_columns, pivot_row
+
+
+def select_users_values(*where: ColumnElement[bool]) -> Select[tuple[int, int, str | None, int | None, str | None]]:
+    """Select запрос пользователей и значений их полей, по строке на значение"""
+    return (
+        select(User.id, User.chat_id, User.username, UserFieldValue.field_id, UserFieldValue.value)
+        .outerjoin(UserFieldValue, UserFieldValue.user_id == User.id)
+        .where(*where)
+        .order_by(User.id.asc())
+    )
+
+
+async def select_users_plain_dicts(
+    session: AsyncSession,
+    *where: ColumnElement[bool],
+    branch_id: int | None = None,
+    i18n: I18n | None = None,
+    result_dict_type: PlainDictType = "full",
+) -> list[dict[str, str | int | None]]:
+    """
+    Плоские словари пользователей, как `User.to_plain_dict`, для всех пользователей, подходящих под условия
+
+    Значения всех пользователей загружаются одним запросом без объектов ORM, столбцы вычисляются один раз
+    """
+    fields = await session.execute(
+        select(Field.id, Field.key, Field.type, Field.branch_id, Field.order_place, Field.report_order).order_by(
+            Field.id.asc()
+        )
+    )
+    columns = pivot_columns((PivotField(*field) for field in fields), branch_id, result_dict_type)
+
+    users_data: dict[int, tuple[int, str | None]] = {}
+    users_values: defaultdict[int, dict[int, str]] = defaultdict(dict)
+    for user_id, chat_id, username, field_id, value in await session.execute(select_users_values(*where)):
+        users_data[user_id] = (chat_id, username)
+        if field_id is not None:
+            users_values[user_id][field_id] = value
+
+    return [
+        pivot_row(columns, user_id, chat_id, username, users_values[user_id], i18n, result_dict_type)
+        for user_id, (chat_id, username) in users_data.items()
+    ]
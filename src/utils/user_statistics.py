@@ -0,0 +1,204 @@
+from sqlalchemy import func, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.utils.custom_types import (
+    FieldStatusEnum,
+    FieldTypeEnum,
+    PassSubmitStatusEnum,
+    UserStatistics,
+    UserStatusEnum,
+)
+from src.utils.db_model import Field, FieldBranch, User, UserFieldValue, UserStatistic, UserStatisticDelta
+
+_STATISTICS = UserStatistic.__tablename__
+_DELTAS = UserStatisticDelta.__tablename__
+_USERS = User.__tablename__
+_VALUES = UserFieldValue.__tablename__
+
+USER_STATISTICS_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION {_STATISTICS}_bump(p_kind text, p_key text, p_delta bigint) RETURNS void AS $$
+    BEGIN
+        IF p_key IS NULL THEN
+            RETURN;
+        END IF;
+        -- Строка счётчика активных пользователей блокируется до конца транзакции активации,
+        -- поэтому каждая активация получает своё значение для оповещений администраторов
+        IF p_kind = 'status' AND p_key = '{UserStatusEnum.ACTIVE.name}' THEN
+            INSERT INTO {_STATISTICS} (kind, key, count) VALUES (p_kind, p_key, p_delta)
+            ON CONFLICT (kind, key) DO UPDATE SET count = {_STATISTICS}.count + EXCLUDED.count;
+        ELSE
+            INSERT INTO {_DELTAS} (kind, key, delta) VALUES (p_kind, p_key, p_delta);
+        END IF;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION {_STATISTICS}_{_USERS}() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM {_STATISTICS}_bump('status', OLD.status::text, -1);
+            PERFORM {_STATISTICS}_bump('pass_status', OLD.pass_status::text, -1);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM {_STATISTICS}_bump('status', NEW.status::text, 1);
+            PERFORM {_STATISTICS}_bump('pass_status', NEW.pass_status::text, 1);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION {_STATISTICS}_{_VALUES}() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.value <> '' THEN
+            PERFORM {_STATISTICS}_bump('field_values', OLD.field_id::text, -1);
+            IF OLD.value = 'true' THEN
+                PERFORM {_STATISTICS}_bump('field_true', OLD.field_id::text, -1);
+            END IF;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.value <> '' THEN
+            PERFORM {_STATISTICS}_bump('field_values', NEW.field_id::text, 1);
+            IF NEW.value = 'true' THEN
+                PERFORM {_STATISTICS}_bump('field_true', NEW.field_id::text, 1);
+            END IF;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER {_STATISTICS}_{_USERS}_insert_delete AFTER INSERT OR DELETE ON {_USERS}
+    FOR EACH ROW EXECUTE FUNCTION {_STATISTICS}_{_USERS}()
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER {_STATISTICS}_{_USERS}_update AFTER UPDATE OF status, pass_status ON {_USERS}
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.pass_status IS DISTINCT FROM NEW.pass_status)
+    EXECUTE FUNCTION {_STATISTICS}_{_USERS}()
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER {_STATISTICS}_{_VALUES}_insert_delete AFTER INSERT OR DELETE ON {_VALUES}
+    FOR EACH ROW EXECUTE FUNCTION {_STATISTICS}_{_VALUES}()
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER {_STATISTICS}_{_VALUES}_update AFTER UPDATE OF value, field_id ON {_VALUES}
+    FOR EACH ROW
+    WHEN (OLD.value IS DISTINCT FROM NEW.value OR OLD.field_id IS DISTINCT FROM NEW.field_id)
+    EXECUTE FUNCTION {_STATISTICS}_{_VALUES}()
+    """,
+]
+"""Функции и триггеры, поддерживающие счётчики пользователей при каждом изменении пользователей и их ответов"""
+
+USER_STATISTICS_TRIGGERS = [
+    f"{_STATISTICS}_{_USERS}_insert_delete",
+    f"{_STATISTICS}_{_USERS}_update",
+    f"{_STATISTICS}_{_VALUES}_insert_delete",
+    f"{_STATISTICS}_{_VALUES}_update",
+]
+"""Названия триггеров счётчиков пользователей"""
+
+
+async def user_statistics_installed(conn: AsyncConnection) -> bool:
+    """Установлены ли все триггеры счётчиков пользователей"""
+    installed = await conn.scalar(
+        text("SELECT count(*) FROM pg_trigger WHERE tgname = ANY(:names)"), {"names": USER_STATISTICS_TRIGGERS}
+    )
+    return installed == len(USER_STATISTICS_TRIGGERS)
+
+
+async def install_user_statistics(conn: AsyncConnection) -> None:
+    """
+    Создать или обновить функции и триггеры счётчиков пользователей
+
+    Счётчики пересчитываются по текущим данным, только если триггеров ещё не было
+    """
+    installed = await user_statistics_installed(conn)
+    for statement in USER_STATISTICS_DDL:
+        await conn.execute(text(statement))
+    if not installed:
+        await rebuild_user_statistics(conn)
+
+
+async def rebuild_user_statistics(conn: AsyncConnection) -> None:
+    """
+    Пересчитать счётчики пользователей по текущим данным
+
+    Изменения пользователей и их ответов блокируются до конца транзакции, чтобы триггеры не разошлись с пересчётом
+    """
+    await conn.execute(text(f"LOCK TABLE {_USERS}, {_VALUES} IN SHARE MODE"))
+    await conn.execute(text(f"DELETE FROM {_DELTAS}"))
+    await conn.execute(text(f"DELETE FROM {_STATISTICS}"))
+    await conn.execute(
+        text(
+            f"INSERT INTO {_STATISTICS} (kind, key, count) "
+            f"SELECT 'status', status::text, count(*) FROM {_USERS} GROUP BY status "
+            "UNION ALL "
+            f"SELECT 'pass_status', pass_status::text, count(*) FROM {_USERS} "
+            "WHERE pass_status IS NOT NULL GROUP BY pass_status "
+            "UNION ALL "
+            f"SELECT 'field_values', field_id::text, count(*) FROM {_VALUES} WHERE value <> '' GROUP BY field_id "
+            "UNION ALL "
+            f"SELECT 'field_true', field_id::text, count(*) FROM {_VALUES} WHERE value = 'true' GROUP BY field_id"
+        )
+    )
+
+
+async def rollup_user_statistics(conn: AsyncConnection) -> int:
+    """
+    Перенести накопленные изменения в счётчики пользователей
+
+    Возвращает количество перенесённых изменений
+    """
+    result = await conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {_DELTAS} RETURNING kind, key, delta), "
+            "summed AS (SELECT kind, key, sum(delta) AS delta FROM moved GROUP BY kind, key), "
+            f"upserted AS (INSERT INTO {_STATISTICS} (kind, key, count) SELECT kind, key, delta FROM summed "
+            f"ON CONFLICT (kind, key) DO UPDATE SET count = {_STATISTICS}.count + EXCLUDED.count) "
+            "SELECT count(*) FROM moved"
+        )
+    )
+    return int(result.scalar_one())
+
+
+async def get_user_statistics(session: AsyncSession) -> UserStatistics:
+    """
+    Получить агрегированные данные пользователей из счётчиков и ещё не перенесённых в них изменений
+
+    Ветка считается заполненной пользователем, если он ответил на её последний вопрос
+    """
+    counters: dict[str, dict[str, int]] = {"status": {}, "pass_status": {}, "field_values": {}, "field_true": {}}
+    values = union_all(
+        select(UserStatistic.kind, UserStatistic.key, UserStatistic.count.label("count")),
+        select(UserStatisticDelta.kind, UserStatisticDelta.key, UserStatisticDelta.delta.label("count")),
+    ).subquery()
+    for kind, key, count in await session.execute(
+        select(values.c.kind, values.c.key, func.sum(values.c.count)).group_by(values.c.kind, values.c.key)
+    ):
+        counters.setdefault(kind, {})[key] = int(count)
+
+    fields = list(await session.scalars(select(Field).order_by(Field.branch_id.asc(), Field.order_place.asc())))
+    branches = {branch.id: branch.key for branch in await session.scalars(select(FieldBranch))}
+
+    last_branch_fields: dict[int, Field] = {}
+    for field in fields:
+        if field.status == FieldStatusEnum.NORMAL and field.type != FieldTypeEnum.BOOLEAN:
+            last_branch_fields[field.branch_id] = field
+
+    by_status = {UserStatusEnum[key].value: count for key, count in counters["status"].items()}
+    return UserStatistics(
+        total=sum(by_status.values()),
+        by_status=by_status,
+        by_pass_status={PassSubmitStatusEnum[key].value: count for key, count in counters["pass_status"].items()},
+        branches_completed={
+            branches[branch_id]: counters["field_values"].get(str(field.id), 0)
+            for branch_id, field in last_branch_fields.items()
+        },
+        fields_answered={field.key: counters["field_values"].get(str(field.id), 0) for field in fields},
+        fields_true={
+            field.key: counters["field_true"].get(str(field.id), 0)
+            for field in fields
+            if field.type == FieldTypeEnum.BOOLEAN
+        },
+    )